@@ -38,6 +38,16 @@ def get_metadata():
     return target_db.metadata
 
 
+# La búsqueda (migración 7d2f6a1c3e58) crea objetos que no están en los modelos: search_vector
+# y su índice GIN en PostgreSQL, la tabla FTS5 search_index y sus tablas internas en SQLite.
+# Sin esto, autogenerate propondría borrarlos.
+def include_object(object, name, type_, reflected, compare_to):
+    if reflected and compare_to is None and name is not None:
+        if name == 'search_vector' or name.startswith('search_index') or name.endswith('_search_vector'):
+            return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -52,7 +62,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -84,6 +95,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
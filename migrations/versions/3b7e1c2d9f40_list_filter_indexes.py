@@ -0,0 +1,43 @@
+"""character, planet: (column, id) indexes for list filters and ?sort=
+
+Revision ID: 3b7e1c2d9f40
+Revises: aafaa9e2ac1a
+Create Date: 2026-10-18 14:20:05.112904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1c2d9f40'
+down_revision = 'aafaa9e2ac1a'
+branch_labels = None
+depends_on = None
+
+# (tabla, columna) de cada filtro u orden de filters.py; el id desempata y sirve al cursor
+LIST_INDEXES = [
+    ('character', 'name'),
+    ('character', 'gender'),
+    ('character', 'eye_color'),
+    ('character', 'hair_color'),
+    ('character', 'homeworld_id'),
+    ('character', 'film_id'),
+    ('character', 'created'),
+    ('character', 'edited'),
+    ('planet', 'name'),
+    ('planet', 'climate'),
+    ('planet', 'terrain'),
+    ('planet', 'created'),
+    ('planet', 'edited'),
+]
+
+
+def upgrade():
+    for table, column in LIST_INDEXES:
+        op.create_index('ix_%s_%s_id' % (table, column), table, [column, 'id'])
+
+
+def downgrade():
+    for table, column in reversed(LIST_INDEXES):
+        op.drop_index('ix_%s_%s_id' % (table, column), table_name=table)
@@ -0,0 +1,80 @@
+"""numeric shadow columns (<column>_num) for SWAPI measurements, with backfill and indexes
+
+Revision ID: 5c4a8e91d2b7
+Revises: 3b7e1c2d9f40
+Create Date: 2026-10-18 15:02:47.530118
+
+"""
+import math
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c4a8e91d2b7'
+down_revision = '3b7e1c2d9f40'
+branch_labels = None
+depends_on = None
+
+# Copia de models.NUMERIC_COLUMNS en el momento de esta migración
+NUMERIC_COLUMNS = {
+    'starship': ('cost_in_credits', 'length', 'crew', 'passengers', 'max_atmosphering_speed', 'hyperdrive_rating', 'MGLT', 'cargo_capacity'),
+    'vehicle': ('cost_in_credits', 'length', 'crew', 'passengers', 'max_atmosphering_speed', 'cargo_capacity'),
+    'species': ('average_height', 'average_lifespan'),
+    'planet': ('diameter', 'rotation_period', 'orbital_period', 'surface_water', 'population'),
+    'character': ('height', 'mass'),
+}
+BATCH_SIZE = 5000
+
+
+def parse_number(value):
+    # Igual que models.parse_number: "1,358" -> 1358.0; "unknown", "n/a", "30-165" -> NULL
+    if value is None:
+        return None
+    try:
+        number = float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _backfill(connection, table_name, columns):
+    table = sa.table(table_name, sa.column('id'), *[sa.column(column) for column in columns],
+                     *[sa.column(column + '_num') for column in columns])
+    update = table.update().where(table.c.id == sa.bindparam('row_id')).values(
+        {column + '_num': sa.bindparam('v_' + column) for column in columns})
+    last_id = 0
+    while True:
+        # Por bloques de id: no carga la tabla entera ni deja una transacción de UPDATE gigante sin avanzar
+        rows = connection.execute(sa.select(table.c.id, *[table.c[column] for column in columns])
+                                  .where(table.c.id > last_id).order_by(table.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            break
+        connection.execute(update, [
+            dict({'row_id': row[0]}, **{'v_' + column: parse_number(value) for column, value in zip(columns, row[1:])})
+            for row in rows])
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    for table_name, columns in NUMERIC_COLUMNS.items():
+        with op.batch_alter_table(table_name) as batch_op:
+            for column in columns:
+                batch_op.add_column(sa.Column(column + '_num', sa.Float(), nullable=True))
+
+    connection = op.get_bind()
+    for table_name, columns in NUMERIC_COLUMNS.items():
+        _backfill(connection, table_name, columns)
+
+    for table_name, columns in NUMERIC_COLUMNS.items():
+        for column in columns:
+            op.create_index('ix_%s_%s_num_id' % (table_name, column.lower()), table_name, [column + '_num', 'id'])
+
+
+def downgrade():
+    for table_name, columns in reversed(list(NUMERIC_COLUMNS.items())):
+        for column in reversed(columns):
+            op.drop_index('ix_%s_%s_num_id' % (table_name, column.lower()), table_name=table_name)
+        with op.batch_alter_table(table_name) as batch_op:
+            for column in reversed(columns):
+                batch_op.drop_column(column + '_num')
@@ -0,0 +1,72 @@
+"""full-text search: tsvector + GIN on PostgreSQL, FTS5 search_index on SQLite
+
+Revision ID: 7d2f6a1c3e58
+Revises: 5c4a8e91d2b7
+Create Date: 2026-10-18 18:02:37.480215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2f6a1c3e58'
+down_revision = '5c4a8e91d2b7'
+branch_labels = None
+depends_on = None
+
+# Igual que search.SEARCH_TYPES: (tabla, código del tipo en el rowid, columnas; la primera pesa más)
+SEARCH_TABLES = [
+    ('character', 1, ('name',)),
+    ('planet', 2, ('name', 'climate', 'terrain')),
+    ('film', 3, ('title', 'opening_crawl')),
+    ('species', 4, ('name',)),
+    ('starship', 5, ('name', 'model')),
+    ('vehicle', 6, ('name', 'model')),
+]
+ROWID_FACTOR = 8
+TEXT_SEARCH_CONFIG = 'english'
+
+
+def _text(columns, prefix=''):
+    return " || ' ' || ".join("coalesce(%s%s, '')" % (prefix, name) for name in columns) or "''"
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table, code, columns in SEARCH_TABLES:
+            vector = "setweight(to_tsvector('%s', %s), 'A')" % (TEXT_SEARCH_CONFIG, _text(columns[:1]))
+            if len(columns) > 1:
+                vector += " || setweight(to_tsvector('%s', %s), 'B')" % (TEXT_SEARCH_CONFIG, _text(columns[1:]))
+            # La columna generada se calcula para las filas existentes al agregarla
+            op.execute('ALTER TABLE "%s" ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (%s) STORED' % (table, vector))
+            op.execute('CREATE INDEX ix_%s_search_vector ON "%s" USING gin (search_vector)' % (table, table))
+    elif dialect == 'sqlite':
+        # Ojo: batch_alter_table recrea la tabla en SQLite y pierde los triggers; una migración
+        # posterior que lo use sobre estas tablas debe volver a crearlos
+        op.execute("CREATE VIRTUAL TABLE search_index USING fts5(name, body, tokenize='porter unicode61')")
+        for table, code, columns in SEARCH_TABLES:
+            rowid = 'id * %d + %d' % (ROWID_FACTOR, code)
+            op.execute('INSERT INTO search_index (rowid, name, body) SELECT %s, %s, %s FROM "%s"' % (
+                rowid, _text(columns[:1]), _text(columns[1:]), table))
+            insert = 'INSERT INTO search_index (rowid, name, body) VALUES (NEW.%s, %s, %s);' % (
+                rowid, _text(columns[:1], 'NEW.'), _text(columns[1:], 'NEW.'))
+            delete = 'DELETE FROM search_index WHERE rowid = OLD.%s;' % rowid
+            op.execute('CREATE TRIGGER %s_search_insert AFTER INSERT ON "%s" BEGIN %s END' % (table, table, insert))
+            op.execute('CREATE TRIGGER %s_search_update AFTER UPDATE OF %s ON "%s" BEGIN %s %s END' % (
+                table, ', '.join(('id',) + columns), table, delete, insert))
+            op.execute('CREATE TRIGGER %s_search_delete AFTER DELETE ON "%s" BEGIN %s END' % (table, table, delete))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table, code, columns in reversed(SEARCH_TABLES):
+            op.execute('DROP INDEX ix_%s_search_vector' % table)
+            op.execute('ALTER TABLE "%s" DROP COLUMN search_vector' % table)
+    elif dialect == 'sqlite':
+        for table, code, columns in reversed(SEARCH_TABLES):
+            for trigger in ('delete', 'update', 'insert'):
+                op.execute('DROP TRIGGER %s_search_%s' % (table, trigger))
+        op.execute('DROP TABLE search_index')
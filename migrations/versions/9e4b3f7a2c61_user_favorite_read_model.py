@@ -0,0 +1,59 @@
+"""user_favorite: per-user favorites read model, backfilled from favoritos
+
+Revision ID: 9e4b3f7a2c61
+Revises: 7d2f6a1c3e58
+Create Date: 2026-10-18 19:14:05.902311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b3f7a2c61'
+down_revision = '7d2f6a1c3e58'
+branch_labels = None
+depends_on = None
+
+# Igual que favorites.FAVORITE_TYPES: (tipo, columna de favoritos, tabla destino, columna del nombre)
+FAVORITE_TYPES = [
+    ('film', 'film_id', 'film', 'title'),
+    ('species', 'specie_id', 'species', 'name'),
+    ('starship', 'starship_id', 'starship', 'name'),
+    ('vehicle', 'vehicle_id', 'vehicle', 'name'),
+    ('character', 'character_id', 'character', 'name'),
+    ('planet', 'planet_id', 'planet', 'name'),
+]
+
+
+def _case(value):
+    return 'CASE %s END' % ' '.join('WHEN f.%s IS NOT NULL THEN %s' % (column, value % {'kind': kind, 'column': column, 'table': table, 'name': name})
+                                    for kind, column, table, name in FAVORITE_TYPES)
+
+
+def upgrade():
+    op.create_table('user_favorite',
+    sa.Column('favorito_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('target_type', sa.String(length=20), nullable=True),
+    sa.Column('target_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(length=255), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('favorito_id')
+    )
+    op.create_index('ix_user_favorite_user_id_favorito_id', 'user_favorite', ['user_id', 'favorito_id'],
+                    postgresql_include=['target_type', 'target_id', 'name'])
+    op.create_index('ix_user_favorite_target', 'user_favorite', ['target_type', 'target_id'])
+
+    joins = ' '.join('LEFT JOIN "%s" ON "%s".id = f.%s' % (table, table, column) for kind, column, table, name in FAVORITE_TYPES)
+    op.execute(
+        'INSERT INTO user_favorite (favorito_id, user_id, target_type, target_id, name) '
+        'SELECT f.id, f.user_id, %s, %s, %s FROM favoritos f %s WHERE f.user_id IS NOT NULL' % (
+            _case("'%(kind)s'"), _case('f.%(column)s'), _case('"%(table)s".%(name)s'),
+            joins))
+
+
+def downgrade():
+    op.drop_index('ix_user_favorite_target', table_name='user_favorite')
+    op.drop_index('ix_user_favorite_user_id_favorito_id', table_name='user_favorite')
+    op.drop_table('user_favorite')
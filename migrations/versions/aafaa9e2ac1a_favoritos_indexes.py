@@ -0,0 +1,42 @@
+"""favoritos: unique (user_id, target) indexes
+
+Revision ID: aafaa9e2ac1a
+Revises: f652984092fa
+Create Date: 2026-10-18 10:02:11.418233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'aafaa9e2ac1a'
+down_revision = 'f652984092fa'
+branch_labels = None
+depends_on = None
+
+# (nombre del índice, columna destino)
+FAVORITE_TARGETS = [
+    ('ix_favoritos_user_film', 'film_id'),
+    ('ix_favoritos_user_specie', 'specie_id'),
+    ('ix_favoritos_user_starship', 'starship_id'),
+    ('ix_favoritos_user_vehicle', 'vehicle_id'),
+    ('ix_favoritos_user_character', 'character_id'),
+    ('ix_favoritos_user_planet', 'planet_id'),
+]
+
+
+def upgrade():
+    for index_name, column in FAVORITE_TARGETS:
+        # Borrar los favoritos duplicados (se conserva el más antiguo) antes de crear el índice único
+        op.execute(sa.text(
+            'DELETE FROM favoritos WHERE {col} IS NOT NULL AND id NOT IN ('
+            'SELECT keep.id FROM (SELECT MIN(id) AS id FROM favoritos WHERE {col} IS NOT NULL '
+            'GROUP BY user_id, {col}) AS keep)'.format(col=column)
+        ))
+        op.create_index(index_name, 'favoritos', ['user_id', column], unique=True)
+
+
+def downgrade():
+    for index_name, column in reversed(FAVORITE_TARGETS):
+        op.drop_index(index_name, table_name='favoritos')
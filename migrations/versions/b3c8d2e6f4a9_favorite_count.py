@@ -0,0 +1,37 @@
+"""favorite_count: per-target favorite counters for /favoritos/top, backfilled from user_favorite
+
+Revision ID: b3c8d2e6f4a9
+Revises: 9e4b3f7a2c61
+Create Date: 2026-10-18 20:26:51.137042
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3c8d2e6f4a9'
+down_revision = '9e4b3f7a2c61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('favorite_count',
+    sa.Column('target_type', sa.String(length=20), nullable=False),
+    sa.Column('target_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('target_type', 'target_id')
+    )
+    op.create_index('ix_favorite_count_top', 'favorite_count', ['target_type', sa.text('total DESC'), 'target_id'])
+
+    # user_favorite (9e4b3f7a2c61) ya tiene el tipo y el id de cada favorito
+    op.execute(
+        'INSERT INTO favorite_count (target_type, target_id, total) '
+        'SELECT target_type, target_id, COUNT(*) FROM user_favorite WHERE target_type IS NOT NULL '
+        'GROUP BY target_type, target_id')
+
+
+def downgrade():
+    op.drop_index('ix_favorite_count_top', table_name='favorite_count')
+    op.drop_table('favorite_count')
@@ -6,8 +6,21 @@ from flask import Flask, request, jsonify, url_for
 from flask_migrate import Migrate
 from flask_swagger import swagger
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
+from utils import APIException, DEFAULT_PAGE_LIMIT, generate_sitemap, get_page_args, get_ids, keyset_paginate, page_response, get_stream_mode, stream_query, conditional_get, projected_validators, set_validators, insert_or_conflict
 from admin import setup_admin
+from cache import cache, get_entity, get_entities, get_list_validators, get_list_page, get_expanded, list_namespace, EXPAND_NAMESPACE
+from compression import setup_compression, encoded_response
+from bench import bench_cli
+from swapi_import import import_swapi_command
+from db_pool import engine_options_from_env, pool_stats
+from metrics import setup_metrics, require_metrics_secret
+from profiling import setup_profiling
+from serializers import SERIALIZERS, dumps, json_body, json_response, get_fields, project, ids_payload
+from filters import ListQuery, get_list_query
+from search import search, parse_types, parse_after
+from expand import parse_expand, expand_options, serialize_expanded, get_expanded_entity
+from favorites import favorites_cli, insert_user_favorites, user_favorites_statement, serialize_user_favorites, parse_favorite_type, top_favorites
+from bulk import run_bulk, validate_item, validate_favorite, check_favorite_references
 from models import db, User, Film, Starship, Vehicle, Species, Planet, Character, Favoritos
 #from models import Person
 
@@ -20,11 +33,18 @@ if db_url is not None:
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI'])  # DB_POOL_SIZE, DB_MAX_OVERFLOW, ...
 
 MIGRATE = Migrate(app, db)
 db.init_app(app)
 CORS(app)
 setup_admin(app)
+setup_metrics(app)  # /metrics, latencia, SQL y serialización por petición
+setup_profiling(app)  # X-Profile: <PROFILE_SECRET> perfila una petición
+setup_compression(app)  # gzip/br/zstd según Accept-Encoding (después de registrar las métricas: miden el tamaño comprimido)
+app.cli.add_command(bench_cli)  # flask bench ...
+app.cli.add_command(import_swapi_command)  # flask import-swapi <archivo>
+app.cli.add_command(favorites_cli)  # flask favorites rebuild | reconcile
 
 # Handle/serialize errors like a JSON object
 @app.errorhandler(APIException)
@@ -54,19 +74,16 @@ def create_new_user():  # Define la función que manejará la solicitud
         if 'password' not in data:  # Verifica si 'password' no está presente en los datos JSON
             return jsonify({'error': 'Password is required'}), 400  # Devuelve un error con código de estado 400 si 'password' no está presente
 
-        existing_user = User.query.filter_by(email=data['email']).first()  # Busca un usuario en la base de datos con el mismo email
-        if existing_user:  # Verifica si ya existe un usuario con el mismo email
-            return jsonify({'error': 'Email already exists.'}), 409  # Devuelve un error con código de estado 409 si ya existe un usuario con el mismo email
-
-        existing_username = User.query.filter_by(username=data['username']).first()  # Busca un usuario en la base de datos con el mismo username
-        if existing_username:  # Verifica si ya existe un usuario con el mismo username
+        # Un solo INSERT: las restricciones únicas de email y username deciden, incluso con peticiones concurrentes
+        new_user_id = insert_or_conflict(User, {'email': data['email'], 'password': data['password'], 'name': data.get('name'), 'last_name': data.get('last_name'), 'username': data.get('username')})
+        if new_user_id is None:  # Choque con una restricción única: solo en este caso se consulta cuál fue
+            db.session.rollback()
+            if User.query.filter_by(email=data['email']).first():
+                return jsonify({'error': 'Email already exists.'}), 409  # Devuelve un error con código de estado 409 si ya existe un usuario con el mismo email
             return jsonify({'error': 'Username already exists.'}), 409  # Devuelve un error con código de estado 409 si ya existe un usuario con el mismo username
 
-        new_user = User(email=data['email'], password=data['password'], name=data.get('name'), last_name=data.get('last_name'), username=data.get('username'))  # Crea un nuevo usuario con los datos proporcionados
-
-        db.session.add(new_user)  # Agrega el nuevo usuario a la sesión de la base de datos
         db.session.commit()  # Confirma los cambios en la base de datos
-        return jsonify({'message': 'New user created successfully', 'user_id': new_user.id}), 201  # Devuelve un mensaje de éxito con el ID del nuevo usuario y un código de estado 201
+        return jsonify({'message': 'New user created successfully', 'user_id': new_user_id}), 201  # Devuelve un mensaje de éxito con el ID del nuevo usuario y un código de estado 201
    
     except Exception as e:  # Captura cualquier excepción que ocurra dentro del bloque try
         return jsonify({'error': 'Error in user creation: ' + str(e)}), 500  # Devuelve un mensaje de error con un código de estado HTTP 500 si ocurre una excepción durante el procesamiento
@@ -74,12 +91,27 @@ def create_new_user():  # Define la función que manejará la solicitud
 #-------------------CONSULTAR TODOS LOS USUARIOS-----------------------
 @app.route('/users', methods=['GET'])
 def get_users():
+    page = get_page_args()  # Paginacion opcional ?after=<cursor>&limit=N
+    fields = get_fields(User, extra=('favoritos',))  # ?fields=id,username: sin favoritos se leen solo esas columnas
     try:
-        users = User.query.all()
+        if fields is not None and 'favoritos' not in fields:
+            serializer = SERIALIZERS[User].only(fields)
+            if page is not None:
+                return json_response(page_response(*ListQuery(User).page(serializer, **page)))
+            users = serializer.all()
+            if not users:
+                return jsonify({'message': 'No users found'}), 404
+            return json_response(users)
+
+        if page is not None:
+            users, next_cursor = keyset_paginate(User.query.options(*User.serialize_options()), User, **page)
+            return jsonify(page_response([project(user.serialize(), fields) for user in users], next_cursor)), 200
+
+        users = User.query.options(*User.serialize_options()).all()  # Carga usuarios y favoritos sin consultas N+1
         if not users:
             return jsonify({'message': 'No users found'}), 404
         
-        response_body = [user.serialize() for user in users]
+        response_body = [project(user.serialize(), fields) for user in users]
         return jsonify(response_body), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -88,22 +120,38 @@ def get_users():
 #-------------------CONSULTAR TODOS LOS FAV -----------------------
 @app.route('/favoritos', methods=['GET'])
 def get_favorites():
+    page = get_page_args()  # Paginacion opcional ?after=<cursor>&limit=N
+    serializer = SERIALIZERS[Favoritos].only(get_fields(Favoritos))  # ?fields=id,planet: solo esas columnas y JOIN
+    list_query = get_list_query(Favoritos)  # ?user_id=N filtra en SQL
     try:
-        # Obtener todos los favoritos de la base de datos
-        favoritos = Favoritos.query.all()
-        
-        # Serializar los favoritos
-        serialized_favoritos = [favorito.serialize() for favorito in favoritos]
+        if page is not None:
+            favoritos, next_cursor = list_query.page(serializer, **page)
+            return json_response(page_response(favoritos, next_cursor))
+
+        # Obtener y serializar todos los favoritos directamente desde las filas, sin objetos ORM
+        serialized_favoritos = serializer.all(list_query.statement(serializer))
         
         # Responder con los favoritos en formato JSON
-        return jsonify(serialized_favoritos), 200
+        return json_response(serialized_favoritos)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+#-------------------FAVORITOS MÁS POPULARES-----------------------
+
+# Ranking de destinos por cantidad de favoritos, desde los contadores de favorite_count (sin recorrer favoritos)
+@app.route('/favoritos/top', methods=['GET'])  # /favoritos/top?type=planet&limit=20
+def get_top_favorites():
+    kind = parse_favorite_type(request.args.get('type'))  # planet, character, film, species, starship o vehicle
+    if 'after' in request.args:  # Es un ranking: solo las primeras limit filas, sin cursor
+        raise APIException('after is not supported on /favoritos/top; use limit', status_code=400)
+    page = get_page_args() or {"limit": DEFAULT_PAGE_LIMIT}
+    return json_response({"type": kind, "results": top_favorites(kind, page['limit'])})
+
 #-------------------CONSULTAR FAV DEL UN USUARIO-----------------------
 
 @app.route('/users/favoritos', methods=['GET'])  # Define una ruta '/users/favoritos?user_id=int' que responde a peticiones GET
 def get_user_favorites():  # Define una función llamada get_user_favorites()
+    fields = get_fields(Favoritos)  # ?fields=id,planet opcional
     try:  # Inicia un bloque try para manejar posibles excepciones
 
         user_id = request.args.get('user_id')  # Obtiene el parámetro 'user_id' de la solicitud GET
@@ -114,9 +162,9 @@ def get_user_favorites():  # Define una función llamada get_user_favorites()
         if not user:  # Verifica si no se encontró ningún usuario con el 'user_id' proporcionado
             return jsonify({'message': 'User not found'}), 404  # Devuelve un mensaje de error con un código de estado HTTP 404 si no se encuentra ningún usuario con el 'user_id' proporcionado
 
-        favoritos = user.favoritos  # Obtiene todos los favoritos del usuario encontrado
-        serialized_favoritos = [favorito.serialize() for favorito in favoritos]  # Serializa los favoritos del usuario en formato JSON
-        return jsonify(serialized_favoritos), 200  # Devuelve los favoritos serializados con un código de estado HTTP 200 si todo está correcto
+        rows = db.session.execute(user_favorites_statement(user.id))  # Vista user_favorite: un recorrido del índice (user_id, favorito_id), nombres ya resueltos
+        serialized_favoritos = serialize_user_favorites(rows, fields)
+        return json_response(serialized_favoritos)  # Devuelve los favoritos serializados con un código de estado HTTP 200 si todo está correcto
     except Exception as e:  # Captura cualquier excepción que ocurra dentro del bloque try
         return jsonify({'error': str(e)}), 500  # Devuelve un mensaje de error con un código de estado HTTP 500 si ocurre una excepción durante el procesamiento
 
@@ -141,8 +189,11 @@ def add_favorite_planet(planet_id):  # Define la función que manejará la solic
         if not planet:  # Verifica si el planeta no fue encontrado en la base de datos
             return jsonify({'error': 'Planet not found'}), 404  # Devuelve un error con código de estado 404 si el planeta no fue encontrado
 
-        new_favorite = Favoritos(user_id = user_id, planet_id = planet_id)
-        db.session.add(new_favorite)
+        new_favorite_id = insert_or_conflict(Favoritos, {'user_id': user_id, 'planet_id': planet_id})  # El índice único (user_id, planet_id) impide duplicados
+        if new_favorite_id is None:
+            db.session.rollback()
+            return jsonify({'error': 'Planet already in favorites'}), 409  # Devuelve un error con código de estado 409 si ya era favorito
+        insert_user_favorites(Favoritos.id == new_favorite_id)  # Su fila en la vista de /users/favoritos, en la misma transacción
         db.session.commit()  # Confirma los cambios en la base de datos
 
         return jsonify({'message': 'Planet added to favorites'}), 201  # Devuelve un mensaje de éxito con código de estado 201
@@ -170,8 +221,11 @@ def add_favorite_character(character_id):  # Define la función que manejará la
         if not character:  # Verifica si el planeta no fue encontrado en la base de datos
             return jsonify({'error': 'character not found'}), 404  # Devuelve un error con código de estado 404 si el character no fue encontrado
 
-        new_favorite = Favoritos(user_id = user_id, character_id = character_id)
-        db.session.add(new_favorite)
+        new_favorite_id = insert_or_conflict(Favoritos, {'user_id': user_id, 'character_id': character_id})  # El índice único (user_id, character_id) impide duplicados
+        if new_favorite_id is None:
+            db.session.rollback()
+            return jsonify({'error': 'character already in favorites'}), 409  # Devuelve un error con código de estado 409 si ya era favorito
+        insert_user_favorites(Favoritos.id == new_favorite_id)  # Su fila en la vista de /users/favoritos, en la misma transacción
         db.session.commit()  # Confirma los cambios en la base de datos
 
         return jsonify({'message': 'character added to favorites'}), 201  # Devuelve un mensaje de éxito con código de estado 201
@@ -207,7 +261,7 @@ def remove_favorite_planet(planet_id):
         if not favorite:
             return jsonify({'error': 'Favorite not found'}), 404
 
-        # Elimina el favorito de la base de datos
+        # Elimina el favorito de la base de datos (el evento after_flush de favorites.py borra su fila de user_favorite)
         db.session.delete(favorite)
         # Confirma los cambios en la base de datos
         db.session.commit()
@@ -247,7 +301,7 @@ def remove_favorite_character(character_id):
         if not favorite:
             return jsonify({'error': 'Favorite not found'}), 404
 
-        # Elimina el favorito de la base de datos
+        # Elimina el favorito de la base de datos (el evento after_flush de favorites.py borra su fila de user_favorite)
         db.session.delete(favorite)
         # Confirma los cambios en la base de datos
         db.session.commit()
@@ -258,23 +312,60 @@ def remove_favorite_character(character_id):
         # Devuelve un error con código de estado 500 si ocurre una excepción
         return jsonify({'error': str(e)}), 500
 
+#-----------------------------------------------------------VARIAS ENTIDADES POR ID-------------------------------------------------------------
+
+# GET /characters?ids=1,5,9 (y los demás listados del catálogo): una sola petición en lugar de una por detalle.
+# Usa las mismas entradas que /character/<id>; las que no están en cache se leen con un solo SELECT ... IN
+def get_entities_response(model, ids):
+    fields = get_fields(model)
+    body, validators = ids_payload(ids, get_entities(model, ids), fields)  # {"results": [...en el orden pedido], "missing": [ids]}
+    not_modified = conditional_get(*validators)
+    if not_modified:
+        return not_modified
+    return set_validators(json_response(body), *validators)
+
 #-----------------------------------------------------------METODOS PARA CHARACTERS-------------------------------------------------------------
 
 # Obtener todos los personajes ### OK ###
 @app.route('/characters', methods=['GET'])
 def get_characters():
-    characters = Character.query.all()
-    serialized_characters = [character.serialize() for character in characters]
-    return jsonify(serialized_characters)
+    ids = get_ids(request.args)  # ?ids=1,5,9: esas entidades, desde la cache de detalles
+    if ids is not None:
+        return get_entities_response(Character, ids)
+    page = get_page_args()  # Paginacion opcional ?after=<cursor>&limit=N
+    serializer = SERIALIZERS[Character].only(get_fields(Character))  # ?fields=id,name: solo esas columnas (y JOIN) en el SELECT
+    list_query = get_list_query(Character)  # Filtros de filters.FILTERS y ?sort=, resueltos en WHERE / ORDER BY
+    validators = get_list_validators(Character)  # ETag/Last-Modified a partir de count, max(id) y max(edited), en cache hasta la próxima escritura
+    not_modified = conditional_get(*validators)  # 304 sin consultar ni serializar las filas
+    if not_modified:
+        return not_modified
+
+    if page is not None:
+        def build_page():
+            return page_response(*list_query.page(serializer, **page))  # Filas serializadas sin instanciar objetos ORM
+        body = get_list_page(Character, lambda: json_body(build_page()))  # Cuerpo ya codificado, en cache hasta la próxima escritura
+        return set_validators(encoded_response(list_namespace(Character), body), *validators)  # Comprimido una vez por encoding
+
+    stream_mode = get_stream_mode()  # Tabla completa en streaming (JSON por chunks o NDJSON)
+    if stream_mode is not None:
+        return set_validators(stream_query(list_query.statement(serializer), serializer.to_dict, stream_mode, dumps), *validators)
+
+    body = get_list_page(Character, lambda: json_body(serializer.all(list_query.statement(serializer))))  # Lista ya codificada desde la cache o la base de datos
+    return set_validators(encoded_response(list_namespace(Character), body), *validators)
 
 
 # Obtener un personaje por su ID ### OK ###
 @app.route('/character/<int:character_id>', methods=['GET'])  # Define un endpoint para obtener un personaje mediante una solicitud GET a la ruta '/character/<character_id>'
 def get_character(character_id):  # Define la función que manejará la solicitud, tomando el ID del personaje como argumento
-    character = Character.query.get(character_id)  # Busca el personaje en la base de datos utilizando su ID
-    if not character:  # Verifica si el personaje no fue encontrado en la base de datos
+    fields = get_fields(Character)  # ?fields=id,name: se recorta la entidad en cache, sin consultar
+    entry = get_entity(Character, character_id)  # (ETag/Last-Modified, character.serialize()) desde la cache o la base de datos
+    if entry is None:  # Verifica si el personaje no fue encontrado en la base de datos
         return jsonify({'error': 'Character not found'}), 404  # Devuelve un error con código de estado 404 si el personaje no fue encontrado
-    return jsonify(character.serialize())  # Devuelve una representación JSON del personaje utilizando su método serialize()
+    validators, serialized_character = projected_validators(entry[0], fields), project(entry[1], fields)
+    not_modified = conditional_get(*validators)  # 304 sin volver a enviar el cuerpo
+    if not_modified:
+        return not_modified
+    return set_validators(jsonify(serialized_character), *validators)  # Devuelve una representación JSON del personaje
 
 
 
@@ -336,18 +427,43 @@ def delete_character(character_id):  # Define la función que manejará la solic
 # Obtener todos los planetas ### OK ###
 @app.route('/planets', methods=['GET'])  # Define un endpoint para obtener todos los planetas mediante una solicitud GET a la ruta '/planets'
 def get_planets():  # Define la función que manejará la solicitud
-    planets = Planet.query.all()  # Obtén todos los planetas de la base de datos
-    serialized_planets = [planet.serialize() for planet in planets]  # Serializa cada planeta en una lista de diccionarios JSON
-    return jsonify(serialized_planets)  # Devuelve la lista de planetas serializados como JSON
+    ids = get_ids(request.args)  # ?ids=1,5,9: esas entidades, desde la cache de detalles
+    if ids is not None:
+        return get_entities_response(Planet, ids)
+    page = get_page_args()  # Paginacion opcional ?after=<cursor>&limit=N
+    serializer = SERIALIZERS[Planet].only(get_fields(Planet))  # ?fields=id,name: solo esas columnas (y JOIN) en el SELECT
+    list_query = get_list_query(Planet)  # Filtros de filters.FILTERS y ?sort=, resueltos en WHERE / ORDER BY
+    validators = get_list_validators(Planet)  # ETag/Last-Modified a partir de count, max(id) y max(edited), en cache hasta la próxima escritura
+    not_modified = conditional_get(*validators)  # 304 sin consultar ni serializar las filas
+    if not_modified:
+        return not_modified
+
+    if page is not None:
+        def build_page():
+            return page_response(*list_query.page(serializer, **page))  # Filas serializadas sin instanciar objetos ORM
+        body = get_list_page(Planet, lambda: json_body(build_page()))  # Cuerpo ya codificado, en cache hasta la próxima escritura
+        return set_validators(encoded_response(list_namespace(Planet), body), *validators)  # Comprimido una vez por encoding
+
+    stream_mode = get_stream_mode()  # Tabla completa en streaming (JSON por chunks o NDJSON)
+    if stream_mode is not None:
+        return set_validators(stream_query(list_query.statement(serializer), serializer.to_dict, stream_mode, dumps), *validators)
+
+    body = get_list_page(Planet, lambda: json_body(serializer.all(list_query.statement(serializer))))  # Lista ya codificada desde la cache o la base de datos
+    return set_validators(encoded_response(list_namespace(Planet), body), *validators)  # Devuelve la lista de planetas como JSON, comprimida si el cliente lo acepta
 
 
 # Obtener un planeta por su ID ### OK ###
 @app.route('/planet/<int:planet_id>', methods=['GET'])  # Define un endpoint para obtener un planeta por su ID mediante una solicitud GET a la ruta '/planet/<planet_id>'
 def get_planet(planet_id):  # Define la función que manejará la solicitud, tomando el ID del planeta como argumento
-    planet = Planet.query.get(planet_id)  # Busca el planeta en la base de datos utilizando su ID
-    if not planet:  # Verifica si el planeta no fue encontrado en la base de datos
+    fields = get_fields(Planet)  # ?fields=id,name: se recorta la entidad en cache, sin consultar
+    entry = get_entity(Planet, planet_id)  # (ETag/Last-Modified, planet.serialize()) desde la cache o la base de datos
+    if entry is None:  # Verifica si el planeta no fue encontrado en la base de datos
         return jsonify({'error': 'Planet not found'}), 404  # Devuelve un error con código de estado 404 si el planeta no fue encontrado
-    return jsonify(planet.serialize())  # Devuelve una representación JSON del planeta utilizando su método serialize()
+    validators, serialized_planet = projected_validators(entry[0], fields), project(entry[1], fields)
+    not_modified = conditional_get(*validators)  # 304 sin volver a enviar el cuerpo
+    if not_modified:
+        return not_modified
+    return set_validators(jsonify(serialized_planet), *validators)  # Devuelve una representación JSON del planeta
 
 
 
@@ -405,6 +521,164 @@ def delete_planet(planet_id):  # Define la función que manejará la solicitud,
 
 
 
+#-----------------------------------------------------------FILMS, STARSHIPS, VEHICLES, SPECIES-------------------------------------------------------------
+# Solo lectura, con lo mismo que /characters y /planets (paginación, ?fields, filtros de rango, ?sort,
+# streaming, cache y ETag) más ?expand=films.planets: relaciones cargadas con una consulta por relación
+
+def get_catalog_list(model):
+    ids = get_ids(request.args)  # ?ids=1,5,9: esas entidades, desde la cache de detalles
+    if ids is not None:
+        return get_entities_response(model, ids)
+    page = get_page_args()  # Paginacion opcional ?after=<cursor>&limit=N
+    expand = parse_expand(model, request.args.get('expand'))  # ?expand=films,films.planets -> árbol de relaciones
+    fields = get_fields(model, extra=tuple(expand or ()))
+    list_query = get_list_query(model, reserved=('expand',))  # Filtros de rango (?cost_in_credits_gt=) y ?sort=, resueltos en WHERE / ORDER BY
+
+    if expand is not None:
+        def build_expanded():
+            entities, next_cursor = list_query.entities(expand_options(model, expand), **(page or {}))
+            results = [project(serialize_expanded(entity, expand), fields) for entity in entities]
+            return json_body(page_response(results, next_cursor) if page is not None else results)
+        etag, body = get_expanded(build_expanded)  # Cuerpo ya codificado y su ETag, en cache hasta la próxima escritura del catálogo
+        not_modified = conditional_get(etag)
+        if not_modified:
+            return not_modified
+        return set_validators(encoded_response(EXPAND_NAMESPACE, body), etag)
+
+    serializer = SERIALIZERS[model].only(fields)  # ?fields=id,name: solo esas columnas en el SELECT
+    validators = get_list_validators(model)  # ETag/Last-Modified a partir de count, max(id) y max(edited)
+    not_modified = conditional_get(*validators)  # 304 sin consultar ni serializar las filas
+    if not_modified:
+        return not_modified
+
+    if page is not None:
+        def build_page():
+            return page_response(*list_query.page(serializer, **page))  # Filas serializadas sin instanciar objetos ORM
+        body = get_list_page(model, lambda: json_body(build_page()))  # Cuerpo ya codificado, en cache hasta la próxima escritura
+        return set_validators(encoded_response(list_namespace(model), body), *validators)  # Comprimido una vez por encoding
+
+    stream_mode = get_stream_mode()  # Tabla completa en streaming (JSON por chunks o NDJSON)
+    if stream_mode is not None:
+        return set_validators(stream_query(list_query.statement(serializer), serializer.to_dict, stream_mode, dumps), *validators)
+
+    body = get_list_page(model, lambda: json_body(serializer.all(list_query.statement(serializer))))  # Lista ya codificada desde la cache o la base de datos
+    return set_validators(encoded_response(list_namespace(model), body), *validators)
+
+
+def get_catalog_entity(model, entity_id, not_found):
+    expand = parse_expand(model, request.args.get('expand'))
+    fields = get_fields(model, extra=tuple(expand or ()))
+
+    if expand is not None:
+        def build_expanded():
+            serialized = get_expanded_entity(model, entity_id, expand)
+            return json_body(project(serialized, fields)) if serialized is not None else None
+        entry = get_expanded(build_expanded)
+        if entry is None:
+            return jsonify({'error': not_found}), 404
+        not_modified = conditional_get(entry[0])
+        if not_modified:
+            return not_modified
+        return set_validators(encoded_response(EXPAND_NAMESPACE, entry[1]), entry[0])
+
+    entry = get_entity(model, entity_id)  # (ETag/Last-Modified, serialize()) desde la cache o la base de datos
+    if entry is None:
+        return jsonify({'error': not_found}), 404
+    validators, serialized = projected_validators(entry[0], fields), project(entry[1], fields)
+    not_modified = conditional_get(*validators)  # 304 sin volver a enviar el cuerpo
+    if not_modified:
+        return not_modified
+    return set_validators(jsonify(serialized), *validators)
+
+
+@app.route('/films', methods=['GET'])
+def get_films():
+    return get_catalog_list(Film)
+
+
+@app.route('/film/<int:film_id>', methods=['GET'])
+def get_film(film_id):
+    return get_catalog_entity(Film, film_id, 'Film not found')
+
+
+@app.route('/starships', methods=['GET'])
+def get_starships():
+    return get_catalog_list(Starship)
+
+
+@app.route('/starship/<int:starship_id>', methods=['GET'])
+def get_starship(starship_id):
+    return get_catalog_entity(Starship, starship_id, 'Starship not found')
+
+
+@app.route('/vehicles', methods=['GET'])
+def get_vehicles():
+    return get_catalog_list(Vehicle)
+
+
+@app.route('/vehicle/<int:vehicle_id>', methods=['GET'])
+def get_vehicle(vehicle_id):
+    return get_catalog_entity(Vehicle, vehicle_id, 'Vehicle not found')
+
+
+@app.route('/species', methods=['GET'])
+def get_species_list():
+    return get_catalog_list(Species)
+
+
+@app.route('/species/<int:species_id>', methods=['GET'])
+def get_species(species_id):
+    return get_catalog_entity(Species, species_id, 'Species not found')
+
+
+
+#-----------------------------------------------------------ALTAS MASIVAS-------------------------------------------------------------
+# Aceptan un array JSON o NDJSON (Content-Type: application/x-ndjson), validan todos los elementos e insertan
+# con executemany. ?atomic=false confirma por bloques de ?chunk_size=N en lugar de una sola transacción.
+
+@app.route('/characters/bulk', methods=['POST'])
+def add_characters_bulk():
+    body, status = run_bulk(Character, lambda item: validate_item(Character, item))
+    return jsonify(body), status
+
+
+@app.route('/planets/bulk', methods=['POST'])
+def add_planets_bulk():
+    body, status = run_bulk(Planet, lambda item: validate_item(Planet, item))
+    return jsonify(body), status
+
+
+@app.route('/favorite/bulk', methods=['POST'])  # Cada elemento: {"user_id": 1, "planet_id": 3} (o character_id, film_id, ...)
+def add_favorites_bulk():
+    body, status = run_bulk(Favoritos, validate_favorite, check_references=check_favorite_references)
+    return jsonify(body), status
+
+#-----------------------------------------------------------BÚSQUEDA-------------------------------------------------------------
+
+# Búsqueda de texto completo en personajes, planetas, películas, especies, naves y vehículos
+@app.route('/search', methods=['GET'])  # /search?q=skywalker&type=character,planet&after=<cursor>&limit=N
+def get_search_results():
+    kinds = parse_types(request.args.get('type'))  # ?type=planet,film: solo esos tipos (por defecto todos)
+    page = get_page_args() or {"limit": DEFAULT_PAGE_LIMIT}
+    results, next_cursor = search(request.args.get('q'), kinds, parse_after(request.args.get('after')), page['limit'])  # Ordenados por relevancia
+    return json_response(page_response(results, next_cursor))
+
+#-----------------------------------------------------------CACHE-------------------------------------------------------------
+
+# Contadores de la cache de entidades para monitoreo (con METRICS_SECRET, como /metrics)
+@app.route('/cache/stats', methods=['GET'])
+@require_metrics_secret
+def get_cache_stats():
+    return jsonify(cache.stats()), 200
+
+#-----------------------------------------------------------POOL DE CONEXIONES-------------------------------------------------------------
+
+# Conexiones en uso, overflow y tiempo de espera del pool de SQLAlchemy
+@app.route('/pool/stats', methods=['GET'])
+@require_metrics_secret
+def get_pool_stats():
+    return jsonify(pool_stats(db.engine)), 200
+
 
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
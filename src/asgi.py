@@ -0,0 +1,417 @@
+"""
+Modo asíncrono de la API: punto de entrada ASGI junto a wsgi.py.
+
+Las rutas de lectura más usadas se atienden con handlers async y una sesión asíncrona
+de SQLAlchemy, así un solo proceso puede mantener cientos de peticiones abiertas (clientes
+lentos, consultas lentas) sin ocupar un hilo por cada una:
+
+    GET /characters    GET /character/<id>
+    GET /planets       GET /planet/<id>
+    GET /users/favoritos?user_id=<id>
+
+Responden igual que en app.py (paginación ?after/limit, ?ids=, streaming JSON/NDJSON, ETag y
+304, compresión gzip/br/zstd, las cabeceras CORS de CORS(app) y la misma cache de entidades). La compresión y las lecturas y
+escrituras de la cache (Redis bloquea) van a un hilo con asyncio.to_thread, fuera del event loop.
+Cualquier otra ruta se delega a la aplicación Flask con a2wsgi (un pool de ASGI_WSGI_WORKERS
+hilos, 10 por defecto), así que este módulo sirve la API completa:
+
+    uvicorn asgi:application --app-dir src
+    gunicorn asgi:application --chdir ./src/ -k uvicorn.workers.UvicornWorker
+
+El driver asíncrono se deduce de DATABASE_URL (asyncpg para PostgreSQL, aiosqlite para
+SQLite) o se indica con ASYNC_DATABASE_URL.
+"""
+import asyncio
+import os
+import time
+from datetime import timezone
+from urllib.parse import parse_qsl
+from a2wsgi import WSGIMiddleware
+from flask_cors.core import get_cors_headers, get_cors_options
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from werkzeug.datastructures import Headers, MIMEAccept, MultiDict
+from werkzeug.http import parse_accept_header, parse_etags, parse_date, http_date, quote_etag, unquote_etag
+from app import app as flask_app
+from cache import cache, cache_entities, list_namespace
+from compression import COMPRESSIBLE_MIMETYPES, ENCODINGS, compress, compressed_body, compressible, negotiate
+from db_pool import engine_options_from_env
+from metrics import start_request, finish_request
+from models import User, Planet, Character, Favoritos
+from serializers import SERIALIZERS, dumps, json_body, project, ids_payload
+from filters import ListQuery
+from favorites import user_favorites_statement, serialize_user_favorites
+from utils import (APIException, matching_etag, representation_etag, DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, NDJSON_MIMETYPE, STREAM_BATCH_SIZE, decode_cursor, get_ids,
+                   entities_statement, entity_validators_statement, validators_from_entity_row, projected_validators, collection_validators_statement, validators_from_collection_row)
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_database_url(database_uri):
+    if os.getenv('ASYNC_DATABASE_URL'):
+        return os.getenv('ASYNC_DATABASE_URL')
+    scheme, _, rest = database_uri.partition('://')
+    return ASYNC_DRIVERS.get(scheme.split('+')[0], scheme) + '://' + rest
+
+
+def _async_engine_options(database_uri):
+    # Mismas variables DB_POOL_*; el pool asíncrono lo elige SQLAlchemy (AsyncAdaptedQueuePool)
+    options = engine_options_from_env(database_uri)
+    options.pop('poolclass', None)
+    return options
+
+
+database_uri = flask_app.config['SQLALCHEMY_DATABASE_URI']
+engine = create_async_engine(async_database_url(database_uri), **_async_engine_options(database_uri))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+#------------------------------------------------------------------------PETICIÓN Y RESPUESTA-------------------------------------------------------------
+
+class Request:
+    """Lo mínimo de flask.Request que necesitan los handlers, leído del scope ASGI."""
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope['query_string'].decode('latin-1')
+        self.args = MultiDict(parse_qsl(self.query_string, keep_blank_values=True))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.full_path = self.path + '?' + self.query_string  # Igual que request.full_path: forma parte de las claves de cache
+        self.accept_best = MIMEAccept(parse_accept_header(self.headers.get('accept'))).best
+
+
+class Response:
+    def __init__(self, body=b'', status=200, content_type='application/json', headers=None):
+        self.body = body
+        self.status = status
+        self.headers = [(b'content-type', content_type.encode('latin-1'))]
+        for name, value in (headers or {}).items():
+            self.headers.append((name.encode('latin-1'), value.encode('latin-1')))
+
+    def set_encoding(self, encoding):
+        """Content-Encoding y el ETag de esa representación ("<etag>-gzip"), como compression.py."""
+        self.headers.append((b'content-encoding', encoding.encode('latin-1')))
+        for i, (name, value) in enumerate(self.headers):
+            if name == b'etag':
+                etag, weak = unquote_etag(value.decode('latin-1'))
+                self.headers[i] = (name, quote_etag(representation_etag(etag, encoding), weak).encode('latin-1'))
+
+    async def send(self, send):
+        iterator = self.body if hasattr(self.body, '__aiter__') else None
+        if iterator is None:
+            self.headers.append((b'content-length', str(len(self.body)).encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': self.headers})
+        if iterator is None:
+            await send({'type': 'http.response.body', 'body': self.body})
+            return
+        async for chunk in iterator:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+def json_response(body, status=200, headers=None):
+    # El mismo cuerpo que jsonify (claves ordenadas, compacto, salto de línea final)
+    return Response(flask_app.json.response(body).get_data(), status, headers=headers)
+
+
+def list_response(body, headers=None):
+    # Los listados se codifican como en app.py, con serializers.dumps
+    return Response(json_body(body), headers=headers)
+
+
+async def cached_response(namespace, request, body, headers):
+    """Igual que compression.encoded_response: cuerpo de la cache, comprimido una vez por encoding."""
+    encoding, body = await asyncio.to_thread(compressed_body, namespace, request.full_path, body,
+                                             request.headers.get('accept-encoding'))
+    response = Response(body, headers=headers)
+    if encoding is not None:
+        response.set_encoding(encoding)
+    return response
+
+
+async def compress_response(request, response):
+    """Igual que el after_request de compression.py: Vary y el cuerpo comprimido, con su ETag, si corresponde."""
+    if not ENCODINGS:
+        return response
+    content_type = response.headers[0][1].decode('latin-1').split(';')[0]
+    if content_type in COMPRESSIBLE_MIMETYPES or response.status == 304:
+        response.headers.append((b'vary', b'Accept-Encoding'))
+    # En streaming se envía tal cual; las de cached_response ya están comprimidas
+    if not isinstance(response.body, bytes) or any(name == b'content-encoding' for name, _ in response.headers):
+        return response
+    encoding = negotiate(request.headers.get('accept-encoding'))
+    if encoding is not None and compressible(response.status, content_type, len(response.body)):
+        response.body = await asyncio.to_thread(compress, response.body, encoding)
+        response.set_encoding(encoding)
+    return response
+
+
+# Las mismas opciones que CORS(app) en app.py (lee la configuración CORS_* de la app)
+CORS_OPTIONS = get_cors_options(flask_app)
+
+
+def add_cors_headers(request, response):
+    """Igual que el after_request de flask_cors: estas rutas no pasan por los hooks de Flask."""
+    for name, value in get_cors_headers(CORS_OPTIONS, Headers(request.headers), request.method).items(multi=True):
+        response.headers.append((name.lower().encode('latin-1'), str(value).encode('latin-1')))
+    return response
+
+
+def validator_headers(etag, last_modified=None):
+    headers = {'etag': quote_etag(etag)}
+    if last_modified is not None:
+        headers['last-modified'] = http_date(last_modified.replace(tzinfo=timezone.utc))
+    return headers
+
+
+def conditional_get(request, etag, last_modified=None):
+    """Igual que utils.conditional_get: 304 si el cliente ya tiene esta versión."""
+    if 'if-none-match' in request.headers:
+        matched = matching_etag(parse_etags(request.headers['if-none-match']), etag)
+        not_modified, etag = matched is not None, matched or etag  # El 304 repite el ETag del cliente
+    else:
+        since = parse_date(request.headers.get('if-modified-since'))
+        not_modified = since is not None and last_modified is not None and \
+            last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since
+    if not not_modified:
+        return None
+    return Response(status=304, headers=validator_headers(etag, last_modified))
+
+
+def get_page_args(request):
+    """Igual que utils.get_page_args, leyendo la query string del scope."""
+    after = request.args.get('after')
+    limit = request.args.get('limit')
+    if after is None and limit is None:
+        return None
+    if limit is None:
+        limit = DEFAULT_PAGE_LIMIT
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise APIException('limit must be an integer', status_code=400)
+        if limit < 1:
+            raise APIException('limit must be greater than 0', status_code=400)
+    return {"after": decode_cursor(after) if after else None, "limit": min(limit, MAX_PAGE_LIMIT)}
+
+
+def get_stream_mode(request):
+    if request.accept_best == NDJSON_MIMETYPE:
+        return 'ndjson'
+    if request.args.get('stream') in ('1', 'true'):
+        return 'json'
+    return None
+
+
+#------------------------------------------------------------------------HANDLERS-------------------------------------------------------------
+
+async def _cached(namespace, key, load):
+    """cache.get_or_set con una función de carga asíncrona (la clave se fija antes de cargar, igual que allí)."""
+    full_key, value = await asyncio.to_thread(_lookup, namespace, key)
+    if value is None:
+        value = await load()
+        if value is not None:
+            await asyncio.to_thread(cache.set_full, full_key, value)
+    return value
+
+
+def _lookup(namespace, key):
+    full_key = cache.full_key(namespace, key)
+    return full_key, cache.get_full(full_key)
+
+
+def _stream(serializer, statement, mode):
+    """Versión asíncrona de utils.stream_query: la sesión vive mientras dura el envío."""
+
+    async def generate():
+        async with Session() as session:
+            rows = await session.stream(statement, execution_options={"yield_per": STREAM_BATCH_SIZE})
+            separator = b''
+            if mode == 'json':
+                yield b'['
+            async for partition in rows.partitions():
+                batch = [dumps(serializer.to_dict(row)) for row in partition]
+                if mode == 'ndjson':
+                    yield b'\n'.join(batch) + b'\n'
+                else:
+                    yield separator + b','.join(batch)
+                    separator = b','
+            if mode == 'json':
+                yield b']'
+
+    return Response(generate(), content_type=NDJSON_MIMETYPE if mode == 'ndjson' else 'application/json')
+
+
+async def get_entities(model, ids, request):
+    """?ids=1,5,9 como en app.py: entradas de la cache de detalles y un solo SELECT ... IN para las que falten."""
+    fields = SERIALIZERS[model].parse_fields(request.args.get('fields'))
+    entries = await asyncio.to_thread(cache.get_many, model.__tablename__, ids)
+    missing = [entity_id for entity_id in ids if entries[entity_id] is None]
+    if missing:
+        async with Session() as session:
+            entities = (await session.scalars(entities_statement(model, missing))).all()
+            entries.update(await asyncio.to_thread(cache_entities, model, entities))
+    body, validators = ids_payload(ids, entries, fields)
+    not_modified = conditional_get(request, *validators)
+    if not_modified:
+        return not_modified
+    return list_response(body, headers=validator_headers(*validators))
+
+
+def list_handler(model):
+    async def handler(request):
+        ids = get_ids(request.args)
+        if ids is not None:
+            return await get_entities(model, ids, request)
+        page = get_page_args(request)
+        serializer = SERIALIZERS[model].only(SERIALIZERS[model].parse_fields(request.args.get('fields')))  # Filas -> dict sin objetos ORM, igual que en app.py
+        list_query = ListQuery.from_args(model, request.args, engine.dialect.name)
+
+        async def load_validators():
+            async with Session() as session:
+                row = (await session.execute(collection_validators_statement(model))).one()
+            return validators_from_collection_row(model, row, request.full_path, request.accept_best)
+
+        validators = await _cached(list_namespace(model), ('validators', request.full_path, request.accept_best), load_validators)
+        not_modified = conditional_get(request, *validators)
+        if not_modified:
+            return not_modified
+        headers = validator_headers(*validators)
+        statement = list_query.statement(serializer)
+
+        if page is not None:
+            async def build_page():
+                async with Session() as session:
+                    rows = (await session.execute(list_query.page_statement(serializer, **page))).all()
+                items, next_cursor = list_query.paginate(serializer, rows, page['limit'])
+                return json_body({"results": items, "next": next_cursor})
+            # Mismas entradas (cuerpo ya codificado) que get_list_page en app.py
+            body = await _cached(list_namespace(model), request.full_path, build_page)
+            return await cached_response(list_namespace(model), request, body, headers)
+
+        stream_mode = get_stream_mode(request)
+        if stream_mode is not None:
+            response = _stream(serializer, statement, stream_mode)
+            response.headers.extend((name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items())
+            return response
+
+        async def build_list():
+            async with Session() as session:
+                return json_body([serializer.to_dict(row) for row in await session.execute(statement)])
+        body = await _cached(list_namespace(model), request.full_path, build_list)
+        return await cached_response(list_namespace(model), request, body, headers)
+    return handler
+
+
+def detail_handler(model, not_found):
+    async def handler(request, entity_id):
+        fields = SERIALIZERS[model].parse_fields(request.args.get('fields'))
+
+        async def load():
+            async with Session() as session:
+                row = (await session.execute(entity_validators_statement(model, entity_id))).first()
+                validators = validators_from_entity_row(model, entity_id, row)
+                if validators is None:
+                    return None
+                entity = await session.get(model, entity_id, options=model.serialize_options())
+                return validators, entity.serialize()
+
+        # Misma clave que cache.get_entity: las dos modalidades comparten entradas e invalidaciones
+        entry = await _cached(model.__tablename__, entity_id, load)
+        if entry is None:
+            return json_response({'error': not_found}, 404)
+        validators, serialized = projected_validators(entry[0], fields), project(entry[1], fields)
+        not_modified = conditional_get(request, *validators)
+        if not_modified:
+            return not_modified
+        return json_response(serialized, headers=validator_headers(*validators))
+    return handler
+
+
+async def get_user_favorites(request):
+    fields = SERIALIZERS[Favoritos].parse_fields(request.args.get('fields'))
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return json_response({'message': 'User ID is required'}, 400)
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        return json_response({'message': 'User not found'}, 404)
+    async with Session() as session:
+        if await session.get(User, user_id) is None:
+            return json_response({'message': 'User not found'}, 404)
+        rows = await session.execute(user_favorites_statement(user_id))  # Vista user_favorite, como en Flask
+        return list_response(serialize_user_favorites(rows, fields))
+
+
+# path -> (regla de Flask equivalente, para las métricas, handler); el resto de rutas las atiende Flask
+ROUTES = {
+    '/characters': ('/characters', list_handler(Character)),
+    '/planets': ('/planets', list_handler(Planet)),
+    '/users/favoritos': ('/users/favoritos', get_user_favorites),
+}
+DETAIL_ROUTES = {
+    'character': ('/character/<int:character_id>', detail_handler(Character, 'Character not found')),
+    'planet': ('/planet/<int:planet_id>', detail_handler(Planet, 'Planet not found')),
+}
+
+
+def resolve(method, path):
+    if method != 'GET':
+        return None
+    path = path.rstrip('/') or '/'  # strict_slashes = False, como en app.py
+    if path in ROUTES:
+        return ROUTES[path] + ((),)
+    parts = path.strip('/').split('/')
+    if len(parts) == 2 and parts[0] in DETAIL_ROUTES and parts[1].isdigit():
+        return DETAIL_ROUTES[parts[0]] + ((int(parts[1]),),)
+    return None
+
+
+#------------------------------------------------------------------------DELEGAR EN FLASK-------------------------------------------------------------
+
+# Las rutas que no son async se atienden con la app WSGI en un pool de hilos, con la respuesta en streaming
+call_flask = WSGIMiddleware(flask_app, workers=int(os.getenv('ASGI_WSGI_WORKERS', 10)))
+
+
+#------------------------------------------------------------------------APLICACIÓN ASGI-------------------------------------------------------------
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    route = resolve(scope['method'], scope['path'])
+    if route is None:
+        return await call_flask(scope, receive, send)
+    rule, handler, arguments = route
+    request = Request(scope)
+    token = start_request()
+    start = time.perf_counter()
+    try:
+        response = await handler(request, *arguments)
+    except APIException as error:
+        response = json_response(error.to_dict(), error.status_code)
+    except Exception as e:
+        response = json_response({'error': str(e)}, 500)
+    response = add_cors_headers(request, await compress_response(request, response))
+    size = len(response.body) if isinstance(response.body, bytes) else None  # En streaming no se conoce de antemano
+    finish_request(token, rule, request.method, str(response.status), time.perf_counter() - start, size, request.full_path)
+    await response.send(send)
@@ -0,0 +1,732 @@
+"""
+Benchmarks de rendimiento, disponibles como comandos `flask bench <comando>`.
+
+Trabajan sobre una base de datos desechable (un SQLite temporal por defecto, o la
+indicada con --database-url), nunca sobre la base de datos de la aplicación.
+"""
+import asyncio
+import http.client
+import json
+import os
+import socket
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import create_engine, insert, select, delete, Boolean, Date, DateTime, Integer, String, Text
+from sqlalchemy.orm import Session as OrmSession
+from models import db, fill_numeric, User, Planet, Character, Favoritos
+from favorites import rebuild_user_favorites
+from db_pool import pool_stats
+from serializers import SERIALIZERS, orjson
+
+bench_cli = AppGroup('bench', help='Benchmarks de rendimiento.')
+
+
+def summarize(samples):
+    """Percentiles en milisegundos de una lista de duraciones en segundos."""
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 4)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 4),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 4),
+    }
+
+
+def scratch_engine(database_url):
+    if database_url:
+        return create_engine(database_url), None
+    handle, path = tempfile.mkstemp(suffix='.db', prefix='bench-')
+    os.close(handle)
+    return create_engine('sqlite:///' + path), path
+
+
+def insert_chunked(connection, table, rows, chunk_size=10000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            connection.execute(insert(table), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(insert(table), chunk)
+
+
+def run_threads(threads, iterations, send):
+    """Lanza `threads` hilos que arrancan a la vez y hacen send(client, i) `iterations` veces cada uno.
+
+    Devuelve ({código: cantidad}, latencias en segundos, duración total).
+    """
+    app = current_app._get_current_object()
+    barrier = threading.Barrier(threads)
+    statuses, latencies, lock = {}, [], threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        barrier.wait()  # Todos los hilos arrancan a la vez
+        for i in range(iterations):
+            start = time.perf_counter()
+            response = send(client, i)
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                latencies.append(elapsed)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return statuses, latencies, time.perf_counter() - start
+
+
+def write_results(results, output):
+    click.echo(json.dumps(results, indent=2))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+#------------------------------------------------------------------------FAVORITOS-------------------------------------------------------------
+
+def _time_favorite_queries(engine, pairs):
+    table = Favoritos.__table__
+    lookups, deletes = [], []
+    with engine.connect() as connection:
+        for user_id, planet_id in pairs:
+            start = time.perf_counter()
+            connection.execute(select(table.c.id).where(table.c.user_id == user_id, table.c.planet_id == planet_id)).first()
+            lookups.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            connection.execute(delete(table).where(table.c.user_id == user_id, table.c.planet_id == planet_id))
+            deletes.append(time.perf_counter() - start)
+            connection.rollback()  # El mismo estado para la siguiente medición
+    return {"lookup": summarize(lookups), "delete": summarize(deletes)}
+
+
+@bench_cli.command('favorites')
+@click.option('--rows', default=1000000, show_default=True, help='Favoritos a generar.')
+@click.option('--users', default=10000, show_default=True)
+@click.option('--samples', default=500, show_default=True, help='Búsquedas/borrados medidos en cada fase.')
+@click.option('--database-url', default=None, help='Base de datos desechable (por defecto un SQLite temporal).')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Guardar los resultados en JSON.')
+def bench_favorites(rows, users, samples, database_url, output):
+    """Latencia de búsqueda/borrado de favoritos sin y con los índices (user_id, destino)."""
+    engine, path = scratch_engine(database_url)
+    targets = -(-rows // users)  # Destinos distintos por usuario para que todos los pares sean únicos
+    try:
+        db.metadata.create_all(engine)
+        indexes = list(Favoritos.__table__.indexes)
+        for index in indexes:
+            index.drop(engine)
+
+        click.echo('Seeding %d favorites for %d users...' % (rows, users))
+        with engine.begin() as connection:
+            insert_chunked(connection, User.__table__, (
+                {"id": i, "email": "user%d@bench" % i, "password": "x", "username": "user%d" % i, "name": "N", "last_name": "L"}
+                for i in range(1, users + 1)))
+            insert_chunked(connection, Planet.__table__, ({"id": i, "name": "Planet %d" % i} for i in range(1, targets + 1)))
+            insert_chunked(connection, Character.__table__, ({"id": i, "name": "Character %d" % i} for i in range(1, targets + 1)))
+            # Mitad planetas, mitad personajes
+            insert_chunked(connection, Favoritos.__table__, (
+                {"user_id": i % users + 1,
+                 "planet_id": i // users + 1 if i % 2 == 0 else None,
+                 "character_id": i // users + 1 if i % 2 else None}
+                for i in range(rows)))
+
+        existing = [(i % users + 1, i // users + 1) for i in random.sample(range(0, rows, 2), min(samples, rows // 2))]
+        results = {"rows": rows, "users": users, "database": engine.url.get_backend_name()}
+        results["without_indexes"] = _time_favorite_queries(engine, existing)
+
+        start = time.perf_counter()
+        for index in indexes:
+            index.create(engine)
+        results["index_build_seconds"] = round(time.perf_counter() - start, 3)
+        results["with_indexes"] = _time_favorite_queries(engine, existing)
+        write_results(results, output)
+    finally:
+        engine.dispose()
+        if path:
+            os.remove(path)
+
+
+#------------------------------------------------------------------------SIGNUP CONCURRENTE-------------------------------------------------------------
+
+@bench_cli.command('signup')
+@click.option('--threads', default=32, show_default=True)
+@click.option('--users', default=50, show_default=True, help='Usuarios distintos que todos los hilos intentan crear.')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Guardar los resultados en JSON.')
+@click.confirmation_option(prompt='bench signup writes and deletes users in DATABASE_URL. Continue?')
+def bench_signup(threads, users, output):
+    """Crea los mismos usuarios desde muchos hilos a la vez: cada uno debe quedar creado exactamente una vez.
+
+    Usa la base de datos configurada en DATABASE_URL (pide confirmación; --yes la omite) y borra los
+    usuarios de prueba al terminar. La corrección la cubre tests/test_signup.py sobre una base temporal;
+    este comando mide el throughput y la latencia contra una base real.
+    """
+    prefix = 'bench-%s-' % uuid.uuid4().hex[:8]
+
+    def signup(client, i):
+        payload = {"email": "%s%d@bench" % (prefix, i), "username": "%s%d" % (prefix, i),
+                   "password": "x", "name": "Bench", "last_name": "User"}
+        return client.post('/users', json=payload)
+
+    statuses, latencies, elapsed = run_threads(threads, users, signup)
+
+    created = User.query.filter(User.email.like(prefix + '%')).count()
+    User.query.filter(User.email.like(prefix + '%')).delete(synchronize_session=False)
+    db.session.commit()
+
+    results = {
+        "threads": threads,
+        "users": users,
+        "requests": threads * users,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "users_in_database": created,
+        "correct": created == users and statuses.get(201, 0) == users and statuses.get(409, 0) == users * (threads - 1),
+        "throughput_rps": round(threads * users / elapsed, 1),
+        "latency": summarize(latencies),
+    }
+    write_results(results, output)
+    if not results["correct"]:
+        raise click.ClickException('Concurrent signup created duplicates or failed requests')
+
+
+#------------------------------------------------------------------------POOL DE CONEXIONES-------------------------------------------------------------
+
+def _pool_env(settings):
+    """'DB_POOL_SIZE=20,DB_MAX_OVERFLOW=30' -> dict."""
+    env = {}
+    for assignment in filter(None, (part.strip() for part in settings.split(','))):
+        name, _, value = assignment.partition('=')
+        if not name.startswith('DB_'):
+            raise click.BadParameter('expected DB_*=value pairs, got %r' % assignment, param_hint='--tuned')
+        env[name] = value
+    return env
+
+
+def _run_pool_child(label, env_overrides, threads, requests, route):
+    handle, output = tempfile.mkstemp(suffix='.json', prefix='bench-pool-')
+    os.close(handle)
+    env = {name: value for name, value in os.environ.items() if not name.startswith('DB_POOL_') and name != 'DB_MAX_OVERFLOW'}
+    env.update(env_overrides)
+    command = [sys.executable, '-m', 'flask', '--app', os.path.join(current_app.root_path, 'app.py'), 'bench', 'pool',
+               '--no-compare', '--threads', str(threads), '--requests', str(requests), '--route', route, '--output', output]
+    try:
+        click.echo('Running %s (%s)...' % (label, ', '.join('%s=%s' % item for item in env_overrides.items()) or 'SQLAlchemy defaults'))
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(output) as f:
+            results = json.load(f)
+    finally:
+        os.remove(output)
+    results["settings"] = env_overrides
+    return results
+
+
+@bench_cli.command('pool')
+@click.option('--threads', default=50, show_default=True, help='Peticiones concurrentes.')
+@click.option('--requests', default=20, show_default=True, help='Peticiones por hilo.')
+@click.option('--route', default='/users', show_default=True, help='Ruta GET que consulta la base de datos.')
+@click.option('--tuned', default='DB_POOL_SIZE=20,DB_MAX_OVERFLOW=30,DB_POOL_TIMEOUT=10,DB_POOL_RECYCLE=1800', show_default=True,
+              help='Configuración del pool a comparar con la de por defecto.')
+@click.option('--compare/--no-compare', default=True, show_default=True,
+              help='Medir por defecto y --tuned en procesos separados, o solo la configuración actual.')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Guardar los resultados en JSON.')
+def bench_pool(threads, requests, route, tuned, compare, output):
+    """Rendimiento de una ruta bajo carga concurrente con el pool por defecto y con el pool ajustado.
+
+    Usa la base de datos configurada en DATABASE_URL (solo peticiones GET).
+    """
+    if compare:
+        results = {
+            "route": route,
+            "threads": threads,
+            "defaults": _run_pool_child('defaults', {}, threads, requests, route),
+            "tuned": _run_pool_child('tuned', _pool_env(tuned), threads, requests, route),
+        }
+        write_results(results, output)
+        return
+
+    statuses, latencies, elapsed = run_threads(threads, requests, lambda client, i: client.get(route))
+    results = {
+        "route": route,
+        "threads": threads,
+        "requests": threads * requests,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(threads * requests / elapsed, 1),
+        "latency": summarize(latencies),
+        "pool": pool_stats(db.engine),
+    }
+    write_results(results, output)
+
+
+#------------------------------------------------------------------------WSGI vs ASGI-------------------------------------------------------------
+
+SERVER_COMMANDS = {
+    # Workers síncronos de gunicorn: cada petición ocupa un proceso hasta terminar de leerla y responderla
+    'wsgi': lambda src, port, workers: [sys.executable, '-m', 'gunicorn', 'wsgi', '--chdir', src, '--workers', str(workers),
+                                        '--bind', '127.0.0.1:%d' % port, '--log-level', 'warning'],
+    # Bucle de eventos: las peticiones esperando al cliente o a la base de datos no bloquean a las demás
+    'asgi': lambda src, port, workers: [sys.executable, '-m', 'uvicorn', 'asgi:application', '--app-dir', src, '--workers', str(workers),
+                                        '--port', str(port), '--log-level', 'warning'],
+}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def _slow_get(port, route, read_rate, timeout):
+    """GET desde un cliente lento que lee la respuesta a read_rate bytes/s con un buffer de recepción pequeño."""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16384)
+        sock.setblocking(False)
+        await asyncio.wait_for(loop.sock_connect(sock, ('127.0.0.1', port)), timeout)
+        reader, writer = await asyncio.open_connection(sock=sock, limit=16384)
+        writer.write(('GET %s HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n' % route).encode('latin-1'))
+        await writer.drain()
+        first = b''
+        while True:
+            chunk = await asyncio.wait_for(reader.read(16384), timeout)
+            if not chunk:
+                break
+            first = first or chunk
+            await asyncio.sleep(len(chunk) / read_rate)
+        writer.close()
+        status = int(first.split(b' ', 2)[1]) if first else 0
+    except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+        status = 0  # Conexión rechazada, cortada o sin respuesta a tiempo
+    return status, time.perf_counter() - start
+
+
+async def _run_clients(port, route, clients, read_rate, timeout):
+    start = time.perf_counter()
+    results = await asyncio.gather(*[_slow_get(port, route, read_rate, timeout) for _ in range(clients)])
+    return results, time.perf_counter() - start
+
+
+def _wait_until_ready(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise click.ClickException('Server exited with code %d' % process.returncode)
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise click.ClickException('Server did not start listening on port %d' % port)
+
+
+@bench_cli.command('http')
+@click.option('--clients', default=50, show_default=True, help='Clientes lentos concurrentes.')
+@click.option('--read-rate', default=500, show_default=True, help='KB/s que lee cada cliente.')
+@click.option('--rows', default=5000, show_default=True, help='Personajes en la base de datos de prueba (tamaño de la respuesta).')
+@click.option('--workers', default=2, show_default=True, help='Procesos del servidor en cada modo.')
+@click.option('--route', default='/characters', show_default=True)
+@click.option('--timeout', default=120.0, show_default=True, help='Segundos máximos por petición.')
+@click.option('--mode', 'modes', type=click.Choice(sorted(SERVER_COMMANDS)), multiple=True, help='Modos a medir (por defecto ambos).')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Guardar los resultados en JSON.')
+def bench_http(clients, read_rate, rows, workers, route, timeout, modes, output):
+    """Clientes lentos concurrentes contra gunicorn (wsgi.py) y contra uvicorn (asgi.py) con los mismos procesos.
+
+    Los servidores usan una base de datos SQLite temporal con --rows personajes: un worker
+    síncrono queda ocupado mientras el cliente lee la respuesta; el bucle de eventos no.
+    """
+    src = current_app.root_path
+    engine, path = scratch_engine(None)
+    results = {"route": route, "clients": clients, "read_rate_kbps": read_rate, "rows": rows, "workers": workers}
+    try:
+        db.metadata.create_all(engine)
+        now = datetime.utcnow()
+        with engine.begin() as connection:
+            insert_chunked(connection, Planet.__table__, ({"id": i, "name": "Planet %d" % i, "created": now, "edited": now} for i in range(1, 101)))
+            insert_chunked(connection, Character.__table__, (
+                {"id": i, "name": "Character %d" % i, "gender": "n/a", "height": "172", "eye_color": "blue", "skin_color": "fair",
+                 "hair_color": "blond", "url": "https://swapi.dev/api/people/%d/" % i, "homeworld_id": i % 100 + 1, "created": now, "edited": now}
+                for i in range(1, rows + 1)))
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + path)
+
+        for mode in modes or sorted(SERVER_COMMANDS, reverse=True):
+            port = _free_port()
+            click.echo('Starting %s server on port %d...' % (mode, port))
+            process = subprocess.Popen(SERVER_COMMANDS[mode](src, port, workers), env=env, stdout=subprocess.DEVNULL)
+            try:
+                _wait_until_ready(port, process)
+                asyncio.run(_run_clients(port, route, workers, 1 << 30, timeout))  # Calentar la cache y el pool
+                responses, elapsed = asyncio.run(_run_clients(port, route, clients, read_rate * 1024, timeout))
+            finally:
+                process.terminate()
+                process.wait()
+            statuses = {}
+            for status, _ in responses:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            results[mode] = {
+                "statuses": statuses,
+                "seconds": round(elapsed, 3),
+                "throughput_rps": round(clients / elapsed, 1),
+                "latency": summarize([latency for _, latency in responses]),
+            }
+        write_results(results, output)
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+#------------------------------------------------------------------------SUITE DE ENDPOINTS-------------------------------------------------------------
+
+# Volúmenes por defecto de `flask bench seed` / `flask bench run` (tabla -> filas)
+DEFAULT_VOLUMES = {
+    'film': 50,
+    'planet': 1000,
+    'species': 200,
+    'starship': 500,
+    'vehicle': 500,
+    'character': 10000,
+    'user': 1000,
+    'favoritos': 20000,
+}
+SEED_ORDER = ('film', 'planet', 'species', 'starship', 'vehicle', 'character', 'user')
+
+# Query string necesaria para rutas GET que no responden sin ella, y variantes extra a medir
+ROUTE_QUERY = {
+    '/users/favoritos': 'user_id=1',
+    '/favoritos/top': 'type=planet',
+    '/search': 'q=arid',
+}
+ROUTE_VARIANTS = {
+    '/users': ['limit=50'],
+    '/favoritos': ['limit=50'],
+    '/characters': ['limit=50', 'ids=' + ','.join(str(i) for i in range(1, 100, 2))],
+    '/planets': ['limit=50', 'ids=1,5,9,13,17'],
+    '/films': ['expand=planets,characters'],
+    '/starships': ['limit=50', 'limit=50&expand=films', 'limit=50&expand=films.planets.films'],
+    '/vehicles': ['limit=50'],
+    '/species': ['limit=50&expand=homeworld,films'],
+    '/search': ['q=name+1&limit=20', 'q=arid&type=planet'],
+}
+SKIPPED_ROUTES = ('/metrics', '/cache/stats', '/pool/stats', '/static', '/admin')
+
+
+def _value(column, i, rng, now, counts):
+    """Valor sintético determinista para una columna según su tipo."""
+    if column.foreign_keys:
+        target = next(iter(column.foreign_keys)).column.table.name
+        return rng.randint(1, counts[target]) if counts.get(target) else None
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        return True
+    if isinstance(column_type, Integer):
+        return i
+    if isinstance(column_type, DateTime):
+        return now
+    if isinstance(column_type, Date):
+        return now.date()
+    if isinstance(column_type, (String, Text)):
+        value = '%s %d' % (column.name, i) if column.unique or column.name in ('name', 'title') else rng.choice(('unknown', 'n/a', '100', 'blue', 'arid'))
+        if column.name == 'url':
+            value = 'https://swapi.dev/api/%s/%d/' % (column.table.name, i)
+        length = getattr(column_type, 'length', None)
+        return value[:length] if length else value
+    return None
+
+
+def seed_database(engine, volumes, seed=42):
+    """Crea las tablas y las llena con volumes[tabla] filas sintéticas (mismo resultado para la misma semilla)."""
+    rng = random.Random(seed)
+    now = datetime(2024, 1, 1)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        counts = {}
+        for name in SEED_ORDER:
+            table = db.metadata.tables[name]
+            columns = [column for column in table.columns if not column.primary_key]
+            insert_chunked(connection, table, (
+                fill_numeric(name, dict({column.name: _value(column, i, rng, now, counts) for column in columns}, id=i))
+                for i in range(1, volumes[name] + 1)))
+            counts[name] = volumes[name]
+
+        # Favoritos únicos por (usuario, destino), alternando planetas y personajes
+        users = counts['user']
+        targets = min(counts['planet'], counts['character'])
+        total = min(volumes['favoritos'], users * targets * 2)
+        insert_chunked(connection, Favoritos.__table__, (
+            {"user_id": i % users + 1,
+             "planet_id": i // users // 2 + 1 if i // users % 2 == 0 else None,
+             "character_id": i // users // 2 + 1 if i // users % 2 else None}
+            for i in range(total)))
+        counts['favoritos'] = total
+        rebuild_user_favorites(connection)  # Vista de /users/favoritos
+    return counts
+
+
+def _ensure_empty(engine):
+    db.metadata.create_all(engine)
+    with engine.connect() as connection:
+        if connection.execute(select(Character.id).limit(1)).first() is not None:
+            raise click.ClickException('%s already has data; use an empty database' % engine.url.render_as_string(hide_password=True))
+
+
+def get_routes(app):
+    """URLs de todas las rutas GET de la app, con los parámetros rellenados con id 1."""
+    urls = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if 'GET' not in rule.methods or rule.rule == '/' or rule.rule.startswith(SKIPPED_ROUTES):
+            continue
+        path = re.sub(r'<(?:[^:>]+:)?[^>]+>', '1', rule.rule)
+        query = ROUTE_QUERY.get(rule.rule)
+        urls.append(path + ('?' + query if query else ''))
+        urls.extend(path + '?' + variant for variant in ROUTE_VARIANTS.get(rule.rule, ()))
+    return urls
+
+
+def _measure(send, urls, requests, warmup):
+    """{url: percentiles + throughput} enviando cada URL `requests` veces con send(url) -> código."""
+    results = {}
+    for url in urls:
+        for _ in range(warmup):
+            send(url)
+        statuses, samples = {}, []
+        for _ in range(requests):
+            start = time.perf_counter()
+            status = send(url)
+            samples.append(time.perf_counter() - start)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        results[url] = dict(summarize(samples), statuses=statuses, throughput_rps=round(len(samples) / sum(samples), 1))
+    return results
+
+
+def _http_sender(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def send(url):
+        connection.request('GET', url)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    return send
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=current_app.root_path, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=current_app.root_path,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _volume_options(command):
+    for name in reversed(list(DEFAULT_VOLUMES)):
+        command = click.option('--%s' % name.replace('_', '-'), name, default=DEFAULT_VOLUMES[name], show_default=True,
+                               help='Filas de %s.' % name)(command)
+    return command
+
+
+@bench_cli.command('seed')
+@click.option('--database-url', required=True, help='Base de datos a llenar (p. ej. sqlite:////tmp/bench.db o postgresql://localhost/bench).')
+@click.option('--seed', default=42, show_default=True, help='Semilla de los datos sintéticos.')
+@_volume_options
+def bench_seed(database_url, seed, **volumes):
+    """Crea y llena una base de datos de benchmark con datos sintéticos. Debe estar vacía."""
+    engine = create_engine(database_url)
+    try:
+        _ensure_empty(engine)
+        started = time.perf_counter()
+        counts = seed_database(engine, volumes, seed)
+        click.echo('Seeded %s in %.1fs' % (', '.join('%d %s' % (count, name) for name, count in counts.items()), time.perf_counter() - started))
+    finally:
+        engine.dispose()
+
+
+@bench_cli.command('routes')
+@click.option('--requests', default=50, show_default=True, help='Peticiones medidas por ruta.')
+@click.option('--warmup', default=5, show_default=True, help='Peticiones previas sin medir (llenan caches y pool).')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Guardar los resultados en JSON.')
+def bench_routes(requests, warmup, output):
+    """Latencia de todas las rutas GET con el test client de Flask contra DATABASE_URL (ya sembrada)."""
+    client = current_app.test_client()
+    results = _measure(lambda url: client.get(url).status_code, get_routes(current_app), requests, warmup)
+    write_results(results, output)
+
+
+@bench_cli.command('run')
+@click.option('--database-url', default=None, help='Base de datos vacía a sembrar (por defecto un SQLite temporal).')
+@click.option('--target', 'targets', type=click.Choice(['testclient', 'gunicorn']), multiple=True,
+              help='Dónde medir (por defecto ambos).')
+@click.option('--workers', default=2, show_default=True, help='Workers de gunicorn.')
+@click.option('--requests', default=50, show_default=True, help='Peticiones medidas por ruta.')
+@click.option('--warmup', default=5, show_default=True)
+@click.option('--seed', default=42, show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Guardar los resultados en JSON.')
+@_volume_options
+def bench_run(database_url, targets, workers, requests, warmup, seed, output, **volumes):
+    """Siembra una base de datos y mide todas las rutas GET con el test client y con gunicorn.
+
+    El JSON incluye el commit, para comparar dos ejecuciones con `flask bench compare`.
+    """
+    engine, path = scratch_engine(database_url)
+    src = current_app.root_path
+    try:
+        _ensure_empty(engine)
+        click.echo('Seeding %s...' % engine.url.get_backend_name())
+        counts = seed_database(engine, volumes, seed)
+        url = engine.url.render_as_string(hide_password=False)
+        env = dict(os.environ, DATABASE_URL=url)
+        results = {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            "python": sys.version.split()[0],
+            "database": engine.url.get_backend_name(),
+            "volumes": counts,
+            "requests": requests,
+        }
+        for target in targets or ('testclient', 'gunicorn'):
+            click.echo('Measuring with %s...' % target)
+            if target == 'testclient':
+                # Proceso aparte: la app de este proceso está ligada a su propia DATABASE_URL
+                handle, child_output = tempfile.mkstemp(suffix='.json', prefix='bench-routes-')
+                os.close(handle)
+                try:
+                    subprocess.run([sys.executable, '-m', 'flask', '--app', os.path.join(src, 'app.py'), 'bench', 'routes',
+                                    '--requests', str(requests), '--warmup', str(warmup), '--output', child_output],
+                                   env=env, check=True, stdout=subprocess.DEVNULL)
+                    with open(child_output) as f:
+                        results[target] = json.load(f)
+                finally:
+                    os.remove(child_output)
+            else:
+                port = _free_port()
+                process = subprocess.Popen(SERVER_COMMANDS['wsgi'](src, port, workers), env=env, stdout=subprocess.DEVNULL)
+                try:
+                    _wait_until_ready(port, process)
+                    results[target] = _measure(_http_sender(port), get_routes(current_app), requests, warmup)
+                finally:
+                    process.terminate()
+                    process.wait()
+        write_results(results, output)
+    finally:
+        engine.dispose()
+        if path:
+            os.remove(path)
+
+
+@bench_cli.command('compare')
+@click.argument('baseline', type=click.File('r'))
+@click.argument('candidate', type=click.File('r'))
+@click.option('--metric', default='p50_ms', show_default=True, type=click.Choice(['mean_ms', 'p50_ms', 'p90_ms', 'p99_ms']))
+@click.option('--threshold', default=20.0, show_default=True, help='% de empeoramiento que cuenta como regresión.')
+def bench_compare(baseline, candidate, metric, threshold):
+    """Compara dos resultados de `flask bench run` y falla si alguna ruta empeoró más de --threshold %."""
+    old, new = json.load(baseline), json.load(candidate)
+    click.echo('%s -> %s (%s)' % (old.get('commit'), new.get('commit'), metric))
+    regressions = 0
+    for target in ('testclient', 'gunicorn'):
+        if target not in old or target not in new:
+            continue
+        click.echo('\n%s' % target)
+        for url, after in new[target].items():
+            before = old[target].get(url)
+            if before is None:
+                click.echo('  %-40s %10s -> %8.3f ms  (new)' % (url, '', after[metric]))
+                continue
+            change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            click.echo('  %-40s %8.3f -> %8.3f ms  %+6.1f%%%s' % (url, before[metric], after[metric], change, flag))
+    if regressions:
+        raise click.ClickException('%d routes regressed more than %.0f%%' % (regressions, threshold))
+
+
+#------------------------------------------------------------------------SERIALIZACIÓN-------------------------------------------------------------
+
+def _timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+@bench_cli.command('serialize')
+@click.option('--rows', default=100000, show_default=True, help='Personajes en la respuesta de /characters.')
+@click.option('--iterations', default=5, show_default=True, help='Repeticiones de cada variante (se informa la mediana).')
+@click.option('--database-url', default=None, help='Base de datos vacía (por defecto un SQLite temporal).')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Guardar los resultados en JSON.')
+def bench_serialize(rows, iterations, database_url, output):
+    """Cuerpo completo de /characters: objetos ORM + serialize() + jsonify frente a filas + serializers.py.
+
+    Mide por separado la consulta, la conversión a dicts y la codificación JSON, y
+    comprueba que todas las variantes producen el mismo JSON.
+    """
+    engine, path = scratch_engine(database_url)
+    volumes = dict(DEFAULT_VOLUMES, character=rows, user=1, favoritos=0)
+    serializer = SERIALIZERS[Character]
+    provider = current_app.json
+    stdlib_dumps = lambda obj: provider.dumps(obj, separators=(',', ':')).encode('utf-8')  # Lo mismo que escribe jsonify
+    try:
+        _ensure_empty(engine)
+        seed_database(engine, volumes)
+        phases = {}
+
+        def record(variant, **timings):
+            for phase, seconds in dict(timings, total=sum(timings.values())).items():
+                phases.setdefault(variant, {}).setdefault(phase, []).append(seconds)
+
+        bodies = {}
+        for _ in range(iterations):
+            with OrmSession(engine) as session:
+                characters, load = _timed(lambda: session.scalars(select(Character).options(*Character.serialize_options()).order_by(Character.id)).all())
+                data, convert = _timed(lambda: [character.serialize() for character in characters])
+                bodies['orm'], encode = _timed(lambda: stdlib_dumps(data))
+                record('orm_serialize', query=load, to_dict=convert, encode=encode)
+            del characters, data
+
+            with engine.connect() as connection:
+                result, load = _timed(lambda: connection.execute(serializer.statement()).all())
+                data, convert = _timed(lambda: [serializer.to_dict(row) for row in result])
+                bodies['rows_stdlib'], encode = _timed(lambda: stdlib_dumps(data))
+                record('rows_stdlib', query=load, to_dict=convert, encode=encode)
+                if orjson is not None:
+                    bodies['rows_orjson'], encode = _timed(lambda: orjson.dumps(data, option=orjson.OPT_SORT_KEYS))
+                    record('rows_orjson', query=load, to_dict=convert, encode=encode)
+            del result, data
+
+        decoded = {variant: json.loads(body) for variant, body in bodies.items()}
+        if any(value != decoded['orm'] for value in decoded.values()):
+            raise click.ClickException('Serializers produced different JSON: %s' % ', '.join(sorted(decoded)))
+
+        results = {"rows": rows, "iterations": iterations, "response_bytes": len(bodies['orm'])}
+        for variant, timings in phases.items():
+            results[variant] = {phase: round(sorted(samples)[len(samples) // 2] * 1000, 1) for phase, samples in timings.items()}
+        baseline = results['orm_serialize']['total']
+        for variant in phases:
+            results[variant]['speedup'] = round(baseline / results[variant]['total'], 2)
+        write_results(results, output)
+    finally:
+        engine.dispose()
+        if path:
+            os.remove(path)
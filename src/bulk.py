@@ -0,0 +1,255 @@
+"""
+Altas masivas: lectura de lotes (array JSON o NDJSON), validación por elemento e
+inserción con executemany en una sola transacción o por bloques.
+"""
+import json
+from datetime import datetime, date
+from flask import request
+from sqlalchemy import insert, select, Integer, String, Text, DateTime, Date, Boolean
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, fill_numeric, numeric_shadow_columns, User, Favoritos
+from utils import APIException, NDJSON_MIMETYPE
+from cache import CACHED_MODELS, invalidate_model
+from favorites import insert_user_favorites
+
+BULK_MAX_ITEMS = 10000
+DEFAULT_CHUNK_SIZE = 1000
+
+# Columna destino de Favoritos -> modelo al que apunta
+FAVORITE_TARGETS = {
+    column.name: next(iter(column.foreign_keys)).column.table
+    for column in Favoritos.__table__.columns
+    if column.foreign_keys and column.name != 'user_id'
+}
+
+
+def read_bulk_items():
+    """Lee el cuerpo como array JSON o, con Content-Type application/x-ndjson, un objeto por línea."""
+    if request.mimetype == NDJSON_MIMETYPE:
+        items = []
+        for number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise APIException('Invalid JSON on line %d' % number, status_code=400)
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            raise APIException('Expected a JSON array or NDJSON body', status_code=400)
+    if not items:
+        raise APIException('No data provided', status_code=400)
+    if len(items) > BULK_MAX_ITEMS:
+        raise APIException('At most %d items per request' % BULK_MAX_ITEMS, status_code=413)
+    return items
+
+
+def get_bulk_args():
+    """?atomic=false confirma cada bloque por separado; ?chunk_size=N filas por executemany."""
+    atomic = request.args.get('atomic', 'true').lower() not in ('0', 'false')
+    try:
+        chunk_size = int(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        raise APIException('chunk_size must be an integer', status_code=400)
+    if chunk_size < 1:
+        raise APIException('chunk_size must be greater than 0', status_code=400)
+    return atomic, chunk_size
+
+
+def _coerce(column, value):
+    """Convierte el valor JSON al tipo de la columna. Devuelve (valor, error)."""
+    if value is None:
+        if not column.nullable:
+            return None, '%s cannot be null' % column.name
+        return None, None
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        if not isinstance(value, bool):
+            return None, '%s must be a boolean' % column.name
+    elif isinstance(column_type, Integer):
+        if isinstance(value, bool) or not isinstance(value, int):
+            return None, '%s must be an integer' % column.name
+    elif isinstance(column_type, DateTime):
+        try:
+            value = datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            return None, '%s must be an ISO 8601 datetime' % column.name
+    elif isinstance(column_type, Date):
+        try:
+            value = date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return None, '%s must be an ISO 8601 date' % column.name
+    elif isinstance(column_type, (String, Text)):
+        if not isinstance(value, str):
+            return None, '%s must be a string' % column.name
+        if getattr(column_type, 'length', None) and len(value) > column_type.length:
+            return None, '%s is longer than %d characters' % (column.name, column_type.length)
+    return value, None
+
+
+def validate_item(model, item):
+    """Valida un elemento contra las columnas del modelo. Devuelve (valores, errores).
+
+    Igual que los endpoints de alta individuales, las claves que no son columnas se ignoran.
+    """
+    if not isinstance(item, dict):
+        return None, ['item must be a JSON object']
+    values, errors = {}, []
+    computed = numeric_shadow_columns(model.__tablename__)  # Las columnas _num se derivan del texto, no se aceptan
+    for column in model.__table__.columns:
+        if column.primary_key or column.name in computed:
+            continue
+        if column.name not in item:
+            if not column.nullable and column.default is None:
+                errors.append('%s is required' % column.name)
+            continue
+        value, error = _coerce(column, item[column.name])
+        if error:
+            errors.append(error)
+        else:
+            values[column.name] = value
+    return fill_numeric(model.__tablename__, values), errors
+
+
+def validate_favorite(item):
+    values, errors = validate_item(Favoritos, item)
+    if errors:
+        return values, errors
+    targets = [column for column in FAVORITE_TARGETS if values.get(column) is not None]
+    if values.get('user_id') is None:
+        errors.append('user_id is required')
+    if len(targets) != 1:
+        errors.append('exactly one of %s is required' % ', '.join(FAVORITE_TARGETS))
+    return values, errors
+
+
+def check_favorite_references(rows):
+    """Comprueba con una consulta IN por tabla que existan usuarios, destinos y que no estén ya en favoritos.
+
+    rows es una lista de (índice, valores). Devuelve {índice: [errores]}.
+    """
+    errors = {}
+    user_ids = {values['user_id'] for _, values in rows}
+    found_users = set(db.session.scalars(select(User.id).where(User.id.in_(user_ids))))
+    seen = set()
+    for column, target_table in FAVORITE_TARGETS.items():
+        subset = [(index, values) for index, values in rows if values.get(column) is not None]
+        if not subset:
+            continue
+        target_ids = {values[column] for _, values in subset}
+        found_targets = set(db.session.scalars(select(target_table.c.id).where(target_table.c.id.in_(target_ids))))
+        favorite_column = Favoritos.__table__.c[column]
+        existing = set(db.session.execute(
+            select(Favoritos.user_id, favorite_column)
+            .where(Favoritos.user_id.in_(user_ids), favorite_column.in_(target_ids))).tuples())
+        for index, values in subset:
+            pair = (values['user_id'], values[column])
+            item_errors = []
+            if values['user_id'] not in found_users:
+                item_errors.append('User not found')
+            if values[column] not in found_targets:
+                item_errors.append('%s not found' % target_table.name)
+            if pair in existing or (column, pair) in seen:
+                item_errors.append('Favorite already exists')
+            seen.add((column, pair))
+            if item_errors:
+                errors[index] = item_errors
+    return errors
+
+
+def _insert_chunk(table, chunk):
+    """executemany de un bloque. Devuelve los ids en el orden de entrada (None si el dialecto no admite RETURNING).
+
+    executemany exige las mismas columnas en todas las filas: se agrupan por conjunto de claves para que
+    las columnas omitidas sigan tomando su valor por defecto (p. ej. Character.created).
+    """
+    dialect = db.session.get_bind().dialect
+    returning = getattr(dialect, 'insert_executemany_returning_sort_by_parameter_order', False)
+    groups = {}
+    for position, values in enumerate(chunk):
+        groups.setdefault(tuple(sorted(values)), []).append(position)
+    ids = [None] * len(chunk)
+    for positions in groups.values():
+        parameters = [chunk[position] for position in positions]
+        if returning:
+            statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+            for position, new_id in zip(positions, db.session.scalars(statement, parameters)):
+                ids[position] = new_id
+        else:
+            db.session.execute(insert(table), parameters)
+    return ids
+
+
+def bulk_insert(model, rows, atomic=True, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Inserta [(índice, valores)] por bloques de chunk_size con executemany.
+
+    atomic=True: una sola transacción, si falla un bloque no se inserta nada.
+    atomic=False: cada bloque se confirma por separado y los que fallan se informan.
+    Devuelve {índice: resultado}.
+    """
+    table = model.__table__
+    results = {}
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                ids = _insert_chunk(table, [values for _, values in chunk])
+                if model is Favoritos:
+                    # Filas de la vista de /users/favoritos en la misma transacción que el bloque
+                    insert_user_favorites(Favoritos.user_id.in_({values['user_id'] for _, values in chunk}))
+                if not atomic:
+                    db.session.commit()
+            except SQLAlchemyError as e:
+                if atomic:
+                    raise
+                db.session.rollback()
+                for index, _ in chunk:
+                    results[index] = {"index": index, "status": "error", "errors": [str(e.orig if hasattr(e, 'orig') else e)]}
+                continue
+            for (index, _), new_id in zip(chunk, ids):
+                results[index] = {"index": index, "status": "created", "id": new_id}
+        if atomic:
+            db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        message = str(e.orig if hasattr(e, 'orig') else e)
+        return {index: {"index": index, "status": "error", "errors": [message]} for index, _ in rows}
+    return results
+
+
+def bulk_response(items_count, results):
+    """Cuerpo y código: 201 si se creó todo, 207 si fue parcial, 422 si no se creó nada."""
+    ordered = [results[index] for index in range(items_count)]
+    created = sum(1 for result in ordered if result["status"] == "created")
+    status = 201 if created == items_count else (207 if created else 422)
+    return {"created": created, "failed": items_count - created, "results": ordered}, status
+
+
+def run_bulk(model, validate, check_references=None):
+    """Flujo completo de un endpoint /bulk: leer, validar todo, insertar y armar la respuesta por elemento."""
+    atomic, chunk_size = get_bulk_args()
+    items = read_bulk_items()
+    results, valid = {}, []
+    for index, item in enumerate(items):
+        values, errors = validate(item)
+        if errors:
+            results[index] = {"index": index, "status": "error", "errors": errors}
+        else:
+            valid.append((index, values))
+
+    if check_references is not None and valid:
+        reference_errors = check_references(valid)
+        for index, errors in reference_errors.items():
+            results[index] = {"index": index, "status": "error", "errors": errors}
+        valid = [(index, values) for index, values in valid if index not in reference_errors]
+
+    if results and atomic:
+        # En modo atómico un solo elemento inválido cancela todo el lote
+        for index, _ in valid:
+            results[index] = {"index": index, "status": "skipped", "errors": ['batch rejected: other items are invalid']}
+    elif valid:
+        results.update(bulk_insert(model, valid, atomic=atomic, chunk_size=chunk_size))
+        if issubclass(model, CACHED_MODELS):
+            invalidate_model(model, ids=[])  # El INSERT de Core no pasa por los eventos de la sesión
+    return bulk_response(len(items), results)
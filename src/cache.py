@@ -0,0 +1,523 @@
+"""
+Cache de las entidades del catalogo ya serializadas, con backends intercambiables.
+
+Las claves son (namespace, key). Cada modelo usa dos namespaces: '<tabla>' para
+los detalles por id y '<tabla>:list' para las paginas de listados. Las respuestas con
+?expand= mezclan varias tablas y van al namespace 'expand', que invalida cualquier escritura. Las escrituras
+hechas con la sesion de SQLAlchemy invalidan automaticamente las entradas
+afectadas cuando se confirma la transaccion (after_commit).
+
+Backends (variable de entorno CACHE_BACKEND):
+- memory (por defecto): LRU + TTL en el proceso, acotado en entradas (CACHE_MAX_ENTRIES) y en
+  bytes de los cuerpos guardados (CACHE_MAX_BYTES, 64 MiB; un cuerpo de mas de CACHE_MAX_ITEM_BYTES,
+  4 MiB, por ejemplo una tabla completa sin paginar, no se guarda). Si ademas se define CACHE_REDIS_URL,
+  las invalidaciones se publican por Redis pub/sub para que todos los workers de
+  gunicorn (y otros nodos) descarten sus copias. Sin CACHE_REDIS_URL cada worker solo ve sus
+  propias escrituras y puede servir datos viejos hasta CACHE_TTL: con varios workers
+  (WEB_CONCURRENCY o --workers en GUNICORN_CMD_ARGS) la app no arranca.
+- redis: una sola cache compartida en Redis (CACHE_REDIS_URL) para todos los workers.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, Film, Starship, Vehicle, Species, Planet, Character
+from utils import entity_validators, collection_validators, entities_statement, validators_from_entity
+
+logger = logging.getLogger(__name__)
+
+# Modelos de solo-lectura-mayormente cuyo serialize() se guarda en cache
+CACHED_MODELS = (Film, Starship, Vehicle, Species, Planet, Character)
+EXPAND_NAMESPACE = 'expand'
+
+
+def list_namespace(model):
+    return model.__tablename__ + ':list'
+
+
+def value_size(value):
+    """Bytes de los cuerpos ya codificados de un valor (bytes/str, tambien dentro de tuplas).
+
+    Los dicts de serialize() no se cuentan: son chicos y ya los acota CACHE_MAX_ENTRIES.
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(value_size(item) for item in value)
+    return 0
+
+
+class CacheBackend:
+    """Interfaz comun. Un valor None significa 'no esta en cache'."""
+
+    def get(self, namespace, key):
+        raise NotImplementedError
+
+    def set(self, namespace, key, value):
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        raise NotImplementedError
+
+    def invalidate_namespace(self, namespace):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def get_many(self, namespace, keys):
+        """{key: valor} de varias claves (None si no esta)."""
+        return {key: self.get(namespace, key) for key in keys}
+
+    def full_key(self, namespace, key):
+        """Clave interna de (namespace, key) con la generacion actual del namespace."""
+        raise NotImplementedError
+
+    def get_full(self, full_key):
+        raise NotImplementedError
+
+    def set_full(self, full_key, value):
+        raise NotImplementedError
+
+    def get_or_set(self, namespace, key, factory):
+        # La generacion se fija antes de llamar a factory(): si el namespace se invalida mientras
+        # tanto, el valor (quizas viejo) queda bajo la generacion anterior, inalcanzable
+        full_key = self.full_key(namespace, key)
+        value = self.get_full(full_key)
+        if value is None:
+            value = factory()
+            if value is not None:
+                self.set_full(full_key, value)
+        return value
+
+
+class MemoryBackend(CacheBackend):
+    """LRU acotado (entradas y bytes) con TTL dentro del proceso. Con un canal, difunde sus invalidaciones a los demas procesos."""
+
+    def __init__(self, max_entries=2048, ttl=300, channel=None, max_bytes=64 << 20, max_item_bytes=4 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_item_bytes = min(max_item_bytes, max_bytes)
+        self.ttl = ttl
+        self.channel = channel
+        self._entries = OrderedDict()  # (namespace, epoca, generacion, key) -> (expires_at, value, bytes)
+        self._bytes = 0
+        self._generations = {}  # namespace -> generacion; invalidar un namespace entero es O(1)
+        self._epoch = 0  # Sube con clear(): invalida todo, tambien lo que guarden las cargas en curso
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversized = 0
+        if channel is not None:
+            # Tras una reconexion se pudo perder cualquier invalidacion: se descarta todo lo local
+            channel.subscribe(self._apply_remote, on_reconnect=self.clear)
+
+    def _key(self, namespace, key):
+        return (namespace, self._epoch, self._generations.get(namespace, 0), key)
+
+    def full_key(self, namespace, key):
+        with self._lock:
+            return self._key(namespace, key)
+
+    def get(self, namespace, key):
+        return self.get_full(self.full_key(namespace, key))
+
+    def _pop(self, full_key):
+        entry = self._entries.pop(full_key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def get_full(self, full_key):
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._pop(full_key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, namespace, key, value):
+        self.set_full(self.full_key(namespace, key), value)
+
+    def set_full(self, full_key, value):
+        size = value_size(value)
+        with self._lock:
+            self._pop(full_key)
+            if size > self.max_item_bytes:
+                self.oversized += 1  # Se devuelve sin guardar: vaciaria la cache para una sola entrada
+                return
+            self._entries[full_key] = (time.monotonic() + self.ttl, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, namespace, key, broadcast=True):
+        with self._lock:
+            self._pop(self._key(namespace, key))
+        if broadcast and self.channel is not None:
+            self.channel.publish('delete', namespace, key)
+
+    def invalidate_namespace(self, namespace, broadcast=True):
+        # Las entradas de la generacion anterior quedan inalcanzables y salen por LRU/TTL
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        if broadcast and self.channel is not None:
+            self.channel.publish('namespace', namespace)
+
+    def _apply_remote(self, op, namespace, key=None):
+        if op == 'delete':
+            self.delete(namespace, key, broadcast=False)
+        elif op == 'namespace':
+            self.invalidate_namespace(namespace, broadcast=False)
+
+    def clear(self):
+        # Nueva epoca en vez de reiniciar las generaciones: una carga en curso no puede guardar bajo una clave que vuelva a usarse
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "oversized": self.oversized,
+                "ttl": self.ttl,
+                "shared_invalidation": self.channel is not None,
+            }
+
+
+class RedisBackend(CacheBackend):
+    """Cache compartida en Redis: todos los workers ven el mismo dato, asi que se mantienen coherentes.
+
+    Acepta cualquier cliente con la interfaz de redis-py (get/set/delete/incr/info), por ejemplo
+    fakeredis para pruebas locales. Un fallo de Redis se trata como un miss: la API sigue
+    respondiendo desde la base de datos.
+    """
+
+    def __init__(self, client, ttl=300, prefix='swapi:cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def _generation(self, namespace):
+        return int(self.client.get(self.prefix + 'gen:' + namespace) or 0)
+
+    def _key(self, namespace, key, generation=None):
+        if generation is None:
+            generation = self._generation(namespace)
+        return '%s%s:%d:%r' % (self.prefix, namespace, generation, key)
+
+    def full_key(self, namespace, key):
+        try:
+            return self._key(namespace, key)
+        except Exception as e:
+            logger.warning('Redis cache get failed: %s', e)
+            return None  # Sin generacion no se lee ni se guarda: la peticion va a la base de datos
+
+    def get(self, namespace, key):
+        return self.get_full(self.full_key(namespace, key))
+
+    def get_full(self, full_key):
+        try:
+            raw = self.client.get(full_key) if full_key is not None else None
+        except Exception as e:
+            logger.warning('Redis cache get failed: %s', e)
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def get_many(self, namespace, keys):
+        # Un solo MGET (y una lectura de la generacion) para todas las claves
+        try:
+            generation = self._generation(namespace)
+            raws = self.client.mget([self._key(namespace, key, generation) for key in keys])
+        except Exception as e:
+            logger.warning('Redis cache get failed: %s', e)
+            raws = [None] * len(keys)
+        values = {}
+        for key, raw in zip(keys, raws):
+            if raw is None:
+                self.misses += 1
+                values[key] = None
+            else:
+                self.hits += 1
+                values[key] = pickle.loads(raw)
+        return values
+
+    def set(self, namespace, key, value):
+        self.set_full(self.full_key(namespace, key), value)
+
+    def set_full(self, full_key, value):
+        if full_key is None:
+            return
+        try:
+            self.client.set(full_key, pickle.dumps(value), ex=self.ttl)
+        except Exception as e:
+            logger.warning('Redis cache set failed: %s', e)
+
+    def delete(self, namespace, key):
+        try:
+            self.client.delete(self._key(namespace, key))
+        except Exception as e:
+            logger.warning('Redis cache delete failed: %s', e)
+
+    def invalidate_namespace(self, namespace):
+        # Las claves de la generacion anterior expiran solas por TTL
+        try:
+            self.client.incr(self.prefix + 'gen:' + namespace)
+        except Exception as e:
+            logger.warning('Redis cache invalidation failed: %s', e)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+    def stats(self):
+        try:
+            evictions = self.client.info('stats').get('evicted_keys', 0)
+        except Exception:
+            evictions = None
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": evictions,
+            "ttl": self.ttl,
+        }
+
+
+class RedisInvalidationChannel:
+    """Canal pub/sub por el que cada proceso anuncia sus invalidaciones a los demas.
+
+    Si se corta la conexion con Redis, el hilo que escucha se vuelve a suscribir con espera exponencial
+    (de min_backoff a max_backoff segundos) y llama a on_reconnect: las invalidaciones publicadas
+    mientras tanto se perdieron.
+    """
+
+    def __init__(self, client, name='swapi:cache:invalidations', min_backoff=0.5, max_backoff=30):
+        self.client = client
+        self.name = name
+        self.origin = uuid.uuid4().hex  # Para ignorar los mensajes propios
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+
+    def publish(self, op, namespace, key=None):
+        try:
+            self.client.publish(self.name, pickle.dumps((self.origin, op, namespace, key)))
+        except Exception as e:
+            logger.warning('Cache invalidation publish failed: %s', e)
+
+    def _dispatch(self, message, callback):
+        try:
+            origin, op, namespace, key = pickle.loads(message['data'])
+        except Exception as e:
+            logger.warning('Ignoring malformed cache invalidation message: %s', e)
+            return
+        if origin != self.origin:
+            callback(op, namespace, key)
+
+    def subscribe(self, callback, on_reconnect=None):
+        def listen():
+            backoff = self.min_backoff
+            lost = False
+            while True:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(self.name)
+                    if lost:
+                        self.reconnects += 1
+                        logger.warning('Cache invalidation channel reconnected')
+                        if on_reconnect is not None:
+                            on_reconnect()
+                    lost = False
+                    backoff = self.min_backoff
+                    for message in pubsub.listen():
+                        self._dispatch(message, callback)
+                except Exception as e:
+                    logger.warning('Cache invalidation channel lost: %s; retrying in %.1fs', e, backoff)
+                lost = True
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+        thread = threading.Thread(target=listen, name='cache-invalidation', daemon=True)
+        thread.start()
+        return thread
+
+
+def redis_client(url):
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError('CACHE_REDIS_URL requires the redis package: pipenv install redis')
+    return redis.Redis.from_url(url)
+
+
+def configured_workers():
+    """Workers de gunicorn declarados en el entorno (WEB_CONCURRENCY o -w/--workers en GUNICORN_CMD_ARGS); 1 si no consta."""
+    args = os.getenv('GUNICORN_CMD_ARGS', '').replace('=', ' ').split()
+    for flag in ('-w', '--workers'):
+        if flag in args[:-1]:
+            return int(args[args.index(flag) + 1])
+    return int(os.getenv('WEB_CONCURRENCY') or 1)
+
+
+def create_cache():
+    """Construye el backend a partir de CACHE_BACKEND, CACHE_REDIS_URL, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES,
+    CACHE_MAX_ITEM_BYTES y CACHE_TTL.
+
+    Rechaza el backend memory sin CACHE_REDIS_URL si hay varios workers: las escrituras de uno no
+    invalidarian las copias de los demas."""
+    backend = os.getenv('CACHE_BACKEND', 'memory')
+    redis_url = os.getenv('CACHE_REDIS_URL')
+    ttl = int(os.getenv('CACHE_TTL', 300))
+    if backend == 'redis':
+        if not redis_url:
+            raise RuntimeError('CACHE_BACKEND=redis requires CACHE_REDIS_URL')
+        return RedisBackend(redis_client(redis_url), ttl=ttl)
+    if backend != 'memory':
+        raise RuntimeError('Unknown CACHE_BACKEND: %s' % backend)
+    if not redis_url:
+        workers = configured_workers()
+        if workers > 1:
+            raise RuntimeError('CACHE_BACKEND=memory with %d workers requires CACHE_REDIS_URL to invalidate every '
+                               'worker; set it or use CACHE_BACKEND=redis' % workers)
+        logger.warning('In-process cache without CACHE_REDIS_URL: with more than one worker each one may serve '
+                       'stale data for up to %ds after a write', ttl)
+    channel = RedisInvalidationChannel(redis_client(redis_url)) if redis_url else None
+    return MemoryBackend(max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 2048)), ttl=ttl, channel=channel,
+                         max_bytes=int(os.getenv('CACHE_MAX_BYTES', 64 << 20)),
+                         max_item_bytes=int(os.getenv('CACHE_MAX_ITEM_BYTES', 4 << 20)))
+
+
+cache = create_cache()
+
+
+def get_entity(model, entity_id):
+    """(validators, serialize()) de una entidad desde la cache, o de la base de datos si no esta. None si no existe."""
+    def load():
+        validators = entity_validators(model, entity_id)
+        if validators is None:
+            return None
+        entity = model.query.options(*model.serialize_options()).get(entity_id)
+        return validators, entity.serialize()
+    return cache.get_or_set(model.__tablename__, entity_id, load)
+
+
+def cache_entities(model, entities):
+    """Guarda (validators, serialize()) de entidades ya cargadas, con las mismas claves que get_entity."""
+    entries = {}
+    for entity in entities:
+        entry = entries[entity.id] = (validators_from_entity(model, entity), entity.serialize())
+        cache.set(model.__tablename__, entity.id, entry)
+    return entries
+
+
+def get_entities(model, ids):
+    """{id: (validators, serialize()) o None} de varias entidades; las que no estan en cache se leen con un solo SELECT ... IN."""
+    entries = cache.get_many(model.__tablename__, ids)
+    missing = [entity_id for entity_id in ids if entries[entity_id] is None]
+    if missing:
+        entries.update(cache_entities(model, db.session.scalars(entities_statement(model, missing))))
+    return entries
+
+
+def get_list_validators(model):
+    """ETag/Last-Modified del listado pedido, sin repetir los agregados count/max mientras no haya escrituras."""
+    key = ('validators', request.full_path, request.accept_mimetypes.best)
+    return cache.get_or_set(list_namespace(model), key, lambda: collection_validators(model))
+
+
+def get_list_page(model, build):
+    """Cuerpo JSON ya codificado del listado pedido (pagina o tabla completa), construido con build() si no esta en cache.
+
+    Se guardan bytes y no dicts: un acierto no vuelve a serializar (compression.py guarda al lado las versiones comprimidas).
+    Cuentan para CACHE_MAX_BYTES; una tabla completa mayor que CACHE_MAX_ITEM_BYTES se construye en cada peticion.
+    """
+    return cache.get_or_set(list_namespace(model), request.full_path, build)
+
+
+def get_expanded(build):
+    """(ETag, cuerpo JSON) de la respuesta con ?expand= pedida; build() devuelve los bytes o None (404).
+
+    El ETag es el hash del cuerpo: cambia con cualquier entidad expandida, no solo con la tabla principal.
+    """
+    def load():
+        body = build()
+        return (hashlib.sha1(body).hexdigest(), body) if body is not None else None
+    return cache.get_or_set(EXPAND_NAMESPACE, request.full_path, load)
+
+
+# Un cambio en un planeta o una pelicula altera el serialize() de los modelos que los muestran
+# (Character.homeworld, Species.homeworld...). Se deriva de etag_relations.
+_DEPENDENTS = {}
+for _model in CACHED_MODELS:
+    for _relation in getattr(_model, 'etag_relations', ()):
+        _target = getattr(_model, _relation).property.mapper.class_
+        _DEPENDENTS.setdefault(_target.__tablename__, set()).add(_model.__tablename__)
+
+
+def invalidate_model(model, ids=None):
+    """Invalida los detalles indicados (o todos) y los listados de un modelo y de sus dependientes."""
+    namespace = model.__tablename__
+    if ids is None:
+        cache.invalidate_namespace(namespace)
+    else:
+        for entity_id in ids:
+            cache.delete(namespace, entity_id)
+    cache.invalidate_namespace(list_namespace(model))
+    for dependent in _DEPENDENTS.get(namespace, ()):
+        cache.invalidate_namespace(dependent)
+        cache.invalidate_namespace(dependent + ':list')
+    cache.invalidate_namespace(EXPAND_NAMESPACE)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_invalidations(session, flush_context):
+    pending = session.info.setdefault('cache_invalidations', {})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CACHED_MODELS):
+            pending.setdefault(type(obj), set()).add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    for model, ids in session.info.pop('cache_invalidations', {}).items():
+        invalidate_model(model, ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('cache_invalidations', None)
@@ -0,0 +1,114 @@
+"""
+Compresión de respuestas negociada con Accept-Encoding: zstd, br (brotli) y gzip.
+
+- Se comprimen los cuerpos JSON/NDJSON/texto de al menos COMPRESSION_MIN_SIZE bytes (1024 por
+  defecto); los más chicos ocupan casi lo mismo comprimidos y solo suman CPU.
+- COMPRESSION_ENCODINGS fija cuáles se ofrecen y en qué orden de preferencia ante empates de q
+  (por defecto "zstd,br,gzip"). zstd y br necesitan los paquetes opcionales zstandard y brotli:
+  sin ellos se ofrece solo gzip. Vacío desactiva la compresión.
+- COMPRESSION_GZIP_LEVEL (6), COMPRESSION_BROTLI_LEVEL (5) y COMPRESSION_ZSTD_LEVEL (3) fijan el nivel.
+- Los listados y las respuestas con ?expand= que salen de la cache guardan también el cuerpo ya
+  comprimido, uno por encoding, junto a la entrada original: un acierto no vuelve a serializar ni a
+  comprimir. Se invalidan con el resto del namespace.
+- Cada representación tiene su propio ETag fuerte: "<etag>" sin comprimir y "<etag>-gzip", "<etag>-br"...
+  comprimida (con Vary: Accept-Encoding). If-None-Match acepta cualquiera de ellos y el 304 repite el
+  que envió el cliente; las respuestas que no se comprimen conservan el ETag tal cual.
+"""
+import gzip
+import os
+from flask import request, Response
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+from cache import cache
+from utils import representation_etag
+
+try:
+    import brotli
+except ImportError:  # br es opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstd es opcional
+    zstandard = None
+
+MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+LEVELS = {
+    'gzip': int(os.getenv('COMPRESSION_GZIP_LEVEL', 6)),
+    'br': int(os.getenv('COMPRESSION_BROTLI_LEVEL', 5)),
+    'zstd': int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3)),
+}
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/html', 'text/plain')
+
+COMPRESSORS = {'gzip': lambda body, level: gzip.compress(body, compresslevel=level, mtime=0)}
+if brotli is not None:
+    COMPRESSORS['br'] = lambda body, level: brotli.compress(body, quality=level)
+if zstandard is not None:
+    COMPRESSORS['zstd'] = lambda body, level: zstandard.ZstdCompressor(level=level).compress(body)
+
+# Encodings ofrecidos, en orden de preferencia del servidor
+ENCODINGS = tuple(encoding.strip() for encoding in os.getenv('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',')
+                  if encoding.strip() in COMPRESSORS)
+
+
+def negotiate(accept_encoding):
+    """Mejor encoding de ENCODINGS para el valor de Accept-Encoding; None si no acepta ninguno."""
+    if not accept_encoding or not ENCODINGS:
+        return None
+    return parse_accept_header(accept_encoding, Accept).best_match(ENCODINGS)
+
+
+def compress(body, encoding):
+    return COMPRESSORS[encoding](body, LEVELS[encoding])
+
+
+def compressed_body(namespace, key, body, accept_encoding):
+    """(encoding o None, cuerpo) para el cliente. La versión comprimida de un cuerpo en cache bajo
+    namespace/key se guarda a su lado, así se comprime una sola vez por encoding."""
+    encoding = negotiate(accept_encoding)
+    if encoding is None or len(body) < MIN_SIZE:
+        return None, body
+    return encoding, cache.get_or_set(namespace, ('compressed', key, encoding), lambda: compress(body, encoding))
+
+
+def encoded_response(namespace, body, mimetype='application/json'):
+    """Response de Flask con un cuerpo de la cache (clave request.full_path), comprimido si el cliente lo acepta."""
+    encoding, body = compressed_body(namespace, request.full_path, body, request.headers.get('Accept-Encoding'))
+    response = Response(body, mimetype=mimetype)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def compressible(status, mimetype, size):
+    return 200 <= status < 300 and status not in (204, 206) and mimetype in COMPRESSIBLE_MIMETYPES and size >= MIN_SIZE
+
+
+def setup_compression(app):
+    if not ENCODINGS:
+        return
+
+    def _set_encoding(response, encoding):
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag is not None and not etag.endswith('-' + encoding):
+            response.set_etag(representation_etag(etag, encoding), weak=weak)
+
+    @app.after_request
+    def _compress_response(response):
+        if response.mimetype in COMPRESSIBLE_MIMETYPES or response.status_code == 304:
+            response.vary.add('Accept-Encoding')
+        # Las que vienen de encoded_response ya están comprimidas: solo les falta el ETag de su encoding
+        if response.headers.get('Content-Encoding') in COMPRESSORS:
+            _set_encoding(response, response.headers['Content-Encoding'])
+            return response
+        # Las respuestas en streaming se envían tal cual
+        if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+            return response
+        if not compressible(response.status_code, response.mimetype, response.calculate_content_length() or 0):
+            return response
+        encoding = negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is not None:
+            response.set_data(compress(response.get_data(), encoding))
+            _set_encoding(response, encoding)
+        return response
@@ -0,0 +1,96 @@
+"""
+Configuración del pool de conexiones de SQLAlchemy a partir de variables de entorno,
+con un QueuePool que mide cuánto esperan las peticiones por una conexión.
+
+Variables (todas opcionales):
+- DB_POOL_SIZE         conexiones que se mantienen abiertas (pool_size)
+- DB_MAX_OVERFLOW      conexiones extra permitidas en picos (max_overflow)
+- DB_POOL_RECYCLE      segundos tras los que una conexión se renueva (pool_recycle)
+- DB_POOL_TIMEOUT      segundos máximos de espera por una conexión libre (pool_timeout)
+- DB_POOL_PRE_PING     1/0, comprobar la conexión antes de usarla (por defecto 1: evita
+                       conexiones muertas tras un failover de la base de datos)
+"""
+import os
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+ENV_OPTIONS = {
+    'DB_POOL_SIZE': ('pool_size', int),
+    'DB_MAX_OVERFLOW': ('max_overflow', int),
+    'DB_POOL_RECYCLE': ('pool_recycle', int),
+    'DB_POOL_TIMEOUT': ('pool_timeout', float),
+    'DB_POOL_PRE_PING': ('pool_pre_ping', lambda value: value.lower() not in ('0', 'false', 'no')),
+}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que cuenta esperas, timeouts y conexiones abiertas para /pool/stats."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+        self.connections_created = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def _create_connection(self):
+        with self._stats_lock:
+            self.connections_created += 1
+        return super()._create_connection()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "max_overflow": self._max_overflow,
+                "timeout": self._timeout,
+                "checkouts": self.checkouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_mean": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "timeouts": self.timeouts,
+                "connections_created": self.connections_created,
+            }
+
+
+def engine_options_from_env(database_uri):
+    """Opciones para SQLALCHEMY_ENGINE_OPTIONS según DB_POOL_*."""
+    options = {'pool_pre_ping': True}
+    for env_name, (option, parse) in ENV_OPTIONS.items():
+        value = os.getenv(env_name)
+        if value:
+            options[option] = parse(value)
+    # SQLite en memoria usa su propio pool de una conexión por hilo
+    if database_uri.startswith('sqlite') and (':memory:' in database_uri or database_uri.rstrip('/') == 'sqlite:'):
+        return {key: value for key, value in options.items() if key == 'pool_pre_ping'}
+    options['poolclass'] = TimedQueuePool
+    return options
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    if isinstance(pool, TimedQueuePool):
+        return pool.stats()
+    return {"status": pool.status()}
@@ -0,0 +1,81 @@
+"""
+?expand= en los endpoints del catálogo: agrega las relaciones serializadas a cada entidad.
+
+    /starships?expand=films.planets,films.characters&limit=20
+
+- Cada relación se carga con selectinload (las many-to-one con joinedload, como en
+  serialize_options): una consulta WHERE id IN (...) por relación y nivel para toda la página,
+  no una por fila. Diez o mil filas expandidas son las mismas consultas.
+- Las colecciones son listas de serialize() ordenadas por id; homeworld y film, que serialize()
+  muestra como nombre, se reemplazan por el objeto.
+- A lo sumo MAX_EXPAND_DEPTH niveles: films.planets.films es el máximo.
+"""
+from operator import attrgetter
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, Film, Starship, Vehicle, Species, Planet, Character
+from utils import APIException
+
+MAX_EXPAND_DEPTH = 3
+
+# Relaciones expandibles de cada modelo
+EXPANSIONS = {
+    Film: ('characters', 'planets', 'species', 'starships', 'vehicles'),
+    Starship: ('films',),
+    Vehicle: ('films',),
+    Species: ('films', 'homeworld'),
+    Planet: ('films',),
+    Character: ('film', 'homeworld'),
+}
+
+
+def parse_expand(model, value):
+    """'films.planets,films.characters' -> {'films': {'planets': {}, 'characters': {}}}; None si no se pidió ?expand."""
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(','):
+        names = [name.strip() for name in path.split('.')]
+        if not any(names):
+            continue
+        if len(names) > MAX_EXPAND_DEPTH:
+            raise APIException('expand supports at most %d levels: %s' % (MAX_EXPAND_DEPTH, path.strip()), status_code=400)
+        current, node = model, tree
+        for name in names:
+            valid = EXPANSIONS.get(current, ())
+            if name not in valid:
+                raise APIException('Unknown expansion: %s. Valid expansions for %s: %s' % (
+                    path.strip(), current.__tablename__, ', '.join(valid)), status_code=400)
+            node = node.setdefault(name, {})
+            current = getattr(current, name).property.mapper.class_
+    return tree or None
+
+
+def expand_options(model, tree):
+    """Opciones de carga de serialize() más una por cada relación del árbol, encadenadas por nivel."""
+    options = list(model.serialize_options())
+    for name, subtree in tree.items():
+        relationship = getattr(model, name)
+        target = relationship.property.mapper.class_
+        strategy = selectinload if relationship.property.uselist else joinedload
+        options.append(strategy(relationship).options(*expand_options(target, subtree)))
+    return options
+
+
+def serialize_expanded(entity, tree):
+    """entity.serialize() con las relaciones del árbol ya cargadas."""
+    data = entity.serialize()
+    for name, subtree in tree.items():
+        value = getattr(entity, name)
+        if isinstance(value, list):
+            data[name] = [serialize_expanded(item, subtree) for item in sorted(value, key=attrgetter('id'))]
+        else:
+            data[name] = serialize_expanded(value, subtree) if value is not None else None
+    return data
+
+
+def get_expanded_entity(model, entity_id, tree):
+    """Una entidad expandida, o None si no existe."""
+    statement = select(model).options(*expand_options(model, tree)).where(model.id == entity_id)
+    entity = db.session.scalars(statement).first()
+    return serialize_expanded(entity, tree) if entity is not None else None
@@ -0,0 +1,214 @@
+"""
+Vista de lectura de favoritos por usuario (tabla user_favorite):
+
+    /users/favoritos?user_id=1
+
+- Una fila por favorito con el tipo, el id y el nombre del destino ya resueltos: la respuesta es un
+  recorrido de rango del índice (user_id, favorito_id), sin JOIN con las seis tablas de destinos.
+- Se mantiene en la misma transacción que la escritura que la cambia:
+    * los INSERT de Core (add_favorite_planet, add_favorite_character, /favorite/bulk) llaman a
+      insert_user_favorites() antes del commit;
+    * lo que pasa por la sesión (los DELETE de favoritos, el admin, editar o borrar un planeta o un
+      personaje) lo recoge el evento after_flush de este módulo.
+- favorite_count lleva cuántos favoritos tiene cada destino, para el ranking de /favoritos/top.
+  Se suma y resta en los mismos puntos que user_favorite, con un UPSERT (total = total + n) que no
+  pierde incrementos entre peticiones concurrentes.
+- flask favorites rebuild recalcula las dos tablas desde favoritos, después de cargas con SQL directo;
+  flask favorites reconcile [--every N] corrige solo los contadores, como tarea periódica.
+"""
+import time
+from collections import Counter
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, delete, event, func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import db, Film, Starship, Vehicle, Species, Planet, Character, Favoritos, UserFavorite, FavoriteCount
+from serializers import SERIALIZERS
+from utils import APIException
+
+# tipo -> (columna de Favoritos, modelo destino, columna con el nombre que se muestra)
+FAVORITE_TYPES = {
+    'film': ('film_id', Film, 'title'),
+    'species': ('specie_id', Species, 'name'),
+    'starship': ('starship_id', Starship, 'name'),
+    'vehicle': ('vehicle_id', Vehicle, 'name'),
+    'character': ('character_id', Character, 'name'),
+    'planet': ('planet_id', Planet, 'name'),
+}
+# Las claves de cada favorito en la respuesta, las mismas que en /favoritos (vehicle no se muestra)
+FAVORITE_FIELDS = SERIALIZERS[Favoritos].names
+
+COLUMNS = ('favorito_id', 'user_id', 'target_type', 'target_id', 'name')
+
+favorites_cli = AppGroup('favorites', help='Vista de lectura de favoritos por usuario y contadores de /favoritos/top.')
+
+
+#------------------------------------------------------------------------ESCRITURA-------------------------------------------------------------
+
+def user_favorite_rows(*conditions):
+    """SELECT de las filas de user_favorite (COLUMNS) calculadas desde favoritos y sus destinos."""
+    kinds, target_ids, names = [], [], []
+    statement = select().select_from(Favoritos)
+    for kind, (column_name, model, name_column) in FAVORITE_TYPES.items():
+        column = getattr(Favoritos, column_name)
+        present = column.isnot(None)
+        kinds.append((present, kind))
+        target_ids.append((present, column))
+        names.append((present, getattr(model, name_column)))
+        statement = statement.outerjoin(model, model.id == column)
+    columns = [Favoritos.id, Favoritos.user_id, case(*kinds), case(*target_ids), case(*names)]
+    return statement.add_columns(*(column.label(name) for column, name in zip(columns, COLUMNS))).where(
+        Favoritos.user_id.isnot(None), *conditions)
+
+
+def _add_counts(connection, deltas):
+    """Suma {(tipo, id): n} a favorite_count (n negativo resta); crea las filas que falten."""
+    rows = [{"target_type": kind, "target_id": target_id, "total": delta}
+            for (kind, target_id), delta in deltas.items() if kind is not None and delta]
+    if not rows:
+        return
+    table = FavoriteCount.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        statement = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(table)
+        statement = statement.on_conflict_do_update(index_elements=[table.c.target_type, table.c.target_id],
+                                                    set_={"total": table.c.total + statement.excluded.total})
+        connection.execute(statement, rows)
+        return
+    for row in rows:
+        increment = update(table).where(table.c.target_type == row['target_type'], table.c.target_id == row['target_id'])
+        if not connection.execute(increment.values(total=table.c.total + row['total'])).rowcount:
+            connection.execute(insert(table).values(**row))
+
+
+def insert_user_favorites(*conditions, connection=None):
+    """Agrega a la vista los favoritos que cumplen conditions y todavía no están, y suma sus contadores.
+
+    Sin connection usa la de la sesión de Flask: queda en la misma transacción que el INSERT del favorito.
+    """
+    connection = connection if connection is not None else db.session.connection()
+    missing = ~select(UserFavorite.favorito_id).where(UserFavorite.favorito_id == Favoritos.id).exists()
+    rows = connection.execute(user_favorite_rows(missing, *conditions)).all()
+    if rows:
+        connection.execute(insert(UserFavorite), [dict(zip(COLUMNS, row)) for row in rows])
+        _add_counts(connection, Counter((row.target_type, row.target_id) for row in rows))
+    return len(rows)
+
+
+def delete_user_favorites(favorito_ids, connection):
+    """Quita esos favoritos de la vista y resta sus contadores."""
+    condition = UserFavorite.favorito_id.in_(favorito_ids)
+    targets = Counter(tuple(row) for row in connection.execute(select(UserFavorite.target_type, UserFavorite.target_id).where(condition)))
+    connection.execute(delete(UserFavorite).where(condition))
+    _add_counts(connection, {target: -count for target, count in targets.items()})
+
+
+def reconcile_favorite_counts(connection):
+    """Corrige favorite_count con los conteos reales de favoritos. Devuelve cuántos contadores cambió.
+
+    Aplica la diferencia (no el valor) para no pisar los incrementos que lleguen mientras tanto.
+    """
+    rows = user_favorite_rows().subquery()
+    actual = dict(((kind, target_id), total) for kind, target_id, total in connection.execute(
+        select(rows.c.target_type, rows.c.target_id, func.count()).where(rows.c.target_type.isnot(None))
+        .group_by(rows.c.target_type, rows.c.target_id)))
+    stored = dict(((kind, target_id), total) for kind, target_id, total in connection.execute(
+        select(FavoriteCount.target_type, FavoriteCount.target_id, FavoriteCount.total)))
+    deltas = {target: actual.get(target, 0) - stored.get(target, 0) for target in actual.keys() | stored.keys()}
+    deltas = {target: delta for target, delta in deltas.items() if delta}
+    _add_counts(connection, deltas)
+    connection.execute(delete(FavoriteCount).where(FavoriteCount.total == 0))
+    return len(deltas)
+
+
+def rebuild_user_favorites(connection):
+    """Vacía user_favorite y la vuelve a llenar desde favoritos, con sus contadores. Devuelve las filas insertadas."""
+    connection.execute(delete(UserFavorite))
+    count = connection.execute(insert(UserFavorite).from_select(COLUMNS, user_favorite_rows())).rowcount
+    reconcile_favorite_counts(connection)
+    return count
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_user_favorites(session, flush_context):
+    # Aún se ven new/dirty/deleted y el historial de los atributos; las sentencias van en la misma transacción
+    connection = session.connection()
+    changed = {obj.id for obj in list(session.new) + list(session.dirty) if isinstance(obj, Favoritos)}
+    removed = {obj.id for obj in session.deleted if isinstance(obj, Favoritos)}
+    if changed or removed:
+        delete_user_favorites(changed | removed, connection)
+    if changed:
+        insert_user_favorites(Favoritos.id.in_(changed), connection=connection)
+
+    for kind, (_, model, name_column) in FAVORITE_TYPES.items():
+        renamed = [obj for obj in session.dirty if isinstance(obj, model)
+                   and inspect(obj).attrs[name_column].history.has_changes()]
+        deleted = [obj for obj in session.deleted if isinstance(obj, model)]
+        for obj, name in [(obj, getattr(obj, name_column)) for obj in renamed] + [(obj, None) for obj in deleted]:
+            connection.execute(update(UserFavorite).where(UserFavorite.target_type == kind, UserFavorite.target_id == obj.id)
+                               .values(name=name))
+
+
+#------------------------------------------------------------------------LECTURA-------------------------------------------------------------
+
+def user_favorites_statement(user_id):
+    """Favoritos de un usuario en orden de id: solo lee el índice (user_id, favorito_id)."""
+    return (select(UserFavorite.favorito_id, UserFavorite.target_type, UserFavorite.name)
+            .where(UserFavorite.user_id == user_id).order_by(UserFavorite.favorito_id))
+
+
+def serialize_user_favorites(rows, names=None):
+    """Filas de user_favorites_statement() -> dicts como los de /favoritos; names: solo esas claves (?fields=)."""
+    empty = dict.fromkeys(FAVORITE_FIELDS if names is None else [name for name in FAVORITE_FIELDS if name in names])
+    results = []
+    for favorito_id, target_type, name in rows:
+        item = empty.copy()
+        if 'id' in item:
+            item['id'] = favorito_id
+        if target_type in item:
+            item[target_type] = name
+        results.append(item)
+    return results
+
+
+def parse_favorite_type(value):
+    """?type= de /favoritos/top, obligatorio y entre FAVORITE_TYPES."""
+    if value not in FAVORITE_TYPES:
+        raise APIException('type is required. Valid types: %s' % ', '.join(FAVORITE_TYPES) if not value else
+                           'Unknown type: %s. Valid types: %s' % (value, ', '.join(FAVORITE_TYPES)), status_code=400)
+    return value
+
+
+def top_favorites(kind, limit):
+    """Los limit destinos de un tipo con más favoritos [{id, name, favorites}]; lee las primeras filas de ix_favorite_count_top."""
+    _, model, name_column = FAVORITE_TYPES[kind]
+    statement = (select(FavoriteCount.target_id, getattr(model, name_column), FavoriteCount.total)
+                 .join(model, model.id == FavoriteCount.target_id)  # Los destinos borrados no aparecen
+                 .where(FavoriteCount.target_type == kind, FavoriteCount.total > 0)
+                 .order_by(FavoriteCount.total.desc(), FavoriteCount.target_id).limit(limit))
+    return [{"id": target_id, "name": name, "favorites": total} for target_id, name, total in db.session.execute(statement)]
+
+
+#------------------------------------------------------------------------CLI-------------------------------------------------------------
+
+@favorites_cli.command('rebuild')
+def rebuild_command():
+    """Recalcula user_favorite y favorite_count desde favoritos (después de cargar favoritos con SQL directo)."""
+    with db.engine.begin() as connection:
+        count = rebuild_user_favorites(connection)
+        users = connection.scalar(select(func.count(func.distinct(UserFavorite.user_id))))
+    click.echo('Rebuilt %d favorites for %d users' % (count, users))
+
+
+@favorites_cli.command('reconcile')
+@click.option('--every', type=float, default=None, help='Repetir cada N segundos, como proceso de fondo.')
+def reconcile_command(every):
+    """Corrige los contadores de /favoritos/top con los conteos reales de favoritos."""
+    while True:
+        with db.engine.begin() as connection:
+            fixed = reconcile_favorite_counts(connection)
+        click.echo('Reconciled favorite counts: %d corrected' % fixed)
+        if not every:
+            break
+        time.sleep(every)
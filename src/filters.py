@@ -0,0 +1,230 @@
+"""
+Filtros y orden de los listados, traducidos a WHERE / ORDER BY:
+
+    /characters?gender=female&homeworld=Tatooine&sort=-name&limit=20
+
+- Solo se aceptan los campos de FILTERS[modelo]; cada uno tiene un índice (columna, id) en
+  la migración 3b7e1c2d9f40, así que filtrar y paginar por id es un recorrido de índice.
+- Repetir el parámetro es un IN: ?climate=arid&climate=temperate.
+- Los valores se convierten al tipo de la columna (un entero mal formado es un 400).
+- ?sort=<campo> o ?sort=-<campo> (descendente), entre SORTS[modelo]. Los NULL van al final y
+  el id desempata; el cursor de ?after= guarda (valor, id) de la última fila.
+- Las medidas de NUMERIC_COLUMNS (height, population, cost_in_credits...) admiten rangos
+  ?population_gt=1e9&diameter_lte=12000 (_gt, _gte, _lt, _lte) y se ordenan como números,
+  sobre su columna _num indexada. "unknown" y "n/a" son NULL: no cumplen ningún rango.
+"""
+from datetime import date, datetime
+from flask import request
+from sqlalchemy import Date, DateTime, Float, Integer, Numeric, and_, or_, select
+from models import db, NUMERIC_COLUMNS, Starship, Vehicle, Species, Planet, Character, Favoritos
+from utils import APIException, decode_cursor_data, encode_cursor
+
+# Parámetros de la query string que no son filtros. ?expand= solo lo reservan los listados que lo
+# implementan (get_list_query(model, reserved=('expand',))): en el resto es un filtro desconocido, un 400.
+RESERVED_ARGS = ('after', 'limit', 'fields', 'sort', 'stream')
+
+FILTERS = {
+    Character: {
+        'name': Character.name,
+        'gender': Character.gender,
+        'eye_color': Character.eye_color,
+        'hair_color': Character.hair_color,
+        'homeworld_id': Character.homeworld_id,
+        'film_id': Character.film_id,
+    },
+    Planet: {
+        'name': Planet.name,
+        'climate': Planet.climate,
+        'terrain': Planet.terrain,
+    },
+    Favoritos: {
+        'user_id': Favoritos.user_id,
+    },
+}
+
+# Filtros por el nombre de una relación: ?homeworld=Tatooine -> homeworld_id IN (SELECT id FROM planet WHERE name IN (...))
+RELATED_FILTERS = {
+    Character: {
+        'homeworld': (Character.homeworld_id, Planet.id, Planet.name),
+    },
+}
+
+# ?<medida>_gt=N -> <medida>_num > N
+RANGE_OPERATORS = {
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+}
+NUMERIC_FILTERS = {
+    model: {name: getattr(model, name + '_num') for name in NUMERIC_COLUMNS[model.__tablename__]}
+    for model in (Starship, Vehicle, Species, Planet, Character)
+}
+
+SORTS = {
+    Character: ('id', 'name', 'gender', 'eye_color', 'hair_color', 'created', 'edited') + NUMERIC_COLUMNS['character'],
+    Planet: ('id', 'name', 'climate', 'terrain', 'created', 'edited') + NUMERIC_COLUMNS['planet'],
+    Starship: ('id',) + NUMERIC_COLUMNS['starship'],
+    Vehicle: ('id',) + NUMERIC_COLUMNS['vehicle'],
+    Species: ('id',) + NUMERIC_COLUMNS['species'],
+    Favoritos: ('id',),
+}
+
+
+def _convert(column, value):
+    """Valor de la query string (o del cursor) al tipo de la columna."""
+    if value is None:
+        return None
+    try:
+        if isinstance(column.type, Integer):
+            return int(value)
+        if isinstance(column.type, (Float, Numeric)):
+            return float(value)
+        if isinstance(column.type, DateTime):
+            return datetime.fromisoformat(value)
+        if isinstance(column.type, Date):
+            return date.fromisoformat(value)
+    except ValueError:
+        raise APIException('Invalid value for %s: %s' % (column.key, value), status_code=400)
+    return value
+
+
+def _to_json(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+class ListQuery:
+    """Filtros, orden y cursor de un listado, ya validados."""
+
+    def __init__(self, model, conditions=(), sort='id', descending=False, after=None, nulls_last=True):
+        self.model = model
+        self.conditions = list(conditions)
+        self.sort = sort
+        self.descending = descending
+        self.column = NUMERIC_FILTERS.get(model, {}).get(sort) or getattr(model, sort)  # Las medidas se ordenan por su _num
+        self.after = after  # (valor de la columna de orden, id) de la última fila entregada
+        self.nulls_last = nulls_last
+
+    @classmethod
+    def from_args(cls, model, args, dialect='postgresql', reserved=()):
+        """Lee filtros, ?sort= y el cursor de ?after= de un MultiDict de argumentos; reserved: otros parámetros que no son filtros."""
+        filters = FILTERS.get(model, {})
+        related = RELATED_FILTERS.get(model, {})
+        numeric = NUMERIC_FILTERS.get(model, {})
+        conditions = []
+        for name in args:
+            if name in RESERVED_ARGS or name in reserved:
+                continue
+            values = [value for value in args.getlist(name) if value != '']
+            measure, _, operator = name.rpartition('_')
+            known = (measure in numeric and operator in RANGE_OPERATORS) or name in filters or name in related
+            if known and not values:  # ?gender= o ?height_gt= vacío: casi siempre un error de tipeo, no un filtro
+                raise APIException('Invalid value for %s: empty' % name, status_code=400)
+            if measure in numeric and operator in RANGE_OPERATORS:
+                column = numeric[measure]
+                for value in values:
+                    conditions.append(RANGE_OPERATORS[operator](column, _convert(column, value)))
+            elif name in filters:
+                column = filters[name]
+                values = [_convert(column, value) for value in values]
+                conditions.append(column == values[0] if len(values) == 1 else column.in_(values))
+            elif name in related:
+                foreign_key, target_id, target_column = related[name]
+                conditions.append(foreign_key.in_(select(target_id).where(target_column.in_(values))))
+            else:
+                valid = list(filters) + list(related) + ['%s_gt|_gte|_lt|_lte' % measure for measure in numeric]
+                raise APIException('Unknown filter: %s. Valid filters: %s' % (name, ', '.join(valid)), status_code=400)
+
+        sort = args.get('sort') or 'id'
+        descending = sort.startswith('-')
+        field = sort.lstrip('-')
+        if field not in SORTS.get(model, ('id',)):
+            raise APIException('Invalid sort: %s. Valid fields: %s' % (sort, ', '.join(SORTS.get(model, ('id',)))), status_code=400)
+
+        query = cls(model, conditions, field, descending, nulls_last=dialect != 'mysql')  # MySQL no admite NULLS LAST
+        cursor = args.get('after')
+        if cursor:
+            data = decode_cursor_data(cursor)
+            if data.get('sort', 'id') != sort:
+                raise APIException('Cursor does not match sort=%s' % sort, status_code=400)
+            query.after = (_convert(query.column, data.get('v')), data['id'])
+        return query
+
+    @property
+    def keyed(self):
+        """True si el orden no es el de siempre (id ascendente) y el cursor necesita el valor de la columna."""
+        return self.sort != 'id' or self.descending
+
+    def _direction(self, column):
+        return column.desc() if self.descending else column.asc()
+
+    def order_by(self):
+        tiebreak = self._direction(self.model.id)
+        if self.sort == 'id':
+            return [tiebreak]
+        if self.nulls_last:
+            return [self._direction(self.column).nulls_last(), tiebreak]
+        return [self.column.is_(None), self._direction(self.column), tiebreak]
+
+    def keyset_condition(self, after_id):
+        """Filas posteriores al cursor en el orden pedido (los NULL de la columna de orden van al final)."""
+        model_id, column = self.model.id, self.column
+        if self.sort == 'id':
+            return model_id < after_id if self.descending else model_id > after_id
+        value, after_id = self.after
+        later_id = model_id < after_id if self.descending else model_id > after_id
+        if value is None:
+            return and_(column.is_(None), later_id)
+        later_value = column < value if self.descending else column > value
+        return or_(later_value, and_(column == value, later_id), column.is_(None))
+
+    def statement(self, serializer):
+        """select() del serializador con los filtros y el orden pedidos (listado completo o streaming)."""
+        return serializer.statement(self.order_by()).where(*self.conditions)
+
+    def page(self, serializer, after=None, limit=None):
+        """Página de dicts y cursor siguiente; ejecuta page_statement() con la sesión de Flask."""
+        return self.paginate(serializer, db.session.execute(self.page_statement(serializer, after, limit)).all(), limit)
+
+    def page_statement(self, serializer, after=None, limit=None):
+        statement = self.statement(serializer)
+        if after is not None:
+            statement = statement.where(self.keyset_condition(after))
+        if self.sort != 'id':
+            statement = statement.add_columns(self.column)  # Valor de orden de la última fila, para el cursor
+        return statement.limit(limit + 1)
+
+    def paginate(self, serializer, rows, limit):
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self._cursor(serializer.row_id(last), last[-1] if self.sort != 'id' else None)
+        if self.sort != 'id':
+            width = serializer.width
+            return [serializer.to_dict(row[:width]) for row in rows], next_cursor
+        return [serializer.to_dict(row) for row in rows], next_cursor
+
+    def entities(self, options, after=None, limit=None):
+        """Objetos ORM cargados con options (?expand=) y cursor siguiente; sin limit, el listado completo."""
+        statement = select(self.model).options(*options).where(*self.conditions).order_by(*self.order_by())
+        if after is not None:
+            statement = statement.where(self.keyset_condition(after))
+        if limit is None:
+            return db.session.scalars(statement).all(), None
+        entities = db.session.scalars(statement.limit(limit + 1)).all()
+        next_cursor = None
+        if len(entities) > limit:
+            entities = entities[:limit]
+            next_cursor = self._cursor(entities[-1].id, getattr(entities[-1], self.column.key))
+        return entities, next_cursor
+
+    def _cursor(self, last_id, value):
+        if not self.keyed:
+            return encode_cursor(last_id)
+        return encode_cursor(last_id, '-' + self.sort if self.descending else self.sort, _to_json(value))
+
+
+def get_list_query(model, reserved=()):
+    """ListQuery de la petición de Flask en curso."""
+    return ListQuery.from_args(model, request.args, db.engine.dialect.name, reserved)
@@ -0,0 +1,275 @@
+"""
+Instrumentación por petición y endpoint /metrics en formato de texto de Prometheus.
+
+Por cada petición se registra, con etiquetas endpoint/method/status:
+- latencia total (histograma)
+- número de sentencias SQL y tiempo total en la base de datos (eventos before/after_cursor_execute)
+- tiempo de serialización: Model.serialize() más la codificación JSON
+- tamaño de la respuesta
+
+Además hay un log de peticiones lentas (METRICS_SLOW_REQUEST_MS, 500 por defecto) y de
+consultas lentas con la sentencia y la cantidad de parámetros, nunca sus valores (contraseñas,
+emails...) (METRICS_SLOW_QUERY_MS, 100 por defecto); 0 desactiva cada log. Las métricas viven
+en memoria de cada proceso: con varios workers de gunicorn cada uno expone las suyas.
+
+/metrics (y /cache/stats, /pool/stats en app.py) responden 404 salvo que se defina
+METRICS_SECRET y la petición lo envíe en `X-Metrics-Secret: <secreto>` o en
+`Authorization: Bearer <secreto>` (bearer_token en la configuración de Prometheus).
+"""
+import functools
+import hmac
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from flask import request, jsonify, Response
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db
+from cache import cache
+from db_pool import pool_stats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Histograma acumulativo por combinación de etiquetas."""
+
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}  # valores de etiquetas -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _labels(self, label_values, extra=''):
+        pairs = ['%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in zip(self.labels, label_values)]
+        if extra:
+            pairs.append(extra)
+        return '{%s}' % ','.join(pairs) if pairs else ''
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help_text), '# TYPE %s histogram' % self.name]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append('%s_bucket%s %d' % (self.name, self._labels(label_values, 'le="%s"' % bound), bucket_count))
+                lines.append('%s_bucket%s %d' % (self.name, self._labels(label_values, 'le="+Inf"'), count))
+                lines.append('%s_sum%s %s' % (self.name, self._labels(label_values), repr(total)))
+                lines.append('%s_count%s %d' % (self.name, self._labels(label_values), count))
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_LABELS = ('endpoint', 'method', 'status')
+request_duration = Histogram('http_request_duration_seconds', 'Latencia de la petición.', LATENCY_BUCKETS, REQUEST_LABELS)
+request_sql_statements = Histogram('http_request_sql_statements', 'Sentencias SQL ejecutadas por petición.', COUNT_BUCKETS, REQUEST_LABELS)
+request_sql_duration = Histogram('http_request_sql_duration_seconds', 'Tiempo total en la base de datos por petición.', LATENCY_BUCKETS, REQUEST_LABELS)
+request_serialize_duration = Histogram('http_request_serialize_duration_seconds', 'Tiempo en serialize() y codificación JSON por petición.', LATENCY_BUCKETS, REQUEST_LABELS)
+response_size = Histogram('http_response_size_bytes', 'Tamaño del cuerpo de la respuesta.', SIZE_BUCKETS, REQUEST_LABELS)
+sql_duration = Histogram('sql_statement_duration_seconds', 'Duración de cada sentencia SQL.', LATENCY_BUCKETS)
+HISTOGRAMS = (request_duration, request_sql_statements, request_sql_duration, request_serialize_duration, response_size, sql_duration)
+
+
+class RequestStats:
+    __slots__ = ('sql_statements', 'sql_seconds', 'serialize_seconds', 'serialize_depth')
+
+    def __init__(self):
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.serialize_depth = 0
+
+
+# Estadísticas de la petición en curso. Un ContextVar (no flask.g) para que también funcione en asgi.py
+current_stats = ContextVar('request_stats', default=None)
+
+
+def _threshold(name, default):
+    return float(os.getenv(name, default)) / 1000.0
+
+
+SLOW_REQUEST_SECONDS = _threshold('METRICS_SLOW_REQUEST_MS', 500)
+SLOW_QUERY_SECONDS = _threshold('METRICS_SLOW_QUERY_MS', 100)
+METRICS_SECRET = os.getenv('METRICS_SECRET')
+
+
+#------------------------------------------------------------------------SQL-------------------------------------------------------------
+
+# El inicio se guarda en el ExecutionContext de la sentencia, no en una pila de conn.info: si la sentencia
+# falla after_cursor_execute no llega, y el contexto se descarta con ella en lugar de dejar una entrada colgada.
+# Las pocas sentencias internas del dialecto sin contexto no se miden.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start_time', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    sql_duration.observe(elapsed)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.sql_seconds += elapsed
+    if SLOW_QUERY_SECONDS and elapsed >= SLOW_QUERY_SECONDS:
+        # Solo cuántos parámetros: los valores son datos de la petición (p. ej. la contraseña de un alta)
+        shown = '[%d parameter sets]' % len(parameters) if executemany else '[%d parameters]' % len(parameters or ())
+        logger.warning('Slow query (%.1f ms): %s %s', elapsed * 1000, statement, shown)
+
+
+#------------------------------------------------------------------------SERIALIZACIÓN-------------------------------------------------------------
+
+def _timed_serialize(serialize):
+    @functools.wraps(serialize)
+    def wrapper(self, *args, **kwargs):
+        stats = current_stats.get()
+        if stats is None:
+            return serialize(self, *args, **kwargs)
+        # Solo cuenta la llamada exterior: User.serialize() llama a Favoritos.serialize()
+        stats.serialize_depth += 1
+        start = time.perf_counter()
+        try:
+            return serialize(self, *args, **kwargs)
+        finally:
+            stats.serialize_depth -= 1
+            if stats.serialize_depth == 0:
+                stats.serialize_seconds += time.perf_counter() - start
+    return wrapper
+
+
+def instrument_serializers():
+    for mapper in db.Model.registry.mappers:
+        model = mapper.class_
+        serialize = model.__dict__.get('serialize')
+        if serialize is not None and not hasattr(serialize, '__wrapped__'):
+            model.serialize = _timed_serialize(serialize)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """El proveedor JSON de Flask, sumando el tiempo de codificación al de serialización."""
+
+    def dumps(self, obj, **kwargs):
+        stats = current_stats.get()
+        if stats is None or stats.serialize_depth:
+            return super().dumps(obj, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            stats.serialize_seconds += time.perf_counter() - start
+
+
+#------------------------------------------------------------------------REGISTRO DE PETICIONES-------------------------------------------------------------
+
+def start_request():
+    return current_stats.set(RequestStats())
+
+
+def finish_request(token, endpoint, method, status, elapsed, size=None, statement=None):
+    """Registra las métricas de la petición y la escribe en el log si fue lenta."""
+    stats = current_stats.get()
+    current_stats.reset(token)
+    labels = (endpoint, method, status)
+    request_duration.observe(elapsed, *labels)
+    request_sql_statements.observe(stats.sql_statements, *labels)
+    request_sql_duration.observe(stats.sql_seconds, *labels)
+    request_serialize_duration.observe(stats.serialize_seconds, *labels)
+    if size is not None:
+        response_size.observe(size, *labels)
+    if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+        logger.warning('Slow request (%.1f ms): %s %s -> %s, %d SQL statements in %.1f ms, serialize %.1f ms, %s bytes',
+                       elapsed * 1000, method, statement or endpoint, status, stats.sql_statements, stats.sql_seconds * 1000,
+                       stats.serialize_seconds * 1000, size if size is not None else '?')
+
+
+def _gauges(prefix, values):
+    lines = []
+    for name, value in sorted(values.items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append('# TYPE %s_%s gauge' % (prefix, name))
+            lines.append('%s_%s %s' % (prefix, name, value))
+    return lines
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.extend(_gauges('db_pool', pool_stats(db.engine)))
+    lines.extend(_gauges('entity_cache', cache.stats()))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_authorized(headers):
+    """True si la petición trae METRICS_SECRET (X-Metrics-Secret o Authorization: Bearer); sin METRICS_SECRET, nunca."""
+    if not METRICS_SECRET:
+        return False
+    provided = headers.get('X-Metrics-Secret')
+    authorization = headers.get('Authorization', '')
+    if not provided and authorization.startswith('Bearer '):
+        provided = authorization[len('Bearer '):]
+    return bool(provided) and hmac.compare_digest(provided.encode('utf-8'), METRICS_SECRET.encode('utf-8'))
+
+
+def require_metrics_secret(view):
+    """Rutas operativas (/metrics, /cache/stats, /pool/stats): 404 sin el secreto, como si no existieran."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not metrics_authorized(request.headers):
+            return jsonify({'error': 'Not found'}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def setup_metrics(app):
+    instrument_serializers()
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_request_metrics():
+        request.environ['metrics.token'] = start_request()
+        request.environ['metrics.start'] = time.perf_counter()
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        token = request.environ.pop('metrics.token', None)
+        if token is None:
+            return response
+        elapsed = time.perf_counter() - request.environ.pop('metrics.start')
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        # Las respuestas en streaming no tienen tamaño conocido aquí
+        size = None if response.is_streamed else response.calculate_content_length()
+        finish_request(token, endpoint, request.method, str(response.status_code), elapsed, size, request.full_path)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    @require_metrics_secret
+    def metrics():
+        return Response(render_metrics(), content_type=PROMETHEUS_MIMETYPE)
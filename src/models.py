@@ -1,12 +1,50 @@
 from flask_sqlalchemy import SQLAlchemy  # Importar la clase SQLAlchemy desde el módulo flask_sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload  # Estrategias de carga anticipada (eager loading) para evitar N+1
 
 # Definir la clase de personaje (tabla de personajes en la base de datos)
 from datetime import datetime
 import json
+import math
 
 # Crear una instancia de SQLAlchemy que será utilizada para interactuar con la base de datos
 db = SQLAlchemy()
 
+#------------------------------------------------------------------------COLUMNAS NUMÉRICAS-------------------------------------------------------------
+
+# Medidas de SWAPI guardadas como texto ("1,358", "unknown", "n/a"). Cada una tiene una columna
+# Float "sombra" <columna>_num, indexada, para filtros de rango (?height_gt=180) y orden numérico.
+NUMERIC_COLUMNS = {
+    'starship': ('cost_in_credits', 'length', 'crew', 'passengers', 'max_atmosphering_speed', 'hyperdrive_rating', 'MGLT', 'cargo_capacity'),
+    'vehicle': ('cost_in_credits', 'length', 'crew', 'passengers', 'max_atmosphering_speed', 'cargo_capacity'),
+    'species': ('average_height', 'average_lifespan'),
+    'planet': ('diameter', 'rotation_period', 'orbital_period', 'surface_water', 'population'),
+    'character': ('height', 'mass'),
+}
+
+
+def parse_number(value):
+    """'1,358' -> 1358.0; 'unknown', 'n/a', rangos como '30-165' o valores vacíos -> None."""
+    if value is None:
+        return None
+    try:
+        number = float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def fill_numeric(table_name, values):
+    """Completa las columnas _num de un dict de valores (altas masivas, importación) a partir de su texto."""
+    for column in NUMERIC_COLUMNS.get(table_name, ()):
+        if column in values:
+            values[column + '_num'] = parse_number(values[column])
+    return values
+
+
+def numeric_shadow_columns(table_name):
+    return {column + '_num' for column in NUMERIC_COLUMNS.get(table_name, ())}
+
 #Definimos la relacion de usuario y favorito en la tabla usuario_favoritos antes de cada tabla
 # usuario_favoritos = db.Table('usuario_favoritos', db.metadata, #.metadata en SQLAlchemy es un objeto que almacena metadatos sobre las tablas y sus columnas en una base de datos. Aquí te explico cómo funciona
 #                         # Columna 'usuario_id' para almacenar el ID del usuario que tiene el favorito
@@ -37,6 +75,11 @@ class User(db.Model):  # Definir una clase que hereda de la clase Model de SQLAl
     def __repr__(self):  # Definir un método para representación de cadena
         return '<User %r>' % self.id  # Devolver una cadena que representa el objeto usuario
 
+    # Relaciones que serialize() necesita, cargadas en 2 consultas (usuarios + favoritos con sus destinos)
+    @classmethod
+    def serialize_options(cls):
+        return [selectinload(cls.favoritos).options(*Favoritos.serialize_options())]
+
     # Método para serializar un objeto de usuario a un diccionario JSON
     def serialize(self):  # Definir un método para serializar el objeto usuario
         return {  # Devolver un diccionario con los atributos del usuario
@@ -62,6 +105,16 @@ class Favoritos(db.Model):
     character_id = db.Column(db.Integer, db.ForeignKey('character.id'))  # Definir una columna de clave foránea que referencia la tabla Film
     planet_id = db.Column(db.Integer, db.ForeignKey('planet.id'))  # Definir una columna de clave foránea que referencia la tabla Film
 
+    # Un índice único (user_id, destino) por cada tipo de favorito: sirve las búsquedas filter_by(user_id=..., planet_id=...)
+    # de los DELETE, el JOIN desde User.favoritos (user_id es la primera columna) y evita favoritos duplicados
+    __table_args__ = (
+        db.Index('ix_favoritos_user_film', 'user_id', 'film_id', unique=True),
+        db.Index('ix_favoritos_user_specie', 'user_id', 'specie_id', unique=True),
+        db.Index('ix_favoritos_user_starship', 'user_id', 'starship_id', unique=True),
+        db.Index('ix_favoritos_user_vehicle', 'user_id', 'vehicle_id', unique=True),
+        db.Index('ix_favoritos_user_character', 'user_id', 'character_id', unique=True),
+        db.Index('ix_favoritos_user_planet', 'user_id', 'planet_id', unique=True),
+    )
 
         
     # Relaciones con las tablas de elementos favoritos
@@ -82,6 +135,12 @@ class Favoritos(db.Model):
     def __repr__(self):  # Método para representar un objeto de personaje como una cadena
         return '<Favoritos %r>' % self.id  # Devolver una cadena que representa el objeto personaje
 
+    # Relaciones que serialize() necesita, resueltas con JOIN en la misma consulta
+    @classmethod
+    def serialize_options(cls):
+        return [joinedload(cls.film), joinedload(cls.species), joinedload(cls.starship),
+                joinedload(cls.character), joinedload(cls.planet)]
+
     def serialize(self):  # Método para serializar un objeto de personaje a un diccionario JSON
         # Obtener los nombres de los usuarios asociados al favorito
         # nombres_usuarios = [usuario.name for usuario in self.usuarios]
@@ -101,6 +160,47 @@ class Favoritos(db.Model):
         }
     
 
+#------------------------------------------------------------------------FAVORITOS POR USUARIO-------------------------------------------------------------
+
+# Vista de lectura de /users/favoritos: una fila por favorito con el tipo, el id y el nombre del destino ya
+# resueltos. La mantiene favorites.py en la misma transacción que los cambios en Favoritos y en los destinos.
+class UserFavorite(db.Model):
+    __tablename__ = 'user_favorite'
+    favorito_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Mismo id que en Favoritos
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    target_type = db.Column(db.String(20), nullable=True)  # 'planet', 'character'...; NULL si el favorito se quedó sin destino
+    target_id = db.Column(db.Integer, nullable=True)
+    name = db.Column(db.String(255), nullable=True)  # Nombre (o título) del destino
+
+    __table_args__ = (
+        # Los favoritos de un usuario son un recorrido de rango de este índice; en PostgreSQL lo cubre entero
+        db.Index('ix_user_favorite_user_id_favorito_id', 'user_id', 'favorito_id',
+                 postgresql_include=['target_type', 'target_id', 'name']),
+        # Renombrar un planeta o un personaje actualiza sus filas sin recorrer la tabla
+        db.Index('ix_user_favorite_target', 'target_type', 'target_id'),
+    )
+
+    def __repr__(self):
+        return '<UserFavorite %r>' % self.favorito_id
+
+
+# Cuántos usuarios tienen a cada planeta, personaje... en favoritos, para /favoritos/top. Se suma y resta
+# junto con user_favorite; flask favorites reconcile lo recalcula desde favoritos.
+class FavoriteCount(db.Model):
+    __tablename__ = 'favorite_count'
+    target_type = db.Column(db.String(20), primary_key=True)
+    target_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # El ranking de un tipo son las primeras filas de este índice: O(limit), sin recorrer favoritos
+        db.Index('ix_favorite_count_top', 'target_type', total.desc(), 'target_id'),
+    )
+
+    def __repr__(self):
+        return '<FavoriteCount %s %r: %r>' % (self.target_type, self.target_id, self.total)
+
+
 #------------------------------------------------------------------------RELACION DE TABLAS-------------------------------------------------------------
 
 
@@ -142,7 +242,7 @@ class Film(db.Model):
     producer = db.Column(db.String(255), nullable=True)  # Definir una columna de tipo string con restricciones de no nulidad
     release_date = db.Column(db.Date, nullable=True)  # Definir una columna de tipo fecha con restricciones de no nulidad
     created = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
-    edited = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
+    edited = db.Column(db.DateTime, onupdate=datetime.utcnow, nullable=True)  # Fecha de edición, se actualiza automáticamente (la usan los ETag)
     url = db.Column(db.String(255), unique=True, nullable=False)  # Definir una columna de tipo string con restricciones de unicidad y no nulidad
 
     favoritos = db.relationship("Favoritos", back_populates="film") # Relación uno a uno con la tabla Favoritos
@@ -152,6 +252,11 @@ class Film(db.Model):
     def __repr__(self):  # Definir un método para representación de cadena
         return '<Film %r>' % self.id  # Devolver una cadena que representa el objeto película
 
+    # serialize() solo usa columnas propias: no hay relaciones que precargar
+    @classmethod
+    def serialize_options(cls):
+        return []
+
     # Método para serializar un objeto de película a un diccionario JSON
     def serialize(self):  # Definir un método para serializar el objeto película
         return {  # Devolver un diccionario con los atributos de la película
@@ -161,9 +266,9 @@ class Film(db.Model):
             "director": self.director,
             "opening_crawl": self.opening_crawl,
             "producer": self.producer,
-            "release_date": self.release_date.strftime('%Y-%m-%d'),
-            "created": self.created.strftime('%Y-%m-%d'),
-            "edited": self.edited.strftime('%Y-%m-%d'),
+            "release_date": self.release_date.strftime('%Y-%m-%d') if self.release_date else None,
+            "created": self.created.strftime('%Y-%m-%d') if self.created else None,
+            "edited": self.edited.strftime('%Y-%m-%d') if self.edited else None,
             "url": self.url
         }
 
@@ -189,17 +294,42 @@ class Starship(db.Model):
     cargo_capacity = db.Column(db.String(50), nullable=True)  # Definir una columna de tipo string con restricciones de no nulidad
     consumables = db.Column(db.String(50), nullable=True)  # Definir una columna de tipo string con restricciones de no nulidad
     created = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
-    edited = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
+    edited = db.Column(db.DateTime, onupdate=datetime.utcnow, nullable=True)  # Fecha de edición, se actualiza automáticamente (la usan los ETag)
     url = db.Column(db.String(255), unique=True, nullable=True)  # Definir una columna de tipo string con restricciones de unicidad y no nulidad
+    cost_in_credits_num = db.Column(db.Float, nullable=True)  # cost_in_credits como número (ver NUMERIC_COLUMNS)
+    length_num = db.Column(db.Float, nullable=True)  # length como número (ver NUMERIC_COLUMNS)
+    crew_num = db.Column(db.Float, nullable=True)  # crew como número (ver NUMERIC_COLUMNS)
+    passengers_num = db.Column(db.Float, nullable=True)  # passengers como número (ver NUMERIC_COLUMNS)
+    max_atmosphering_speed_num = db.Column(db.Float, nullable=True)  # max_atmosphering_speed como número (ver NUMERIC_COLUMNS)
+    hyperdrive_rating_num = db.Column(db.Float, nullable=True)  # hyperdrive_rating como número (ver NUMERIC_COLUMNS)
+    MGLT_num = db.Column(db.Float, nullable=True)  # MGLT como número (ver NUMERIC_COLUMNS)
+    cargo_capacity_num = db.Column(db.Float, nullable=True)  # cargo_capacity como número (ver NUMERIC_COLUMNS)
 
     films = db.relationship('Film', secondary=starships_films, backref=db.backref('starships', lazy=True))  # Definir una relación many-to-many con películas
     favoritos = db.relationship("Favoritos", back_populates="starship") # Relación uno a uno con la tabla Favoritos
 
+    # (columna _num, id): filtros de rango y ?sort= numérico de filters.py
+    __table_args__ = (
+        db.Index('ix_starship_cost_in_credits_num_id', 'cost_in_credits_num', 'id'),
+        db.Index('ix_starship_length_num_id', 'length_num', 'id'),
+        db.Index('ix_starship_crew_num_id', 'crew_num', 'id'),
+        db.Index('ix_starship_passengers_num_id', 'passengers_num', 'id'),
+        db.Index('ix_starship_max_atmosphering_speed_num_id', 'max_atmosphering_speed_num', 'id'),
+        db.Index('ix_starship_hyperdrive_rating_num_id', 'hyperdrive_rating_num', 'id'),
+        db.Index('ix_starship_mglt_num_id', 'MGLT_num', 'id'),
+        db.Index('ix_starship_cargo_capacity_num_id', 'cargo_capacity_num', 'id'),
+    )
+
 
     # Método para representar un objeto de nave espacial como una cadena
     def __repr__(self):  # Definir un método para representación de cadena
         return '<Starship %r>' % self.id  # Devolver una cadena que representa el objeto nave espacial
 
+    # serialize() solo usa columnas propias: no hay relaciones que precargar
+    @classmethod
+    def serialize_options(cls):
+        return []
+
     # Método para serializar un objeto de nave espacial a un diccionario JSON
     def serialize(self):  # Definir un método para serializar el objeto nave espacial
         return {  # Devolver un diccionario con los atributos de la nave espacial
@@ -217,8 +347,8 @@ class Starship(db.Model):
             "MGLT": self.MGLT,
             "cargo_capacity": self.cargo_capacity,
             "consumables": self.consumables,
-            "created": self.created.strftime('%Y-%m-%d'),
-            "edited": self.edited.strftime('%Y-%m-%d'),
+            "created": self.created.strftime('%Y-%m-%d') if self.created else None,
+            "edited": self.edited.strftime('%Y-%m-%d') if self.edited else None,
             "url": self.url
         }
 
@@ -241,16 +371,37 @@ class Vehicle(db.Model):
     cargo_capacity = db.Column(db.String(50), nullable=True)  # Definir una columna de tipo string con restricciones de no nulidad
     consumables = db.Column(db.String(50), nullable=True)  # Definir una columna de tipo string con restricciones de no nulidad
     created = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
-    edited = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
+    edited = db.Column(db.DateTime, onupdate=datetime.utcnow, nullable=True)  # Fecha de edición, se actualiza automáticamente (la usan los ETag)
     url = db.Column(db.String(255), unique=True, nullable=True)  # Definir una columna de tipo string con restricciones de unicidad y no nulidad
+    cost_in_credits_num = db.Column(db.Float, nullable=True)  # cost_in_credits como número (ver NUMERIC_COLUMNS)
+    length_num = db.Column(db.Float, nullable=True)  # length como número (ver NUMERIC_COLUMNS)
+    crew_num = db.Column(db.Float, nullable=True)  # crew como número (ver NUMERIC_COLUMNS)
+    passengers_num = db.Column(db.Float, nullable=True)  # passengers como número (ver NUMERIC_COLUMNS)
+    max_atmosphering_speed_num = db.Column(db.Float, nullable=True)  # max_atmosphering_speed como número (ver NUMERIC_COLUMNS)
+    cargo_capacity_num = db.Column(db.Float, nullable=True)  # cargo_capacity como número (ver NUMERIC_COLUMNS)
 
     films = db.relationship('Film', secondary=vehicles_films, backref=db.backref('vehicles', lazy=True))  # Definir una relación many-to-many con películas
     favoritos = db.relationship("Favoritos", back_populates="vehicle") # Relación uno a uno con la tabla Favoritos
 
+    # (columna _num, id): filtros de rango y ?sort= numérico de filters.py
+    __table_args__ = (
+        db.Index('ix_vehicle_cost_in_credits_num_id', 'cost_in_credits_num', 'id'),
+        db.Index('ix_vehicle_length_num_id', 'length_num', 'id'),
+        db.Index('ix_vehicle_crew_num_id', 'crew_num', 'id'),
+        db.Index('ix_vehicle_passengers_num_id', 'passengers_num', 'id'),
+        db.Index('ix_vehicle_max_atmosphering_speed_num_id', 'max_atmosphering_speed_num', 'id'),
+        db.Index('ix_vehicle_cargo_capacity_num_id', 'cargo_capacity_num', 'id'),
+    )
+
     # Método para representar un objeto de vehículo como una cadena
     def __repr__(self):  # Definir un método para representación de cadena
         return '<Vehicle %r>' % self.id  # Devolver una cadena que representa el objeto vehículo
 
+    # serialize() solo usa columnas propias: no hay relaciones que precargar
+    @classmethod
+    def serialize_options(cls):
+        return []
+
     # Método para serializar un objeto de vehículo a un diccionario JSON
     def serialize(self):  # Definir un método para serializar el objeto vehículo
         return {  # Devolver un diccionario con los atributos del vehículo
@@ -266,8 +417,8 @@ class Vehicle(db.Model):
             "max_atmosphering_speed": self.max_atmosphering_speed,
             "cargo_capacity": self.cargo_capacity,
             "consumables": self.consumables,
-            "created": self.created.strftime('%Y-%m-%d'),
-            "edited": self.edited.strftime('%Y-%m-%d'),
+            "created": self.created.strftime('%Y-%m-%d') if self.created else None,
+            "edited": self.edited.strftime('%Y-%m-%d') if self.edited else None,
             "url": self.url
         }
 
@@ -290,18 +441,33 @@ class Species(db.Model):
     language = db.Column(db.String(255), nullable=False)  # Definir una columna de tipo string con restricciones de no nulidad
     # homeworld = db.Column(db.String(255), nullable=False)  # Definir una columna de tipo string con restricciones de no nulidad
     created = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
-    edited = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
+    edited = db.Column(db.DateTime, onupdate=datetime.utcnow, nullable=True)  # Fecha de edición, se actualiza automáticamente (la usan los ETag)
     homeworld_id = db.Column(db.Integer, db.ForeignKey('planet.id'))  # Definir una columna de clave externa que referencia la tabla de planetas
     url = db.Column(db.String(255), unique=True, nullable=True)  # Definir una columna de tipo string con restricciones de unicidad y no nulidad
+    average_height_num = db.Column(db.Float, nullable=True)  # average_height como número (ver NUMERIC_COLUMNS)
+    average_lifespan_num = db.Column(db.Float, nullable=True)  # average_lifespan como número (ver NUMERIC_COLUMNS)
 
     homeworld = db.relationship('Planet', backref='species_homeworld', lazy=True)  # Definir una relación many-to-one con planetas
     films = db.relationship('Film', secondary=species_films, backref=db.backref('species', lazy=True))  # Definir una relación many-to-many con películas
     favoritos = db.relationship("Favoritos", back_populates="species") # Relación uno a uno con la tabla Favoritos
 
+    # (columna _num, id): filtros de rango y ?sort= numérico de filters.py
+    __table_args__ = (
+        db.Index('ix_species_average_height_num_id', 'average_height_num', 'id'),
+        db.Index('ix_species_average_lifespan_num_id', 'average_lifespan_num', 'id'),
+    )
+
+    etag_relations = ('homeworld',)  # serialize() muestra homeworld.name: su edición también invalida el ETag
+
     # Método para representar un objeto de especie como una cadena
     def __repr__(self):  # Definir un método para representación de cadena
         return '<Species %r>' % self.id  # Devolver una cadena que representa el objeto especie
 
+    # serialize() lee homeworld.name: se resuelve con JOIN en la misma consulta
+    @classmethod
+    def serialize_options(cls):
+        return [joinedload(cls.homeworld)]
+
     # Método para serializar un objeto de especie a un diccionario JSON
     def serialize(self):  # Definir un método para serializar el objeto especie
         return {  # Devolver un diccionario con los atributos de la especie
@@ -316,8 +482,8 @@ class Species(db.Model):
             "skin_colors": self.skin_colors,
             "language": self.language,
             "homeworld": self.homeworld.name if self.homeworld else None, #serialize() if self.homeworld else None,  # Serializar el planeta asociado al personaje si existe
-            "created": self.created.strftime('%Y-%m-%d'),
-            "edited": self.edited.strftime('%Y-%m-%d'),
+            "created": self.created.strftime('%Y-%m-%d') if self.created else None,
+            "edited": self.edited.strftime('%Y-%m-%d') if self.edited else None,
             "url": self.url
         }
 
@@ -338,17 +504,41 @@ class Planet(db.Model):
     terrain = db.Column(db.String(255), nullable=True)  # Definir una columna de tipo string con restricciones de no nulidad
     surface_water = db.Column(db.String(50), nullable=True)  # Definir una columna de tipo string con restricciones de no nulidad
     created = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
-    edited = db.Column(db.DateTime, nullable=True)  # Definir una columna de tipo fecha y hora con restricciones de no nulidad
+    edited = db.Column(db.DateTime, onupdate=datetime.utcnow, nullable=True)  # Fecha de edición, se actualiza automáticamente (la usan los ETag)
     url = db.Column(db.String(255), unique=True, nullable=True)  # Definir una columna de tipo string con restricciones de unicidad y no nulidad
+    diameter_num = db.Column(db.Float, nullable=True)  # diameter como número (ver NUMERIC_COLUMNS)
+    rotation_period_num = db.Column(db.Float, nullable=True)  # rotation_period como número (ver NUMERIC_COLUMNS)
+    orbital_period_num = db.Column(db.Float, nullable=True)  # orbital_period como número (ver NUMERIC_COLUMNS)
+    surface_water_num = db.Column(db.Float, nullable=True)  # surface_water como número (ver NUMERIC_COLUMNS)
+    population_num = db.Column(db.Float, nullable=True)  # population como número (ver NUMERIC_COLUMNS)
 
     # residents = db.relationship('Character', backref='residents_homeworld', lazy=True)  # Definir una relación one-to-many con personajes (residents)
 
     films = db.relationship('Film', secondary=films_planets, backref=db.backref('planets', lazy=True))  # Definir una relación many-to-many con películas
     favoritos = db.relationship("Favoritos", back_populates="planet") # Relación uno a uno con la tabla Favoritos
 
+    # (columna, id) para cada filtro/orden de filters.py: WHERE columna = x ORDER BY id es un recorrido de índice
+    __table_args__ = (
+        db.Index('ix_planet_name_id', 'name', 'id'),
+        db.Index('ix_planet_climate_id', 'climate', 'id'),
+        db.Index('ix_planet_terrain_id', 'terrain', 'id'),
+        db.Index('ix_planet_created_id', 'created', 'id'),
+        db.Index('ix_planet_edited_id', 'edited', 'id'),
+        db.Index('ix_planet_diameter_num_id', 'diameter_num', 'id'),
+        db.Index('ix_planet_rotation_period_num_id', 'rotation_period_num', 'id'),
+        db.Index('ix_planet_orbital_period_num_id', 'orbital_period_num', 'id'),
+        db.Index('ix_planet_surface_water_num_id', 'surface_water_num', 'id'),
+        db.Index('ix_planet_population_num_id', 'population_num', 'id'),
+    )
+
     def __repr__(self):  # Método para representar un objeto de planeta como una cadena
         return '<Planet %r>' % self.id  # Devolver una cadena que representa el objeto planeta
 
+    # serialize() solo usa columnas propias: no hay relaciones que precargar
+    @classmethod
+    def serialize_options(cls):
+        return []
+
     def serialize(self):  # Método para serializar un objeto de planeta a un diccionario JSON
         return {  # Devolver un diccionario con los atributos del planeta
             "id": self.id,
@@ -383,6 +573,8 @@ class Character(db.Model):
     birth_year = db.Column(db.String(10), nullable=True)  # Definir una columna de tipo string (opcional)
     homeworld_id = db.Column(db.Integer, db.ForeignKey('planet.id'))  # Definir una columna de clave externa que referencia la tabla de planetas
     url = db.Column(db.String(120), nullable=True)  # Definir una columna de tipo string (opcional)
+    height_num = db.Column(db.Float, nullable=True)  # height como número (ver NUMERIC_COLUMNS)
+    mass_num = db.Column(db.Float, nullable=True)  # mass como número (ver NUMERIC_COLUMNS)
     created = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)  # Definir una columna de tipo fecha y hora con valor predeterminado
     edited = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)  # Definir una columna de tipo fecha y hora con valor predeterminado y actualización automática
     film_id = db.Column(db.Integer, db.ForeignKey('film.id'))  # Definir una columna de clave externa que referencia la tabla de películas
@@ -391,9 +583,30 @@ class Character(db.Model):
     film = db.relationship('Film', backref=db.backref('characters', lazy=True))  # Definir una relación one-to-many con películas
     favoritos = db.relationship("Favoritos", back_populates="character") # Relación uno a uno con la tabla Favoritos
 
+    # (columna, id) para cada filtro/orden de filters.py: WHERE columna = x ORDER BY id es un recorrido de índice
+    __table_args__ = (
+        db.Index('ix_character_name_id', 'name', 'id'),
+        db.Index('ix_character_gender_id', 'gender', 'id'),
+        db.Index('ix_character_eye_color_id', 'eye_color', 'id'),
+        db.Index('ix_character_hair_color_id', 'hair_color', 'id'),
+        db.Index('ix_character_homeworld_id_id', 'homeworld_id', 'id'),
+        db.Index('ix_character_film_id_id', 'film_id', 'id'),
+        db.Index('ix_character_created_id', 'created', 'id'),
+        db.Index('ix_character_edited_id', 'edited', 'id'),
+        db.Index('ix_character_height_num_id', 'height_num', 'id'),
+        db.Index('ix_character_mass_num_id', 'mass_num', 'id'),
+    )
+
+    etag_relations = ('homeworld', 'film')  # serialize() muestra homeworld.name y film.title: su edición también invalida el ETag
+
     def __repr__(self):  # Método para representar un objeto de personaje como una cadena
         return '<Character %r>' % self.id  # Devolver una cadena que representa el objeto personaje
 
+    # serialize() lee homeworld.name y film.title: se resuelven con JOIN en la misma consulta
+    @classmethod
+    def serialize_options(cls):
+        return [joinedload(cls.homeworld), joinedload(cls.film)]
+
     def serialize(self):  # Método para serializar un objeto de personaje a un diccionario JSON
         return {  # Devolver un diccionario con los atributos del personaje
             "id": self.id,
@@ -407,11 +620,18 @@ class Character(db.Model):
             "birth_year": self.birth_year,
             "homeworld": self.homeworld.name if self.homeworld else None, #serialize() if self.homeworld else None,  # Serializar el planeta asociado al personaje si existe
             "url": self.url,
-            "created": self.created.strftime('%Y-%m-%d'),  # Formatear la fecha de creación '%Y-%m-%dT%H:%M:%S.%fZ'
-            "edited": self.edited.strftime('%Y-%m-%d'),  # Formatear la fecha de edición
+            "created": self.created.strftime('%Y-%m-%d') if self.created else None,  # Formatear la fecha de creación '%Y-%m-%dT%H:%M:%S.%fZ'
+            "edited": self.edited.strftime('%Y-%m-%d') if self.edited else None,  # Formatear la fecha de edición
             "film": self.film.title if self.film else None #serialize() if self.film else None  # Serializar la película asociada al personaje si existe
         }
 
+# Las escrituras por el ORM (POST/PUT, admin) recalculan las columnas _num antes de cada INSERT/UPDATE
+@event.listens_for(db.Model, 'before_insert', propagate=True)
+@event.listens_for(db.Model, 'before_update', propagate=True)
+def _sync_numeric(mapper, connection, target):
+    for column in NUMERIC_COLUMNS.get(mapper.local_table.name, ()):
+        setattr(target, column + '_num', parse_number(getattr(target, column)))
+
 # este código define las clases que representan las tablas de la base de datos en un modelo de objetos, 
 # utilizando SQLAlchemy en Flask para la interacción con la base de datos. Cada clase define sus atributos 
 # como columnas de la tabla correspondiente y métodos para representar y serializar los objetos.      
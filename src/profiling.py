@@ -0,0 +1,220 @@
+"""
+Perfilado bajo demanda de una sola petición, para diagnosticar en producción sin redesplegar.
+
+Desactivado salvo que se defina PROFILE_SECRET. Con él, una petición que envía la cabecera
+`X-Profile: <PROFILE_SECRET>` se ejecuta bajo un perfilador determinista:
+
+- X-Profile-Format: text (por defecto) JSON con duración, desglose de SQL por sentencia y
+                    las funciones más costosas (pstats ordenado por tiempo acumulado)
+                    pstats      volcado binario de cProfile (pstats.Stats, snakeviz)
+                    speedscope  traza de llamadas para https://www.speedscope.app
+- X-Profile-Store: 1  devuelve la respuesta normal y guarda el perfil en PROFILE_DIR
+                      (por defecto el directorio temporal); la ruta va en X-Profile-File.
+
+    curl -H "X-Profile: $PROFILE_SECRET" https://.../users
+"""
+import cProfile
+import hmac
+import io
+import json
+import marshal
+import os
+import pstats
+import re
+import sys
+import tempfile
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.wrappers import Request, Response
+
+PROFILE_FORMATS = ('text', 'pstats', 'speedscope')
+TOP_FUNCTIONS = 60
+
+# Sentencias ejecutadas durante la petición perfilada: [(sentencia, segundos)]
+current_statements = ContextVar('profiled_statements', default=None)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_statements.get() is not None:
+        conn.info.setdefault('profile_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = current_statements.get()
+    if statements is not None and conn.info.get('profile_start_time'):
+        statements.append((statement, time.perf_counter() - conn.info['profile_start_time'].pop()))
+
+
+def sql_breakdown(statements):
+    """Agrupa por texto de la sentencia: cuántas veces se ejecutó y cuánto tardó en total."""
+    grouped = {}
+    for statement, elapsed in statements:
+        entry = grouped.setdefault(statement, {"statement": statement, "count": 0, "total_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += elapsed * 1000
+    ordered = sorted(grouped.values(), key=lambda entry: entry["total_ms"], reverse=True)
+    for entry in ordered:
+        entry["total_ms"] = round(entry["total_ms"], 3)
+    return {
+        "statements": len(statements),
+        "total_ms": round(sum(elapsed for _, elapsed in statements) * 1000, 3),
+        "by_statement": ordered,
+    }
+
+
+class SpeedscopeTracer:
+    """Registra cada entrada/salida de función (sys.setprofile) como perfil 'evented' de speedscope."""
+
+    def __init__(self):
+        self.frames = []
+        self.frame_index = {}
+        self.events = []
+        self.stack = []
+        self.start = None
+
+    def _frame(self, key):
+        index = self.frame_index.get(key)
+        if index is None:
+            name, path, line = key
+            index = self.frame_index[key] = len(self.frames)
+            self.frames.append({"name": name, "file": path, "line": line})
+        return index
+
+    def _now(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def _trace(self, frame, event_name, arg):
+        if event_name == 'call':
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+        elif event_name == 'c_call':
+            key = (getattr(arg, '__qualname__', repr(arg)), '<built-in>', 0)
+        else:
+            if self.stack and event_name in ('return', 'c_return', 'c_exception'):
+                self.events.append({"type": "C", "frame": self.stack.pop(), "at": self._now()})
+            return
+        index = self._frame(key)
+        self.stack.append(index)
+        self.events.append({"type": "O", "frame": index, "at": self._now()})
+
+    def enable(self):
+        self.start = time.perf_counter()
+        sys.setprofile(self._trace)
+
+    def disable(self):
+        sys.setprofile(None)
+        end = self._now()
+        while self.stack:  # Llamadas que seguían abiertas al terminar
+            self.events.append({"type": "C", "frame": self.stack.pop(), "at": end})
+
+    def export(self, name):
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "swapi-profiling",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "evented",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": self.events[-1]["at"] if self.events else 0,
+                "events": self.events,
+            }],
+        }
+
+
+class ProfilingMiddleware:
+    """Middleware WSGI: perfila solo las peticiones que traen X-Profile con el secreto correcto."""
+
+    def __init__(self, wsgi_app, secret, directory=None):
+        self.wsgi_app = wsgi_app
+        self.secret = secret
+        self.directory = directory or tempfile.gettempdir()
+
+    def _authorized(self, environ):
+        provided = environ.get('HTTP_X_PROFILE')
+        return bool(provided) and hmac.compare_digest(provided.encode('utf-8'), self.secret.encode('utf-8'))
+
+    def __call__(self, environ, start_response):
+        if not self._authorized(environ):
+            return self.wsgi_app(environ, start_response)
+
+        request = Request(environ)
+        profile_format = request.headers.get('X-Profile-Format', 'text')
+        if profile_format not in PROFILE_FORMATS:
+            response = Response(json.dumps({"message": "X-Profile-Format must be one of: %s" % ', '.join(PROFILE_FORMATS)}),
+                                status=400, mimetype='application/json')
+            return response(environ, start_response)
+        store = request.headers.get('X-Profile-Store') in ('1', 'true')
+
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            return lambda data: captured.setdefault('written', []).append(data)
+
+        profiler = SpeedscopeTracer() if profile_format == 'speedscope' else cProfile.Profile()
+        statements = []
+        token = current_statements.set(statements)
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            # Se consume el cuerpo completo dentro del perfil: en streaming la serialización ocurre aquí
+            result = self.wsgi_app(environ, capture_start_response)
+            try:
+                body = b''.join(captured.get('written', [])) + b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            current_statements.reset(token)
+
+        name = '%s %s' % (request.method, request.full_path.rstrip('?'))
+        summary = {
+            "request": name,
+            "status": int(captured['status'].split(' ', 1)[0]),
+            "duration_ms": round(elapsed * 1000, 3),
+            "response_bytes": len(body),
+            "sql": sql_breakdown(statements),
+        }
+        if profile_format == 'speedscope':
+            content, mimetype, extension = json.dumps(profiler.export(name)), 'application/json', 'speedscope.json'
+        elif profile_format == 'pstats':
+            profiler.create_stats()
+            content, mimetype, extension = marshal.dumps(profiler.stats), 'application/octet-stream', 'prof'
+        else:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            summary["profile"] = output.getvalue()
+            content, mimetype, extension = json.dumps(summary, indent=2), 'application/json', 'json'
+
+        profile_headers = [('X-Profile-Duration-Ms', str(summary["duration_ms"])),
+                           ('X-Profile-SQL-Statements', str(summary["sql"]["statements"])),
+                           ('X-Profile-SQL-Ms', str(summary["sql"]["total_ms"]))]
+        if store:
+            path = os.path.join(self.directory, '%s-%s-%s.%s' % (
+                datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'), request.method,
+                re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root', extension))
+            with open(path, 'wb') as f:
+                f.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+            headers = [(key, value) for key, value in captured['headers'] if key.lower() != 'content-length']
+            start_response(captured['status'], headers + profile_headers + [('X-Profile-File', path), ('Content-Length', str(len(body)))])
+            return [body]
+
+        response = Response(content, mimetype=mimetype, headers=profile_headers)
+        return response(environ, start_response)
+
+
+def setup_profiling(app):
+    secret = os.getenv('PROFILE_SECRET')
+    if secret:
+        app.wsgi_app = ProfilingMiddleware(app.wsgi_app, secret, os.getenv('PROFILE_DIR'))
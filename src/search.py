@@ -0,0 +1,184 @@
+"""
+Búsqueda de texto completo en el catálogo:
+
+    /search?q=skywalker&type=character,planet&limit=20
+
+- PostgreSQL: cada tabla tiene una columna generada search_vector (tsvector, config 'english')
+  con índice GIN. El nombre (o el título) pesa 'A' y el resto de columnas 'B'.
+- SQLite: una tabla virtual FTS5 search_index (name, body) con el mismo contenido, mantenida
+  por triggers de cada tabla. El rowid codifica la fila: id * 8 + código del tipo.
+- Las palabras de q se combinan con AND y se reducen a su raíz ("deserts" encuentra "desert").
+- Resultados ordenados por relevancia (rank, mayor primero), luego tipo e id; ?after= es un
+  cursor con (rank, tipo, id) del último resultado, como en los listados.
+
+Las columnas y triggers los crea la migración 7d2f6a1c3e58 o, con db.create_all(), el evento
+after_create de este módulo (db.drop_all() borra search_index con after_drop). Ninguno de los dos está en los modelos.
+"""
+import re
+from sqlalchemy import DDL, Float, and_, cast, column, event, func, literal, or_, select, table, text, union_all
+from models import db, Character, Planet, Film, Species, Starship, Vehicle
+from utils import APIException, decode_cursor_data, encode_cursor
+
+TEXT_SEARCH_CONFIG = 'english'
+
+# tipo -> (modelo, columnas indexadas); la primera es la que se muestra en el resultado.
+# El orden fija el código del tipo en el rowid de search_index: solo se agregan al final.
+SEARCH_TYPES = {
+    'character': (Character, ('name',)),
+    'planet': (Planet, ('name', 'climate', 'terrain')),
+    'film': (Film, ('title', 'opening_crawl')),
+    'species': (Species, ('name',)),
+    'starship': (Starship, ('name', 'model')),
+    'vehicle': (Vehicle, ('name', 'model')),
+}
+TYPE_CODES = {kind: code for code, kind in enumerate(SEARCH_TYPES, 1)}
+ROWID_FACTOR = 8  # > número de tipos
+
+
+#------------------------------------------------------------------------ESQUEMA-------------------------------------------------------------
+
+def _text(columns, prefix=''):
+    return " || ' ' || ".join("coalesce(%s%s, '')" % (prefix, name) for name in columns)
+
+
+def postgres_ddl(kind):
+    """ALTER TABLE con la columna generada search_vector y su índice GIN."""
+    model, columns = SEARCH_TYPES[kind]
+    vector = "setweight(to_tsvector('%s', %s), 'A')" % (TEXT_SEARCH_CONFIG, _text(columns[:1]))
+    if len(columns) > 1:
+        vector += " || setweight(to_tsvector('%s', %s), 'B')" % (TEXT_SEARCH_CONFIG, _text(columns[1:]))
+    name = model.__tablename__
+    return [
+        'ALTER TABLE "%s" ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (%s) STORED' % (name, vector),
+        'CREATE INDEX ix_%s_search_vector ON "%s" USING gin (search_vector)' % (name, name),
+    ]
+
+
+def sqlite_ddl():
+    """Tabla FTS5 search_index y los triggers que la sincronizan con cada tabla."""
+    statements = ["CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(name, body, tokenize='porter unicode61')"]
+    for kind, (model, columns) in SEARCH_TYPES.items():
+        name, code = model.__tablename__, TYPE_CODES[kind]
+        insert = "INSERT INTO search_index (rowid, name, body) VALUES (NEW.id * %d + %d, %s, %s);" % (
+            ROWID_FACTOR, code, _text(columns[:1], 'NEW.'), _text(columns[1:], 'NEW.') or "''")
+        delete = "DELETE FROM search_index WHERE rowid = OLD.id * %d + %d;" % (ROWID_FACTOR, code)
+        statements += [
+            'CREATE TRIGGER IF NOT EXISTS %s_search_insert AFTER INSERT ON "%s" BEGIN %s END' % (name, name, insert),
+            'CREATE TRIGGER IF NOT EXISTS %s_search_update AFTER UPDATE OF %s ON "%s" BEGIN %s %s END' % (
+                name, ', '.join(('id',) + columns), name, delete, insert),
+            'CREATE TRIGGER IF NOT EXISTS %s_search_delete AFTER DELETE ON "%s" BEGIN %s END' % (name, name, delete),
+        ]
+    return statements
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, tables=(), **kw):
+    # db.create_all() (bench, bases de prueba): las tablas nuevas están vacías, no hay nada que copiar
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        for statement in sqlite_ddl():
+            connection.execute(DDL(statement))
+    elif dialect == 'postgresql':
+        created = {created_table.name for created_table in tables}
+        for kind, (model, columns) in SEARCH_TYPES.items():
+            if model.__tablename__ in created:
+                for statement in postgres_ddl(kind):
+                    connection.execute(DDL(statement))
+
+
+@event.listens_for(db.metadata, 'after_drop')
+def _drop_search_index(target, connection, **kw):
+    # search_index no está en los modelos: sin esto, db.drop_all() + db.create_all() la deja con filas viejas
+    if connection.dialect.name == 'sqlite':
+        connection.execute(DDL('DROP TABLE IF EXISTS search_index'))
+
+
+#------------------------------------------------------------------------CONSULTA-------------------------------------------------------------
+
+def parse_types(value):
+    """'planet,film' -> ('planet', 'film'); todos los tipos si no se pidió ?type."""
+    if not value:
+        return tuple(SEARCH_TYPES)
+    kinds = tuple(dict.fromkeys(kind.strip() for kind in value.split(',') if kind.strip()))
+    unknown = [kind for kind in kinds if kind not in SEARCH_TYPES]
+    if not kinds or unknown:
+        raise APIException('Unknown type: %s. Valid types: %s' % (', '.join(unknown) or value, ', '.join(SEARCH_TYPES)), status_code=400)
+    return kinds
+
+
+def parse_after(cursor):
+    """Cursor de ?after= -> (rank, código del tipo, id)."""
+    if not cursor:
+        return None
+    data = decode_cursor_data(cursor)
+    try:
+        rank, kind = data['v']
+        return float(rank), TYPE_CODES[kind], data['id']
+    except (KeyError, TypeError, ValueError):
+        raise APIException('Invalid cursor', status_code=400)
+
+
+def _keyset(rank, code, model_id, after):
+    """Filas de una rama (tipo code) posteriores a after en el orden rank DESC, tipo, id."""
+    after_rank, after_code, after_id = after
+    if code == after_code:
+        return or_(rank < after_rank, and_(rank == after_rank, model_id > after_id))
+    return rank <= after_rank if code > after_code else rank < after_rank
+
+
+def _postgres_statement(query, kinds, after, limit):
+    tsquery = func.plainto_tsquery(TEXT_SEARCH_CONFIG, query)  # SQLAlchemy convierte la config a regconfig
+    branches = []
+    for kind in kinds:
+        model, columns = SEARCH_TYPES[kind]
+        searchable = table(model.__tablename__, column('id'), column(columns[0]), column('search_vector'))
+        # ts_rank es real (float4); el cursor guarda un float de Python (float8). Con el cast el ORDER BY,
+        # el cursor y la comparación del keyset usan el mismo valor double y el borde de página no se repite ni se pierde
+        rank = cast(func.ts_rank(searchable.c.search_vector, tsquery), Float(53))
+        branch = select(literal(TYPE_CODES[kind]).label('code'), searchable.c.id, searchable.c[columns[0]].label('name'), rank.label('rank'))
+        branch = branch.where(searchable.c.search_vector.op('@@')(tsquery))
+        if after is not None:
+            branch = branch.where(_keyset(rank, TYPE_CODES[kind], searchable.c.id, after))
+        # Cada rama devuelve solo sus mejores limit + 1: el índice GIN resuelve el @@ y solo se ordenan las coincidencias
+        branches.append(branch.order_by(rank.desc(), searchable.c.id).limit(limit + 1))
+    hits = union_all(*branches).subquery('hits')
+    return select(hits).order_by(hits.c.rank.desc(), hits.c.code, hits.c.id).limit(limit + 1)
+
+
+def _sqlite_statement(query, kinds, after, limit):
+    words = re.findall(r'\w+', query.lower())
+    conditions = ['code IN (%s)' % (', '.join(str(TYPE_CODES[kind]) for kind in kinds))]
+    params = {'query': ' '.join('"%s"' % word for word in words), 'limit': limit + 1}
+    if after is not None:
+        conditions.append('(rank < :rank OR (rank = :rank AND (code > :code OR (code = :code AND id > :id))))')
+        params.update(rank=after[0], code=after[1], id=after[2])
+    # bm25 es menor cuanto más relevante: se invierte para ordenar igual que ts_rank. name pesa más que body
+    statement = text(
+        'SELECT code, id, name, rank FROM ('
+        ' SELECT rowid %% %d AS code, rowid / %d AS id, name, -bm25(search_index, 1.0, 0.4) AS rank'
+        ' FROM search_index WHERE search_index MATCH :query'
+        ') WHERE %s ORDER BY rank DESC, code, id LIMIT :limit' % (ROWID_FACTOR, ROWID_FACTOR, ' AND '.join(conditions)))
+    return statement.bindparams(**params)
+
+
+def search(query, kinds, after=None, limit=50):
+    """Página de resultados [{type, id, name, rank}] y cursor siguiente."""
+    query = (query or '').strip()
+    if not re.search(r'\w', query):
+        raise APIException('q is required', status_code=400)
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        statement = _postgres_statement(query, kinds, after, limit)
+    elif dialect == 'sqlite':
+        statement = _sqlite_statement(query, kinds, after, limit)
+    else:
+        raise APIException('Search is not available on %s' % dialect, status_code=501)
+    kind_names = {code: kind for kind, code in TYPE_CODES.items()}
+    rows = db.session.execute(statement).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        code, last_id, _, rank = rows[-1]
+        next_cursor = encode_cursor(last_id, 'rank', [rank, kind_names[code]])
+    results = [{"type": kind_names[code], "id": entity_id, "name": name, "rank": rank} for code, entity_id, name, rank in rows]
+    return results, next_cursor
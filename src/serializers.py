@@ -0,0 +1,230 @@
+"""
+Serializadores precompilados para los listados grandes.
+
+Cada modelo declara una vez sus campos (columna propia, fecha o nombre de una relación) y se
+compilan en:
+- una sentencia select() con solo esas columnas y un LEFT JOIN por relación, y
+- una función fila -> dict generada con exec, sin bucles ni getattr por campo.
+
+Trabajan sobre las tuplas Row de SQLAlchemy: no se instancian objetos ORM ni se pasa por la
+identity map. La salida es la misma que Model.serialize(), que se mantiene para los detalles,
+la cache de entidades y el admin.
+
+?fields=id,name selecciona un subconjunto de campos: only() compila (una vez por combinación)
+una sentencia que solo lee esas columnas y solo hace los JOIN de las relaciones pedidas.
+
+dumps() codifica con orjson si está instalado (SERIALIZER_JSON=stdlib lo desactiva); el
+resultado es el mismo JSON que jsonify, salvo que orjson deja los caracteres no ASCII sin escapar.
+
+    characters = SERIALIZERS[Character]
+    rows = db.session.execute(characters.statement())
+    body = dumps([characters.to_dict(row) for row in rows])
+"""
+import json
+import os
+import time
+from flask import Response, request
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from metrics import current_stats
+from models import db, User, Film, Starship, Vehicle, Species, Planet, Character, Favoritos
+from utils import APIException, make_etag
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+USE_ORJSON = orjson is not None and os.getenv('SERIALIZER_JSON', 'orjson') != 'stdlib'
+
+
+#------------------------------------------------------------------------CAMPOS-------------------------------------------------------------
+
+class Field:
+    """Columna propia del modelo, tal cual."""
+    format = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def expression(self, model, joins):
+        return getattr(model, self.name)
+
+
+class Date(Field):
+    """DateTime o Date formateado como '%Y-%m-%d'; isoformat()[:10] da lo mismo que strftime y es varias veces más rápido."""
+    format = '(None if {value} is None else {value}.isoformat()[:10])'
+
+
+class Related(Field):
+    """Columna de una relación many-to-one (homeworld.name, film.title...), resuelta con LEFT JOIN."""
+
+    def __init__(self, name, column):
+        super().__init__(name)
+        self.column = column
+
+    def expression(self, model, joins):
+        relationship = getattr(model, self.name)
+        target = aliased(relationship.property.mapper.class_)  # Alias propio: Character une planet y film, Favoritos seis tablas
+        joins.append((target, relationship.of_type(target)))
+        return getattr(target, self.column)
+
+
+#------------------------------------------------------------------------SERIALIZADOR-------------------------------------------------------------
+
+class Serializer:
+    """Lista de campos de un modelo compilada en una sentencia y una función fila -> dict."""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.names = tuple(field.name for field in fields)
+        self._subsets = {}
+        joins = []
+        columns = [field.expression(model, joins).label(field.name) for field in fields]
+        # La paginación necesita el id aunque no se haya pedido: va como última columna y no se serializa
+        self._hidden_id = 'id' not in self.names
+        if self._hidden_id:
+            columns.append(model.id)
+        self._id_index = len(fields) if self._hidden_id else self.names.index('id')
+        self.width = len(columns)
+        statement = select(*columns).select_from(model)
+        for target, on in joins:
+            statement = statement.outerjoin(target, on)
+        self._statement = statement
+        self.to_dict = self._compile(fields, self._hidden_id)
+
+    @staticmethod
+    def _compile(fields, hidden_id):
+        # def to_dict(row):
+        #     f0, f1, ... = row
+        #     return {"id": f0, "created": (None if f2 is None else f2.isoformat()[:10]), ...}
+        names = ['f%d' % position for position in range(len(fields))]
+        items = []
+        for name, field in zip(names, fields):
+            value = field.format.format(value=name) if field.format else name
+            items.append('%r: %s' % (field.name, value))
+        unpacked = names + ['_id'] if hidden_id else names
+        source = 'def to_dict(row):\n    %s, = row\n    return {%s}\n' % (', '.join(unpacked), ', '.join(items))
+        namespace = {}
+        exec(compile(source, '<serializer>', 'exec'), namespace)
+        return namespace['to_dict']
+
+    def parse_fields(self, value, extra=()):
+        """'id,name' -> ('id', 'name'); None si no se pidió ?fields. extra: claves que arma el handler (User.favoritos)."""
+        if value is None:
+            return None
+        names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        allowed = self.names + tuple(extra)
+        unknown = [name for name in names if name not in allowed]
+        if not names or unknown:
+            raise APIException('Unknown fields: %s. Valid fields: %s' % (', '.join(unknown) or value, ', '.join(allowed)), status_code=400)
+        return names
+
+    def only(self, names):
+        """Serializador con solo esos campos (None: todos), compilado una vez por combinación."""
+        if names is None:
+            return self
+        key = frozenset(names)
+        subset = self._subsets.get(key)
+        if subset is None:
+            subset = self._subsets[key] = Serializer(self.model, [field for field in self.fields if field.name in key])
+        return subset
+
+    def statement(self, order_by=None):
+        """select() de las columnas serializadas ordenado por id (u order_by), listo para filtrar o paginar."""
+        return self._statement.order_by(*(order_by or [self.model.id]))
+
+    def row_id(self, row):
+        return row[self._id_index]
+
+    def all(self, statement=None):
+        return [self.to_dict(row) for row in db.session.execute(self.statement() if statement is None else statement)]
+
+
+SERIALIZERS = {
+    # Solo las columnas propias: la lista de favoritos la arma app.py con User.serialize() cuando se pide
+    User: Serializer(User, [
+        Field('id'), Field('email'), Field('username'), Field('name'), Field('last_name'),
+    ]),
+    Film: Serializer(Film, [
+        Field('id'), Field('title'), Field('episode_id'), Field('director'), Field('opening_crawl'), Field('producer'),
+        Date('release_date'), Date('created'), Date('edited'), Field('url'),
+    ]),
+    Starship: Serializer(Starship, [
+        Field('id'), Field('name'), Field('model'), Field('starship_class'), Field('manufacturer'), Field('cost_in_credits'),
+        Field('length'), Field('crew'), Field('passengers'), Field('max_atmosphering_speed'), Field('hyperdrive_rating'),
+        Field('MGLT'), Field('cargo_capacity'), Field('consumables'), Date('created'), Date('edited'), Field('url'),
+    ]),
+    Vehicle: Serializer(Vehicle, [
+        Field('id'), Field('name'), Field('model'), Field('vehicle_class'), Field('manufacturer'), Field('cost_in_credits'),
+        Field('length'), Field('crew'), Field('passengers'), Field('max_atmosphering_speed'), Field('cargo_capacity'),
+        Field('consumables'), Date('created'), Date('edited'), Field('url'),
+    ]),
+    Species: Serializer(Species, [
+        Field('id'), Field('name'), Field('classification'), Field('designation'), Field('average_height'),
+        Field('average_lifespan'), Field('eye_colors'), Field('hair_colors'), Field('skin_colors'), Field('language'),
+        Related('homeworld', 'name'), Date('created'), Date('edited'), Field('url'),
+    ]),
+    Planet: Serializer(Planet, [
+        Field('id'), Field('name'), Field('diameter'), Field('rotation_period'), Field('orbital_period'), Field('gravity'),
+        Field('population'), Field('climate'), Field('terrain'), Field('surface_water'), Date('created'), Date('edited'),
+        Field('url'),
+    ]),
+    Character: Serializer(Character, [
+        Field('id'), Field('name'), Field('eye_color'), Field('skin_color'), Field('gender'), Field('height'), Field('mass'),
+        Field('hair_color'), Field('birth_year'), Related('homeworld', 'name'), Field('url'), Date('created'), Date('edited'),
+        Related('film', 'title'),
+    ]),
+    Favoritos: Serializer(Favoritos, [
+        Field('id'), Related('film', 'title'), Related('species', 'name'), Related('starship', 'name'),
+        Related('character', 'name'), Related('planet', 'name'),
+    ]),
+}
+
+
+def get_fields(model, extra=()):
+    """Campos pedidos con ?fields=a,b para el modelo, validados; None si no se pidió."""
+    return SERIALIZERS[model].parse_fields(request.args.get('fields'), extra)
+
+
+def project(item, names):
+    """Solo las claves pedidas de un dict ya serializado (entidades en cache, User.serialize())."""
+    return item if names is None else {name: item[name] for name in names}
+
+
+def ids_payload(ids, entries, names=None):
+    """Respuesta de ?ids= a partir de las entradas de la cache de detalles: (cuerpo, (ETag, Last-Modified)).
+
+    Los resultados siguen el orden de ids; los que no existen se informan en "missing".
+    """
+    found = [entity_id for entity_id in ids if entries.get(entity_id) is not None]
+    missing = [entity_id for entity_id in ids if entries.get(entity_id) is None]
+    etag = make_etag('ids', ','.join(entries[entity_id][0][0] for entity_id in found), missing, names)
+    last_modified = max((entries[entity_id][0][1] for entity_id in found if entries[entity_id][0][1] is not None), default=None)
+    return {"results": [project(entries[entity_id][1], names) for entity_id in found], "missing": missing}, (etag, last_modified)
+
+
+#------------------------------------------------------------------------JSON-------------------------------------------------------------
+
+def dumps(obj):
+    """JSON compacto con claves ordenadas, como jsonify; devuelve bytes."""
+    stats = current_stats.get()
+    start = time.perf_counter()
+    try:
+        if USE_ORJSON:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        return json.dumps(obj, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    finally:
+        if stats is not None:
+            stats.serialize_seconds += time.perf_counter() - start
+
+
+def json_body(obj):
+    """Cuerpo de json_response(): el JSON con el salto de línea final, como jsonify."""
+    return dumps(obj) + b'\n'
+
+
+def json_response(obj, status=200):
+    """Reemplazo de jsonify para los listados: mismo cuerpo y mimetype."""
+    return Response(json_body(obj), status=status, mimetype='application/json')
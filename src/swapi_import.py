@@ -0,0 +1,319 @@
+"""
+Importador masivo de un volcado de SWAPI: `flask import-swapi <archivo>`.
+
+Formatos aceptados (se leen en streaming, nunca se carga el archivo entero):
+- NDJSON / JSON Lines: un recurso de SWAPI por línea (.ndjson, .jsonl).
+- Un array JSON de recursos.
+- Un objeto cuyos valores son arrays de recursos: {"films": [...], "people": [...], ...}.
+
+El tipo de cada recurso se deduce de su url (https://swapi.dev/api/planets/1/). Las
+filas se cargan con COPY en PostgreSQL (psycopg2) y con executemany por bloques en el
+resto; las referencias entre recursos (homeworld, films, planets...) se resuelven en
+memoria de url a id al final, con UPDATE/INSERT masivos.
+
+Los recursos cuya url ya existe no se vuelven a insertar, pero sus referencias sí se resuelven:
+volver a importar el volcado completa los homeworld_id, film_id y enlaces que faltaban (por
+ejemplo, si la primera carga fue parcial). Solo se actualizan las FK que cambian y solo se
+insertan los enlaces que no están.
+"""
+import io
+import json
+import re
+import time
+from contextlib import closing
+from datetime import datetime, date
+import click
+from sqlalchemy import insert, select, update, bindparam, or_, String, Text, DateTime, Date, Integer
+from models import db, fill_numeric, Film, Starship, Vehicle, Species, Planet, Character, starships_films, vehicles_films, species_films, films_planets
+from cache import invalidate_model
+
+URL_PATTERN = re.compile(r'/api/(films|people|planets|species|starships|vehicles)/\d+/?$')
+
+# Recurso de SWAPI -> modelo
+RESOURCES = {
+    'films': Film,
+    'people': Character,
+    'planets': Planet,
+    'species': Species,
+    'starships': Starship,
+    'vehicles': Vehicle,
+}
+
+# (recurso, campo con la lista de urls) -> (tabla de asociación, columna del recurso, columna del destino)
+ASSOCIATIONS = {
+    ('films', 'planets'): (films_planets, 'film_id', 'planet_id'),
+    ('planets', 'films'): (films_planets, 'planet_id', 'film_id'),
+    ('films', 'starships'): (starships_films, 'film_id', 'starship_id'),
+    ('starships', 'films'): (starships_films, 'starship_id', 'film_id'),
+    ('films', 'vehicles'): (vehicles_films, 'film_id', 'vehicle_id'),
+    ('vehicles', 'films'): (vehicles_films, 'vehicle_id', 'film_id'),
+    ('films', 'species'): (species_films, 'film_id', 'species_id'),
+    ('species', 'films'): (species_films, 'species_id', 'film_id'),
+}
+
+# (recurso, campo) -> (columna FK del modelo, recurso destino). 'people.films' solo admite una película (film_id)
+FOREIGN_KEYS = {
+    ('people', 'homeworld'): ('homeworld_id', 'planets'),
+    ('people', 'films'): ('film_id', 'films'),
+    ('species', 'homeworld'): ('homeworld_id', 'planets'),
+}
+
+
+#------------------------------------------------------------------------LECTURA EN STREAMING-------------------------------------------------------------
+
+class JSONStream:
+    """Decodifica valores JSON de un archivo por bloques, sin leerlo completo."""
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.f.read(self.chunk_size)
+        self.buffer = self.buffer[self.position:] + data
+        self.position = 0
+        return bool(data)
+
+    def peek(self):
+        """Siguiente carácter que no sea espacio (None al final del archivo)."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return None
+
+    def expect(self, characters):
+        character = self.peek()
+        if character is None or character not in characters:
+            raise click.ClickException('Invalid JSON: expected one of %r, found %r' % (characters, character))
+        self.position += 1
+        return character
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # Un número al final del bloque podría continuar en el siguiente
+                if end < len(self.buffer) or not isinstance(value, (int, float)) or not self._fill():
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise click.ClickException('Invalid JSON near offset %d' % self.position)
+
+    def array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+
+def iter_records(f, ndjson):
+    if ndjson:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+        return
+    stream = JSONStream(f)
+    if stream.peek() == '[':
+        yield from stream.array()
+        return
+    # Objeto {"films": [...], "people": [...]}; las claves que no son arrays (count, next...) se ignoran
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        stream.value()
+        stream.expect(':')
+        if stream.peek() == '[':
+            yield from stream.array()
+        else:
+            stream.value()
+        if stream.expect(',}') == '}':
+            return
+
+
+#------------------------------------------------------------------------CARGA-------------------------------------------------------------
+
+def _coerce(column, value):
+    if value in (None, ''):
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(str(value)[:10])
+    if isinstance(column.type, Integer):
+        return int(value)
+    if isinstance(column.type, (String, Text)):
+        value = str(value)
+        length = getattr(column.type, 'length', None)
+        return value[:length] if length else value
+    return value
+
+
+def record_to_row(model, record):
+    row = {}
+    for column in model.__table__.columns:
+        if column.primary_key or column.foreign_keys:
+            continue
+        value = _coerce(column, record.get(column.name))
+        if value is None and not column.nullable and column.default is None:
+            value = 'unknown'  # Convención de SWAPI para datos ausentes
+        row[column.name] = value
+    return fill_numeric(model.__tablename__, row)  # height -> height_num, population -> population_num...
+
+
+def _copy_value(value):
+    if value is None:
+        return ''  # En CSV de COPY un campo vacío sin comillas es NULL
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class BulkLoader:
+    """Acumula filas por tabla y las escribe por bloques con COPY (PostgreSQL + psycopg2) o executemany."""
+
+    def __init__(self, connection, chunk_size):
+        self.connection = connection
+        self.chunk_size = chunk_size
+        self.pending = {}
+        self.loaded = {}
+        self.started = time.perf_counter()
+        self.use_copy = False
+        if connection.dialect.name == 'postgresql':
+            with closing(connection.connection.dbapi_connection.cursor()) as cursor:
+                self.use_copy = hasattr(cursor, 'copy_expert')
+
+    def add(self, table, row):
+        rows = self.pending.setdefault(table, [])
+        rows.append(row)
+        if len(rows) >= self.chunk_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for target in ([table] if table is not None else list(self.pending)):
+            rows = self.pending.pop(target, [])
+            if not rows:
+                continue
+            if self.use_copy:
+                self._copy(target, rows)
+            else:
+                self.connection.execute(insert(target), rows)
+            self.loaded[target.name] = self.loaded.get(target.name, 0) + len(rows)
+            elapsed = time.perf_counter() - self.started
+            total = sum(self.loaded.values())
+            click.echo('  %-16s %8d rows   (%d rows total, %.0f rows/s)' % (target.name, self.loaded[target.name], total, total / elapsed if elapsed else 0))
+
+    def _copy(self, table, rows):
+        columns = list(rows[0])
+        data = io.StringIO()
+        for row in rows:
+            data.write(','.join(_copy_value(row.get(column)) for column in columns) + '\n')
+        data.seek(0)
+        with closing(self.connection.connection.dbapi_connection.cursor()) as cursor:
+            cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (
+                table.name, ', '.join('"%s"' % column for column in columns)), data)
+
+
+def url_map(connection, model):
+    return dict(connection.execute(select(model.url, model.id).where(model.url.isnot(None))).all())
+
+
+def import_swapi(f, ndjson, chunk_size):
+    started = time.perf_counter()
+    links = {}  # tabla de asociación -> {(url del recurso, url del destino, ...)}
+    foreign_keys = {}  # (recurso, columna FK) -> {url del recurso: url del destino}
+    skipped = 0
+    existing = 0
+    with db.engine.begin() as connection:
+        existing_urls = {resource: set(url_map(connection, model)) for resource, model in RESOURCES.items()}
+        loader = BulkLoader(connection, chunk_size)
+        click.echo('Loading rows...')
+        for record in iter_records(f, ndjson):
+            match = URL_PATTERN.search(record.get('url') or '') if isinstance(record, dict) else None
+            if not match:
+                skipped += 1  # Sin url de SWAPI reconocible
+                continue
+            resource = match.group(1)
+            if record['url'] in existing_urls[resource]:
+                existing += 1  # Ya importado: no se inserta, pero sus referencias se resuelven igual
+            else:
+                existing_urls[resource].add(record['url'])
+                loader.add(RESOURCES[resource].__table__, record_to_row(RESOURCES[resource], record))
+
+            for (source, field), (table, source_column, target_column) in ASSOCIATIONS.items():
+                if source == resource:
+                    for target_url in record.get(field) or ():
+                        links.setdefault(table, set()).add((source_column, record['url'], target_url))
+            for (source, field), (column, target) in FOREIGN_KEYS.items():
+                value = record.get(field)
+                if source == resource and value:
+                    target_url = value[0] if isinstance(value, list) else value
+                    foreign_keys.setdefault((resource, column, target), {})[record['url']] = target_url
+        loader.flush()
+
+        click.echo('Resolving references...')
+        ids = {}  # url -> id; las urls de SWAPI son únicas entre todos los recursos
+        for model in RESOURCES.values():
+            ids.update(url_map(connection, model))
+        for (resource, column, target), references in foreign_keys.items():
+            table = RESOURCES[resource].__table__
+            parameters = [{"row_id": ids[url], "target_id": ids[target_url]}
+                          for url, target_url in references.items() if target_url in ids]
+            updated = 0
+            if parameters:
+                # Solo las filas cuya FK cambia: las que ya estaban bien no tocan su edited (ni los ETag)
+                target_id = bindparam('target_id')
+                result = connection.execute(update(table).where(table.c.id == bindparam('row_id'),
+                                                                or_(table.c[column].is_(None), table.c[column] != target_id))
+                                            .values({column: target_id}), parameters)
+                updated = result.rowcount if connection.dialect.supports_sane_multi_rowcount else len(parameters)
+            click.echo('  %-16s %8d %s' % (table.name, updated, column))
+
+        for table, pairs in links.items():
+            rows = set()
+            present = {tuple(sorted(row._mapping.items())) for row in connection.execute(select(table))}
+            for source_column, source_url, target_url in pairs:
+                if target_url in ids:
+                    target_column = next(column.name for column in table.columns if column.name != source_column)
+                    # Ordenado por nombre de columna: el mismo par llega desde los dos lados (films.planets y planets.films)
+                    rows.add(tuple(sorted(((source_column, ids[source_url]), (target_column, ids[target_url])))))
+            for row in rows - present:
+                loader.add(table, dict(row))
+        loader.flush()
+
+    for model in RESOURCES.values():
+        invalidate_model(model)
+    elapsed = time.perf_counter() - started
+    total = sum(loader.loaded.values())
+    click.echo('Done: %d rows in %.2fs (%.0f rows/s, %s), %d already imported, %d records skipped' % (
+        total, elapsed, total / elapsed if elapsed else 0, 'COPY' if loader.use_copy else 'executemany', existing, skipped))
+    return loader.loaded
+
+
+@click.command('import-swapi')
+@click.argument('path', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'file_format', type=click.Choice(['auto', 'json', 'ndjson']), default='auto', show_default=True,
+              help='auto: NDJSON si la extensión es .ndjson/.jsonl, JSON en otro caso.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Filas por COPY/executemany.')
+def import_swapi_command(path, file_format, chunk_size):
+    """Carga masiva de un volcado de SWAPI (films, people, planets, species, starships, vehicles).
+
+    Los recursos ya importados (misma url) no se duplican; sus referencias se completan.
+    """
+    if file_format == 'auto':
+        ndjson = path.name.endswith(('.ndjson', '.jsonl'))
+    else:
+        ndjson = file_format == 'ndjson'
+    import_swapi(path, ndjson, chunk_size)
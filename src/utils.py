@@ -1,4 +1,27 @@
-from flask import jsonify, url_for
+import base64
+import hashlib
+import json
+from datetime import timezone
+from contextlib import contextmanager
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from models import db
+from flask import jsonify, url_for, request, current_app, Response, stream_with_context
+
+# Limites para la paginacion por cursor (keyset)
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+# Maximo de ids en ?ids=1,5,9
+MAX_IDS = MAX_PAGE_LIMIT
+
+# Respuestas en streaming para listados completos
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# Content-Encoding que puede usar compression.py; cada uno tiene su propio ETag fuerte "<etag>-<encoding>"
+CONTENT_CODINGS = ('gzip', 'br', 'zstd')
+STREAM_BATCH_SIZE = 500
 
 class APIException(Exception):
     status_code = 400
@@ -39,3 +62,282 @@ def generate_sitemap(app):
         <p>Start working on your proyect by following the <a href="https://start.4geeksacademy.com/starters/flask" target="_blank">Quick Start</a></p>
         <p>Remember to specify a real endpoint path like: </p>
         <ul style="text-align: left;">"""+links_html+"</ul></div>"
+
+
+def encode_cursor(last_id, sort=None, value=None):
+    # El cursor es opaco para el cliente: base64 del ultimo id entregado
+    # (y, con ?sort=, del valor de la columna de orden en esa fila)
+    data = {"id": last_id} if sort is None else {"id": last_id, "sort": sort, "v": value}
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor_data(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        data["id"] = int(data["id"])
+        return data
+    except (ValueError, KeyError, TypeError):
+        raise APIException('Invalid cursor', status_code=400)
+
+def decode_cursor(cursor):
+    return decode_cursor_data(cursor)["id"]
+
+def get_page_args():
+    """Lee ?after=<cursor>&limit=N. Devuelve None si el cliente no pidio paginacion."""
+    after = request.args.get('after')
+    limit = request.args.get('limit')
+    if after is None and limit is None:
+        return None
+    if limit is None:
+        limit = DEFAULT_PAGE_LIMIT
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise APIException('limit must be an integer', status_code=400)
+        if limit < 1:
+            raise APIException('limit must be greater than 0', status_code=400)
+    return {
+        "after": decode_cursor(after) if after else None,
+        "limit": min(limit, MAX_PAGE_LIMIT),
+    }
+
+def get_ids(args):
+    """Lee ?ids=1,5,9: lista sin repetidos en el orden pedido, o None si no se pidio. Solo se combina con ?fields."""
+    value = args.get('ids')
+    if value is None:
+        return None
+    others = [name for name in args if name not in ('ids', 'fields')]
+    if others:
+        raise APIException('ids cannot be combined with: %s' % ', '.join(others), status_code=400)
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise APIException('ids must be a comma-separated list of integers', status_code=400)
+    if not ids:
+        raise APIException('ids must not be empty', status_code=400)
+    if len(ids) > MAX_IDS:
+        raise APIException('At most %d ids per request' % MAX_IDS, status_code=400)
+    return ids
+
+def keyset_paginate(query, model, after=None, limit=DEFAULT_PAGE_LIMIT):
+    """Pagina por clave primaria: WHERE id > :after ORDER BY id LIMIT :limit.
+
+    Pide una fila extra para saber si existe una pagina siguiente sin hacer COUNT(*).
+    """
+    if after is not None:
+        query = query.filter(model.id > after)
+    items = query.order_by(model.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].id)
+    return items, next_cursor
+
+def page_response(results, next_cursor):
+    return {"results": results, "next": next_cursor}
+
+@contextmanager
+def count_queries(engine):
+    """Registra las sentencias SQL ejecutadas dentro del bloque.
+
+        with count_queries(db.engine) as statements:
+            client.get('/users')
+        assert len(statements) <= 2
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+@contextmanager
+def assert_max_queries(engine, max_queries):
+    """Falla si el bloque ejecuta mas de max_queries sentencias SQL (detecta regresiones N+1)."""
+    with count_queries(engine) as statements:
+        yield statements
+    if len(statements) > max_queries:
+        raise AssertionError('Expected at most %d queries, got %d:\n%s' % (
+            max_queries, len(statements), "\n".join(statements)))
+
+def get_stream_mode():
+    """'ndjson' si el cliente envia Accept: application/x-ndjson, 'json' con ?stream=1, o None."""
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return 'ndjson'
+    if request.args.get('stream') in ('1', 'true'):
+        return 'json'
+    return None
+
+def stream_query(query, serialize, mode, dumps=None):
+    """Emite las filas de la consulta a medida que se serializan.
+
+    yield_per mantiene en memoria solo un lote de objetos ORM (y usa un cursor de
+    servidor en PostgreSQL), asi que el pico de memoria no depende del tamano de la tabla.
+    query puede ser un Query del ORM o un select() de columnas (serializers.py); dumps
+    debe devolver bytes y por defecto usa el proveedor JSON de la app.
+    """
+    if dumps is None:
+        dumps = lambda obj: current_app.json.dumps(obj).encode("utf-8")
+    orm_query = hasattr(query, "statement")
+    statement = query.statement if orm_query else query
+
+    def rows():
+        # La consulta se ejecuta dentro del generador, con el contexto que mantiene stream_with_context.
+        # Se usa select() 2.0: el Query legacy aplica unique() con joinedload y no admite yield_per
+        result = db.session.execute(statement, execution_options={"yield_per": STREAM_BATCH_SIZE})
+        return result.scalars() if orm_query else result
+
+    def generate_ndjson():
+        batch = []
+        for row in rows():
+            batch.append(dumps(serialize(row)))
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield b"\n".join(batch) + b"\n"
+                batch = []
+        if batch:
+            yield b"\n".join(batch) + b"\n"
+
+    def generate_json():
+        yield b"["
+        separator = b""
+        batch = []
+        for row in rows():
+            batch.append(dumps(serialize(row)))
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield separator + b",".join(batch)
+                separator = b","
+                batch = []
+        if batch:
+            yield separator + b",".join(batch)
+        yield b"]"
+
+    if mode == 'ndjson':
+        return Response(stream_with_context(generate_ndjson()), mimetype=NDJSON_MIMETYPE)
+    return Response(stream_with_context(generate_json()), mimetype='application/json')
+
+def make_etag(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+def _latest(values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+def entity_validators_statement(model, entity_id):
+    """SELECT de las columnas edited de una fila y de las relaciones que muestra (etag_relations)."""
+    statement = select(model.id, model.edited)
+    for relation in getattr(model, 'etag_relations', ()):
+        target = aliased(getattr(model, relation).property.mapper.class_)
+        statement = statement.outerjoin(target, getattr(model, relation).of_type(target)).add_columns(target.edited)
+    return statement.where(model.id == entity_id)
+
+def validators_from_entity_row(model, entity_id, row):
+    if row is None:
+        return None
+    edited = list(row[1:])
+    return make_etag(model.__tablename__, entity_id, *edited), _latest(edited)
+
+def validators_from_entity(model, entity):
+    """Lo mismo que entity_validators() para una entidad ya cargada con serialize_options(), sin otra consulta."""
+    related = [getattr(entity, relation) for relation in getattr(model, 'etag_relations', ())]
+    row = (entity.id, entity.edited) + tuple(target.edited if target is not None else None for target in related)
+    return validators_from_entity_row(model, entity.id, row)
+
+def entities_statement(model, ids):
+    """SELECT de varias entidades por id, con las relaciones que lee serialize()."""
+    return select(model).options(*model.serialize_options()).where(model.id.in_(ids))
+
+def entity_validators(model, entity_id):
+    """ETag y Last-Modified de una fila a partir de su id/edited (y el de las relaciones que muestra).
+
+    Solo lee las columnas edited, sin cargar ni serializar la entidad. Devuelve None si no existe.
+    """
+    row = db.session.execute(entity_validators_statement(model, entity_id)).first()
+    return validators_from_entity_row(model, entity_id, row)
+
+def collection_validators_statement(model):
+    """Un solo SELECT con count, max(id) y max(edited) de la tabla y de sus relaciones."""
+    columns = []
+    for target in [model] + [getattr(model, relation).property.mapper.class_ for relation in getattr(model, 'etag_relations', ())]:
+        columns.extend(select(aggregate).scalar_subquery() for aggregate in (func.count(target.id), func.max(target.id), func.max(target.edited)))
+    return select(*columns)
+
+def validators_from_collection_row(model, row, full_path, accept):
+    latest = row[2::3]
+    return make_etag(model.__tablename__, full_path, accept, *row), _latest(latest)
+
+def collection_validators(model):
+    """ETag y Last-Modified de un listado: count, max(id) y max(edited) de la tabla y de sus relaciones.
+
+    La representacion (query string y Accept) forma parte del ETag porque cada pagina o
+    formato es un cuerpo distinto.
+    """
+    row = db.session.execute(collection_validators_statement(model)).one()
+    return validators_from_collection_row(model, row, request.full_path, request.accept_mimetypes.best)
+
+def projected_validators(validators, fields):
+    """Con ?fields el cuerpo cambia: el ETag incluye los campos pedidos."""
+    if fields is None:
+        return validators
+    etag, last_modified = validators
+    return make_etag(etag, *fields), last_modified
+
+def representation_etag(etag, encoding):
+    """ETag de la version comprimida con encoding: "<etag>-gzip". Sigue siendo fuerte (If-Range, etc.)."""
+    return '%s-%s' % (etag, encoding)
+
+def matching_etag(if_none_match, etag):
+    """La etiqueta de If-None-Match (werkzeug ETags) que corresponde a etag, sin comprimir o en cualquier encoding; None si no hay."""
+    if if_none_match.star_tag:
+        return etag
+    candidates = {etag}.union(representation_etag(etag, encoding) for encoding in CONTENT_CODINGS)
+    for tag in if_none_match.as_set(include_weak=True):
+        if tag in candidates:
+            return tag
+    return None
+
+def conditional_get(etag, last_modified=None):
+    """Respuesta 304 si el cliente ya tiene esta version (If-None-Match / If-Modified-Since).
+
+    El 304 repite el ETag que envio el cliente: el de la representacion (comprimida o no) que tiene guardada.
+    """
+    not_modified = False
+    if request.if_none_match:
+        matched = matching_etag(request.if_none_match, etag)
+        not_modified, etag = matched is not None, matched or etag
+    elif request.if_modified_since and last_modified is not None:
+        not_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+    if not not_modified:
+        return None
+    response = Response(status=304)
+    return set_validators(response, etag, last_modified)
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return response
+
+def insert_or_conflict(model, values):
+    """INSERT en una sola sentencia que delega la unicidad en las restricciones de la tabla.
+
+    Devuelve el id de la fila nueva, o None si chocó con una restricción única (otra petición
+    pudo insertarla al mismo tiempo). En PostgreSQL y SQLite usa INSERT ... ON CONFLICT DO NOTHING
+    RETURNING id; en el resto, un SAVEPOINT que traduce el IntegrityError.
+    """
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = dialect_insert(table).values(**values).on_conflict_do_nothing().returning(table.c.id)
+        return db.session.execute(statement).scalar()
+    try:
+        with db.session.begin_nested():
+            return db.session.execute(insert(table).values(**values)).inserted_primary_key[0]
+    except IntegrityError:
+        return None
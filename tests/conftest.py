@@ -0,0 +1,36 @@
+"""
+Fixtures de las pruebas: la app de src/ contra una base SQLite temporal, nunca la de DATABASE_URL.
+
+    pipenv run test
+"""
+import os
+import sys
+import tempfile
+import pytest
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix='swapi-tests-')
+# Antes de importar la app: app.py lee DATABASE_URL al cargarse
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(SCRATCH_DIR, 'test.db')
+os.environ['CACHE_BACKEND'] = 'memory'
+os.environ.pop('CACHE_REDIS_URL', None)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from app import app as flask_app  # noqa: E402
+from cache import cache  # noqa: E402
+from models import db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """La app con un esquema vacío y la cache limpia en cada prueba."""
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        cache.clear()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,84 @@
+"""
+Las rutas async de asgi.py responden con las mismas cabeceras que sus equivalentes en Flask.
+"""
+import asyncio
+import pytest
+from models import db, Planet, Character, User
+
+# Cabeceras que dependen de los hooks de Flask (CORS, compresión) y que las rutas async replican a mano
+COMPARED_HEADERS = ('access-control-allow-origin', 'access-control-expose-headers', 'access-control-allow-credentials',
+                    'content-type', 'content-encoding', 'etag')
+
+
+def call_asgi(path, query_string='', headers=()):
+    import asgi
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query_string.encode('latin-1'),
+             'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+             'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80), 'root_path': ''}
+    asyncio.run(asgi.application(scope, receive, send))
+    response_headers = {}
+    for name, value in messages[0]['headers']:
+        name = name.decode('latin-1')
+        response_headers[name] = response_headers[name] + ', ' + value.decode('latin-1') if name in response_headers else value.decode('latin-1')
+    return messages[0]['status'], response_headers
+
+
+def vary(value):
+    return sorted(token.strip().lower() for token in (value or '').split(',') if token.strip())
+
+
+@pytest.fixture
+def catalog(app):
+    planet = Planet(name='Tatooine', climate='arid', url='planets/1')
+    db.session.add_all([planet, Character(name='Luke', homeworld=planet),
+                        User(email='luke@example.com', password='x', username='luke', name='Luke', last_name='Skywalker')])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('path, query_string', [
+    ('/characters', ''),
+    ('/characters', 'limit=1'),
+    ('/planets', ''),
+    ('/character/1', ''),
+    ('/character/99', ''),
+    ('/users/favoritos', ''),  # 400 sin user_id
+    ('/users/favoritos', 'user_id=1'),
+    ('/characters', 'limit=abc'),  # 400 de APIException
+])
+@pytest.mark.parametrize('request_headers', [
+    {'Origin': 'https://example.com'},
+    {'Origin': 'https://example.com', 'Accept-Encoding': 'gzip'},
+    {},
+])
+def test_asgi_headers_match_flask(client, catalog, path, query_string, request_headers):
+    flask_response = client.get(path + ('?' + query_string if query_string else ''), headers=request_headers)
+    status, asgi_headers = call_asgi(path, query_string, request_headers.items())
+
+    assert status == flask_response.status_code
+    for name in COMPARED_HEADERS:
+        assert asgi_headers.get(name) == flask_response.headers.get(name), name
+    assert vary(asgi_headers.get('vary')) == vary(', '.join(flask_response.headers.getlist('Vary')))
+    if 'Origin' in request_headers:
+        assert asgi_headers.get('access-control-allow-origin')
+
+
+@pytest.mark.parametrize('query_string', ['', 'limit=30'])
+def test_asgi_compressed_etag_matches_flask(client, app, query_string):
+    db.session.add_all(Planet(name='Planet %d' % i, climate='arid', terrain='desert', url='planets/%d' % i) for i in range(40))
+    db.session.commit()
+    headers = {'Accept-Encoding': 'gzip'}
+    flask_response = client.get('/planets' + ('?' + query_string if query_string else ''), headers=headers)
+    status, asgi_headers = call_asgi('/planets', query_string, headers.items())
+    assert flask_response.headers['Content-Encoding'] == asgi_headers['content-encoding'] == 'gzip'
+    assert asgi_headers['etag'] == flask_response.headers['ETag']
+
+    status, asgi_headers = call_asgi('/planets', query_string, [('If-None-Match', flask_response.headers['ETag'])])
+    assert status == 304 and asgi_headers['etag'] == flask_response.headers['ETag']
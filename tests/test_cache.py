@@ -0,0 +1,32 @@
+"""
+create_cache: la cache en memoria de cada proceso solo se acepta con un worker o con CACHE_REDIS_URL.
+"""
+import pytest
+from cache import create_cache, configured_workers, MemoryBackend
+
+
+@pytest.mark.parametrize('env, workers', [
+    ({}, 1),
+    ({'WEB_CONCURRENCY': '3'}, 3),
+    ({'GUNICORN_CMD_ARGS': '--bind 0.0.0.0:80 --workers 4'}, 4),
+    ({'GUNICORN_CMD_ARGS': '-w 2 --timeout 30', 'WEB_CONCURRENCY': '8'}, 2),
+    ({'GUNICORN_CMD_ARGS': '--workers=5'}, 5),
+])
+def test_configured_workers(monkeypatch, env, workers):
+    monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+    monkeypatch.delenv('GUNICORN_CMD_ARGS', raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    assert configured_workers() == workers
+
+
+def test_memory_cache_refuses_several_workers_without_redis(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '2')
+    with pytest.raises(RuntimeError, match='CACHE_REDIS_URL'):
+        create_cache()
+
+
+def test_memory_cache_warns_with_one_worker(monkeypatch, caplog):
+    monkeypatch.setenv('WEB_CONCURRENCY', '1')
+    assert isinstance(create_cache(), MemoryBackend)
+    assert 'stale' in caplog.text
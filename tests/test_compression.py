@@ -0,0 +1,42 @@
+"""
+Compresión y ETag: cada representación tiene su ETag fuerte y las respuestas sin comprimir conservan el suyo.
+"""
+import gzip
+import pytest
+from models import db, Planet
+
+
+@pytest.fixture
+def planets(app):
+    db.session.add_all(Planet(name='Planet %d' % i, climate='arid', terrain='desert', url='planets/%d' % i) for i in range(40))
+    db.session.commit()
+
+
+def test_uncompressed_responses_keep_a_strong_etag(client, planets):
+    detail = client.get('/planet/1', headers={'Accept-Encoding': 'gzip'})  # Menos de COMPRESSION_MIN_SIZE
+    assert 'Content-Encoding' not in detail.headers
+    assert detail.headers['ETag'].startswith('"')
+
+    identity = client.get('/planets')
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.headers['ETag'].startswith('"')
+
+
+def test_compressed_representation_has_its_own_strong_etag(client, planets):
+    identity = client.get('/planets')
+    compressed = client.get('/planets', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == identity.data
+    assert compressed.headers['ETag'] == identity.headers['ETag'][:-1] + '-gzip"'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+
+
+@pytest.mark.parametrize('url', ['/planets', '/planets?limit=30'])
+def test_not_modified_echoes_the_representation_etag(client, planets, url):
+    identity_etag = client.get(url).headers['ETag']
+    gzip_etag = client.get(url, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    for etag in (identity_etag, gzip_etag):
+        response = client.get(url, headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+    assert client.get(url, headers={'If-None-Match': '"other-gzip"'}).status_code == 200
@@ -0,0 +1,41 @@
+"""
+?expand= con fechas nulas: las entidades expandidas usan serialize(), que no debe fallar con release_date/created/edited en NULL.
+"""
+import pytest
+from models import db, Film, Planet, Character
+
+
+@pytest.fixture
+def undated(app):
+    """Una película sin fechas con un planeta y un personaje, también sin fechas."""
+    film = Film(title='A New Hope', episode_id=4, url='films/1')
+    planet = Planet(name='Tatooine', climate='arid', url='planets/1', films=[film])
+    db.session.add_all([film, planet, Character(name='Luke', homeworld=planet, film=film, created=None, edited=None)])
+    db.session.commit()
+    return film
+
+
+@pytest.mark.parametrize('url', [
+    '/films?expand=planets,characters',
+    '/films?expand=planets.films&limit=10',
+    '/film/1?expand=planets,characters',
+    '/planet/1?expand=films',
+    '/character/1?expand=film,homeworld',
+])
+def test_expand_with_null_dates(client, undated, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    body = response.get_json()
+    film = body if url.startswith('/film/') else None
+    if url.startswith('/films'):
+        results = body['results'] if isinstance(body, dict) else body
+        film = results[0]
+    if film is not None:
+        assert film['release_date'] is None and film['created'] is None
+        assert film['planets'][0]['name'] == 'Tatooine'
+
+
+def test_detail_with_null_dates(client, undated):
+    response = client.get('/film/1')
+    assert response.status_code == 200
+    assert response.get_json()['release_date'] is None
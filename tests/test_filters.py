@@ -0,0 +1,38 @@
+"""
+Filtros de los listados: valores vacíos y parámetros desconocidos son un 400, no un resultado vacío.
+"""
+import pytest
+from models import db, Planet, Character
+
+
+@pytest.fixture
+def catalog(app):
+    planet = Planet(name='Tatooine', climate='arid', url='planets/1')
+    db.session.add_all([planet, Character(name='Luke', gender='male', height='172', homeworld=planet)])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('url', [
+    '/characters?gender=',
+    '/characters?gender=&gender=',
+    '/characters?homeworld=',
+    '/characters?height_gt=',
+    '/planets?climate=',
+    '/characters?expand=homeworld',  # ?expand= solo en los listados que lo implementan
+])
+def test_empty_or_unknown_filter_is_rejected(client, catalog, url):
+    response = client.get(url)
+    assert response.status_code == 400, response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('url, names', [
+    ('/characters?gender=male', ['Luke']),
+    ('/characters?gender=male&gender=', ['Luke']),  # Los vacíos junto a un valor se ignoran
+    ('/characters?homeworld=Tatooine', ['Luke']),
+    ('/characters?height_gt=100', ['Luke']),
+    ('/characters?height_gt=200', []),
+])
+def test_filters(client, catalog, url, names):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert [item['name'] for item in response.get_json()] == names
@@ -0,0 +1,26 @@
+"""
+Medición de las sentencias SQL: una sentencia que falla no deja estado colgado en la conexión.
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db
+from metrics import sql_duration
+
+
+def observed():
+    return sum(count for counts, total, count in sql_duration._series.values())
+
+
+def test_failed_statements_do_not_leak_start_times(app):
+    with db.engine.connect() as connection:
+        info_before = repr(connection.info)
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text('SELECT * FROM missing_table'))
+            connection.rollback()
+        assert repr(connection.info) == info_before
+
+        before = observed()
+        assert connection.execute(text('SELECT 1')).scalar() == 1
+        assert observed() == before + 1
@@ -0,0 +1,71 @@
+"""
+Regresiones N+1: los listados hacen las mismas consultas con 3 filas que con 30.
+"""
+import pytest
+from models import db, Film, Planet, Character, User, Favoritos
+from utils import assert_max_queries, count_queries
+
+
+def add_user(username):
+    user = User(email=username + '@example.com', password='x', username=username, name=username, last_name='Test')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def add_rows(count, user):
+    """count planetas, cada uno con un personaje; user los marca a todos como favoritos."""
+    film = Film.query.first() or Film(title='A New Hope', episode_id=4, url='films/1')
+    start = Planet.query.count()
+    for i in range(start, start + count):
+        planet = Planet(name='Planet %d' % i, climate='arid', population=str(i * 1000), url='planets/%d' % i)
+        character = Character(name='Character %d' % i, gender='female', homeworld=planet, film=film)
+        db.session.add_all([planet, character])
+        db.session.flush()
+        db.session.add_all([Favoritos(user_id=user.id, planet_id=planet.id), Favoritos(user_id=user.id, character=character)])
+    db.session.commit()  # Invalida la cache de los listados
+
+
+def get(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+@pytest.mark.parametrize('url, max_queries', [
+    ('/characters', 2),  # ETag/Last-Modified y la lista, con homeworld en el mismo SELECT
+    ('/characters?limit=50', 2),
+    ('/planets', 2),
+    ('/planets?limit=50', 2),
+])
+def test_catalog_list_queries_do_not_grow_with_rows(app, client, url, max_queries):
+    user = add_user('luke')
+    add_rows(3, user)
+    with assert_max_queries(db.engine, max_queries) as few:
+        get(client, url)
+
+    add_rows(27, user)
+    with assert_max_queries(db.engine, max_queries) as many:
+        body = get(client, url)
+    assert len(body['results'] if isinstance(body, dict) else body) == 30
+    assert len(many) == len(few)
+
+
+def test_user_favorites_queries_do_not_grow_with_favorites(app, client):
+    luke, leia = add_user('luke'), add_user('leia')
+    add_rows(3, luke)
+    add_rows(15, leia)
+    few_url, many_url = '/users/favoritos?user_id=%d' % luke.id, '/users/favoritos?user_id=%d' % leia.id
+
+    with count_queries(db.engine) as few:
+        assert len(get(client, few_url)) == 6
+    with count_queries(db.engine) as many:
+        assert len(get(client, many_url)) == 30
+    assert len(few) == len(many) <= 2  # El usuario y el rango de user_favorite, sin una consulta por favorito
+
+
+def test_cached_list_skips_the_database(app, client):
+    add_rows(3, add_user('luke'))
+    get(client, '/characters')
+    with assert_max_queries(db.engine, 0):
+        get(client, '/characters')
@@ -0,0 +1,33 @@
+"""
+/search: paginación por cursor estable en SQLite (FTS5) y la sentencia de PostgreSQL compilada.
+"""
+from sqlalchemy.dialects import postgresql
+from models import db, Planet, Character
+from search import SEARCH_TYPES, TYPE_CODES, _postgres_statement
+
+
+def test_search_pages_cover_every_match_once(app, client):
+    for i in range(12):
+        planet = Planet(name='Desert %d' % i, climate='arid desert' if i % 3 else 'arid', terrain='desert', url='planets/%d' % i)
+        db.session.add_all([planet, Character(name='Desert walker %d' % i, homeworld=planet)])
+    db.session.commit()
+
+    seen, url = [], '/search?q=desert&limit=5'
+    while url:
+        body = client.get(url).get_json()
+        seen += [(result['type'], result['id']) for result in body['results']]
+        url = '/search?q=desert&limit=5&after=%s' % body['next'] if body['next'] else None
+    assert len(seen) == len(set(seen)) == 24
+
+
+def test_postgres_rank_is_double_precision_everywhere():
+    statement = _postgres_statement('skywalker', tuple(SEARCH_TYPES), (0.0607927, TYPE_CODES['planet'], 3), 20)
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    rank = 'CAST(ts_rank('
+    assert 'ts_rank(' in sql and sql.count('ts_rank(') == sql.count(rank)
+    assert 'AS FLOAT(53))' in sql
+    # Por rama: la columna, el ORDER BY y el keyset (< y = en su tipo, <= o < en los demás)
+    for kind in SEARCH_TYPES:
+        table = SEARCH_TYPES[kind][0].__tablename__
+        assert sql.count('ts_rank(%s.search_vector' % table) >= 3, kind
+    assert 'ORDER BY hits.rank DESC, hits.code, hits.id' in sql
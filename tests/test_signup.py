@@ -0,0 +1,32 @@
+"""
+Alta de usuarios concurrente: muchos hilos piden los mismos usuarios y cada uno queda creado una sola vez.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from models import User
+
+THREADS = 8
+USERS = 10
+
+
+def signup(client, i):
+    payload = {"email": "user%d@example.com" % i, "username": "user%d" % i,
+               "password": "x", "name": "Test", "last_name": "User"}
+    return client.post('/users', json=payload)
+
+
+def test_concurrent_signup_creates_each_user_once(app):
+    barrier = threading.Barrier(THREADS)
+
+    def worker(_):
+        client = app.test_client()
+        barrier.wait()  # Todos los hilos arrancan a la vez y compiten por las mismas filas
+        return [(i, signup(client, i)) for i in range(USERS)]
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        responses = [item for results in executor.map(worker, range(THREADS)) for item in results]
+
+    for i in range(USERS):
+        statuses = sorted(response.status_code for user, response in responses if user == i)
+        assert statuses == [201] + [409] * (THREADS - 1), (i, statuses)
+    assert User.query.count() == USERS
@@ -0,0 +1,68 @@
+"""
+BulkLoader con COPY: el CSV que recibe copy_expert y el cierre de los cursores, con una conexión DBAPI simulada.
+"""
+import csv
+from datetime import datetime
+from types import SimpleNamespace
+from models import Planet
+from swapi_import import BulkLoader
+
+
+class FakeCursor:
+    def __init__(self, copy):
+        self.closed = False
+        self.copies = []
+        if copy:
+            self.copy_expert = lambda sql, data: self.copies.append((sql, data.read()))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDBAPIConnection:
+    def __init__(self, copy=True):
+        self.copy = copy
+        self.cursors = []
+
+    def cursor(self):
+        cursor = FakeCursor(self.copy)
+        self.cursors.append(cursor)
+        return cursor
+
+
+def fake_connection(dialect, copy=True):
+    dbapi_connection = FakeDBAPIConnection(copy)
+    return SimpleNamespace(dialect=SimpleNamespace(name=dialect), connection=SimpleNamespace(dbapi_connection=dbapi_connection)), dbapi_connection
+
+
+def test_copy_writes_csv_and_closes_cursors():
+    connection, dbapi_connection = fake_connection('postgresql')
+    loader = BulkLoader(connection, chunk_size=2)
+    assert loader.use_copy
+    created = datetime(2014, 12, 9, 13, 50, 49)
+    loader.add(Planet.__table__, {'name': 'Tatooine', 'climate': 'arid', 'population': None, 'created': created})
+    loader.add(Planet.__table__, {'name': 'Say "hi"', 'climate': 'temperate, moist', 'population': '1000', 'created': created})
+
+    copies = [copy for cursor in dbapi_connection.cursors for copy in cursor.copies]
+    assert len(copies) == 1
+    sql, data = copies[0]
+    assert sql == 'COPY planet ("name", "climate", "population", "created") FROM STDIN WITH (FORMAT csv)'
+    assert list(csv.reader(data.splitlines())) == [
+        ['Tatooine', 'arid', '', '2014-12-09T13:50:49'],
+        ['Say "hi"', 'temperate, moist', '1000', '2014-12-09T13:50:49'],
+    ]
+    assert ',,' in data.splitlines()[0]  # NULL: campo vacío sin comillas
+    assert len(dbapi_connection.cursors) == 2 and all(cursor.closed for cursor in dbapi_connection.cursors)
+    assert loader.loaded == {'planet': 2}
+
+
+def test_probe_cursor_is_closed_without_copy_expert():
+    connection, dbapi_connection = fake_connection('postgresql', copy=False)
+    assert not BulkLoader(connection, chunk_size=10).use_copy
+    assert [cursor.closed for cursor in dbapi_connection.cursors] == [True]
+
+
+def test_other_dialects_do_not_open_cursors():
+    connection, dbapi_connection = fake_connection('sqlite')
+    assert not BulkLoader(connection, chunk_size=10).use_copy
+    assert dbapi_connection.cursors == []